@@ -1,7 +1,7 @@
-from copy import deepcopy
-from algokit_utils import AppSpecStateDict, get_algod_client
-from algofuzz.FuzzAppClient import FuzzAppClient
+import base64
+from algofuzz.backend import ExecutionBackend
 from algofuzz.mutate import AccountMutator
+from algofuzz.utils import str_or_hex
 
 
 def dict_list_to_set(dict_list: list[dict]) -> set[dict]:
@@ -9,26 +9,76 @@ def dict_list_to_set(dict_list: list[dict]) -> set[dict]:
 
 State = dict[bytes | str, bytes | str | int]
 class ContractState:
-    def __init__(self, app: FuzzAppClient) -> None:
+    """Shadow copy of the application state.
+
+    The state is loaded from the execution backend. After the initial load it is kept
+    up to date from the global and local state deltas of confirmed calls, so tracking
+    it costs no extra requests. State dictionaries are replaced rather than mutated when
+    a delta is applied, which lets snapshots returned by `get_state` share the unchanged
+    parts.
+
+    :param resync_interval: Reload the whole state from the backend every n loads (0 disables it)
+    :param verify: Compare the shadow copy with the backend state on every resync
+    """
+    def __init__(self, app: ExecutionBackend, resync_interval: int = 0, verify: bool = False) -> None:
         self._app = app
         self._address = app.app_address
-        self._client = get_algod_client()
         self._global_state: State = {}
         self._local_state: dict[str, State] = {}
+        self.resync_interval = resync_interval
+        self.verify = verify
+        self.inconsistencies = 0
+        self._loads = 0
 
-    def load(self) -> tuple[dict, dict]:
+    def load(self, result: dict = None) -> tuple[dict, dict]:
+        """Updates the state after a call and returns the (old, new) state transition.
+
+        :param result: Transaction result of the call holding its state deltas,
+        reloads the whole state from the backend when omitted"""
         old_state = self.get_state()
+        self._loads += 1
+
+        if result is None:
+            self._load_full()
+        elif self.resync_interval and self._loads % self.resync_interval == 0:
+            self._apply_deltas(result)
+            self._resync()
+        else:
+            self._apply_deltas(result)
+
+        return old_state, self.get_state()
+
+    def _load_full(self) -> None:
         self._global_state = self._app.get_global_state()
 
+        local_state = {}
         for acc in AccountMutator.accs:
-            self._local_state[acc.address] = self._app.get_local_state(acc.address)
+            local_state[acc.address] = self._app.get_local_state(acc.address)
+        self._local_state = local_state
 
-        return old_state, self.get_state()
+    def _resync(self) -> None:
+        shadow = self.get_state()
+        self._load_full()
+        if self.verify and shadow != self.get_state():
+            self.inconsistencies += 1
+
+    def _apply_deltas(self, result: dict) -> None:
+        global_delta = result.get('global-state-delta')
+        if global_delta:
+            self._global_state = apply_delta(self._global_state, global_delta)
+
+        local_deltas = result.get('local-state-delta')
+        if local_deltas:
+            local_state = self._local_state.copy()
+            for account_delta in local_deltas:
+                address = account_delta['address']
+                local_state[address] = apply_delta(local_state.get(address, {}), account_delta['delta'])
+            self._local_state = local_state
 
     def get_state(self) -> dict:
         return {
-            'global': self._global_state.copy(),
-            'local': deepcopy(self._local_state)
+            'global': self._global_state,
+            'local': self._local_state.copy()
         }
 
     def exists_global(self, key: str) -> bool:
@@ -43,6 +93,19 @@ class ContractState:
 
     def get_local(self, account_address: str, key: str) -> str | int:
         return self._local_state[account_address][key]
-    
+
     def get_creator(self):
         return self._creator
+
+
+def apply_delta(state: State, delta: list[dict]) -> State:
+    """Returns a new state with an algod state delta applied to it"""
+    new_state = state.copy()
+    for entry in delta:
+        key = str_or_hex(base64.b64decode(entry['key']))
+        value = entry['value']
+        match value['action']:
+            case 1: new_state[key] = str_or_hex(base64.b64decode(value.get('bytes', '')))
+            case 2: new_state[key] = value.get('uint', 0)
+            case 3: new_state.pop(key, None)
+    return new_state
@@ -1,28 +1,53 @@
-from algokit_utils import Account, ApplicationClient, get_algod_client
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from algokit_utils import Account, ApplicationClient
 from algosdk import abi, atomic_transaction_composer, transaction
+from algosdk.v2client.models import DryrunRequest
 
+from algofuzz import coverage, disassembler, transport
+from algofuzz.backend import CallCheck, ExecutionBackend, ExecutionResult
+from algofuzz.metrics import phase_timers
 from algofuzz.mutate import AccountMutator, PaymentObject
-from algofuzz.utils import create_app_spec
+from algofuzz.transport import get_algod_client
+from algofuzz.utils import balance_tracker, create_app_spec, get_suggested_params, suggested_params_cache
 from algosdk.error import AlgodHTTPError
 
 ASSERTION_FAIL_TEXT = 'assert failed'
 
-class FuzzAppClient(ApplicationClient):
+
+class DryrunError(Exception):
+    """Raised when a dryrun does not report the outcome of an app call it was sent"""
+    pass
+
+class FuzzAppClient(ApplicationClient, ExecutionBackend):
+    """Backend that checks calls with dryrun and commits them to algod"""
+
+    # shared by all clients of the process, next() on it is atomic
+    _notes = itertools.count(1)
 
     @property
     def methods(self) -> list[abi.Method]:
         return self.app_spec.contract.methods
     
     @property
-    def approval_disassembled(self) -> str:
-        response = self.algod_client.disassemble(self.approval.raw_binary)
-        result = response.get('result', '')
-        return result.split('\n')
+    def approval_disassembled(self) -> list[str]:
+        binary = self.approval.raw_binary
+        if getattr(self, '_disassembled_binary', None) != binary:
+            self._disassembled = disassembler.disassemble(binary, self.algod_client)
+            self._disassembled_binary = binary
+        return self._disassembled
     
     @property
     def approval_line_count(self) -> int:
         return len(self.approval_disassembled)
 
+    @property
+    def coverage_size(self) -> int:
+        """Size of the coverage bitmaps, looked up once since the approval program does not change"""
+        if getattr(self, '_coverage_size', None) is None:
+            self._coverage_size = self.approval_line_count
+        return self._coverage_size
+
     def opt_in_all(self) -> None:
         self.opt_in()
         creator = AccountMutator().seed()
@@ -42,63 +67,134 @@ class FuzzAppClient(ApplicationClient):
     def get_method(self, name: str) -> abi.Method:
         return self.app_spec.contract.get_method_by_name(name)
     
-    def call(self, method: abi.Method, args: list):
-        txns = self._prepare_txns(method, args)
-
-        dryrun_request = transaction.create_dryrun(self.algod_client, txns)
-        dryrun_result = self.algod_client.dryrun(dryrun_request)
-        dryrun_txns = dryrun_result['txns']
+    def call(self, method: abi.Method, args: list) -> ExecutionResult:
+        return self.execute(method, args)
 
+    def check(self, method: abi.Method, args: list, account: Account = None) -> CallCheck:
+        """Dryruns a call from account (the current sender by default) against the current state"""
+        start = phase_timers.now()
+        txns = self._prepare_txns(method, args, account)
+        start = phase_timers.record('prepare', start)
 
-        coverage: list[int] = []
-        for txn in dryrun_txns:
-            if not ('app-call-messages' in txn or 'app-call-trace' in txn):
+        dryrun_request = self._create_dryrun(txns)
+        dryrun_result = self.algod_client.dryrun(dryrun_request)
+        check = self._check_dryrun(txns, dryrun_result['txns'])
+        phase_timers.record('check', start)
+        return check
+
+    def check_batch(self, calls: list[tuple[abi.Method, list, Account]]) -> list[CallCheck]:
+        """Checks independent calls against the same state. A dryrun evaluates all of
+        its transactions as one group, so every call gets its own request and sees the
+        group size, group id and opcode budget it would have when sent alone. The
+        requests share the account and application state fetched once for the batch
+        and are sent concurrently."""
+        start = phase_timers.now()
+        prepared = [self._prepare_txns(method, args, account) for method, args, account in calls]
+        start = phase_timers.record('prepare', start)
+
+        shared = self._create_dryrun([txn for txns in prepared for txn in txns])
+        requests = [
+            DryrunRequest(
+                txns=txns,
+                accounts=shared.accounts,
+                apps=shared.apps,
+                protocol_version=shared.protocol_version,
+                round=shared.round,
+                latest_timestamp=shared.latest_timestamp
+            )
+            for txns in prepared
+        ]
+        with ThreadPoolExecutor(min(len(requests), transport.POOL_SIZE), 'algofuzz-dryrun') as executor:
+            results = list(executor.map(self.algod_client.dryrun, requests))
+
+        checks = [self._check_dryrun(txns, result['txns']) for txns, result in zip(prepared, results)]
+        phase_timers.record('check', start)
+        return checks
+
+    def _create_dryrun(self, txns: list):
+        dryrun_request = transaction.create_dryrun(self.algod_client, txns)
+        # the sdk collects accounts and apps in sets, order them so that the same call
+        # always sends the same request, as needed to replay it
+        dryrun_request.accounts.sort(key=lambda account: account['address'])
+        dryrun_request.apps.sort(key=lambda app: app['id'] if isinstance(app, dict) else 0)
+        return dryrun_request
+
+    def _check_dryrun(self, txns: list, dryrun_txns: list[dict]) -> CallCheck:
+        if len(dryrun_txns) != len(txns):
+            raise DryrunError(f'dryrun returned {len(dryrun_txns)} results for {len(txns)} transactions')
+
+        traces: list[list[int]] = []
+        cost = 0
+        for txn, dryrun_txn in zip(txns, dryrun_txns):
+            if txn.transaction.type != transaction.constants.appcall_txn:
                 continue
 
-            msgs = txn['app-call-messages']
+            # an app call without messages was not evaluated, it neither passed nor failed
+            if 'app-call-messages' not in dryrun_txn:
+                raise DryrunError(f'dryrun did not evaluate app call {txn.get_txid()}')
+
+            # older nodes report the cost as 'cost'
+            cost += dryrun_txn.get('budget-consumed', dryrun_txn.get('cost')) or 0
+            msgs = dryrun_txn['app-call-messages']
             if any([msg == 'REJECT' for msg in msgs]):
-                assertion_failed = self.foundAssertFail(msgs)
-                return None, None, assertion_failed
-            
-            lines = txn['app-call-trace']
-            for line in lines:
-                coverage.append(line['line'])
+                return CallCheck(txns, False, assertion_failed=self.foundAssertFail(msgs), cost=cost)
+
+            if 'app-call-trace' not in dryrun_txn:
+                raise DryrunError(f'dryrun did not trace app call {txn.get_txid()}')
+            traces.append([line['line'] for line in dryrun_txn['app-call-trace']])
+
+        return CallCheck(txns, True, coverage.collect(traces, self.coverage_size, self.track_edges), cost=cost)
+
+    def commit(self, check: CallCheck) -> ExecutionResult:
+        """Submits a checked call and waits for its confirmation"""
+        if not check.passed:
+            return ExecutionResult.rejection(check)
 
         try:
-            txid = self.algod_client.send_transactions(txns)
-            result = transaction.wait_for_confirmation(self.algod_client, txid, 0)
+            start = phase_timers.now()
+            self.algod_client.send_transactions(check.txns)
+            start = phase_timers.record('send', start)
+            # the app call is the last transaction of the group, its result holds the state deltas
+            result = transaction.wait_for_confirmation(self.algod_client, check.txns[-1].get_txid(), 0)
+            phase_timers.record('confirm', start)
         except AlgodHTTPError as e:
-            return None, None, self.foundAssertFail(e.args)
+            suggested_params_cache.observe_error(e)
+            return ExecutionResult.rejection(check, self.foundAssertFail(e.args))
         except Exception as e:
-            return None, None, False
+            return ExecutionResult.rejection(check, False)
         
-        return result, coverage, False
+        suggested_params_cache.observe_round(result.get('confirmed-round'))
+        balance_tracker.record(check.txns)
+        return ExecutionResult(result, check.coverage, False, check.cost)
 
     @staticmethod
     def foundAssertFail(msgs):
         return any([ASSERTION_FAIL_TEXT in msg for msg in msgs])
     
-    def call_no_cov(self, method, args):
-        txns = self._prepare_txns(method, args)
-        try:
-            txid = self.algod_client.send_transactions(txns)
-            result = transaction.wait_for_confirmation(self.algod_client, txid, 0)
-        except AlgodHTTPError as e:
-            return None, None, self.foundAssertFail(e.args)
-        except Exception as e:
-            return None, None, False
-        
-        return result, None, False
-
-    def _prepare_txns(self, method, args):
-        sp = self.algod_client.suggested_params()
+    def call_no_cov(self, method, args) -> ExecutionResult:
+        """Submits a call without checking it first, so without coverage and cost"""
+        return self.commit(CallCheck(self._prepare_txns(method, args), True))
+
+    def _suggested_params(self) -> transaction.SuggestedParams:
+        return get_suggested_params(self.algod_client)
+
+    def _next_note(self) -> bytes:
+        """Returns a unique note. Calls share cached suggested params, so without it two
+        calls with the same arguments would be the same transaction."""
+        return next(self._notes).to_bytes(8, 'big')
+
+    def _prepare_txns(self, method, args, account: Account = None):
+        sender = account.address if account is not None else self.sender
+        signer = account.signer if account is not None else self.signer
+        sp = self._suggested_params()
+        note = self._next_note()
         atc = atomic_transaction_composer.AtomicTransactionComposer()
 
         args_with_payments = []
         for arg in args:
             if isinstance(arg, PaymentObject):
-                payment = transaction.PaymentTxn(self.sender, sp, self.app_address, arg.amount)
-                args_with_payments.append(atomic_transaction_composer.TransactionWithSigner(payment, self.signer))
+                payment = transaction.PaymentTxn(sender, sp, self.app_address, arg.amount, note=note)
+                args_with_payments.append(atomic_transaction_composer.TransactionWithSigner(payment, signer))
                 continue
 
             if isinstance(arg, Account):
@@ -111,10 +207,11 @@ class FuzzAppClient(ApplicationClient):
         atc.add_method_call(
             app_id= self.app_id,
             method= method,
-            sender= self.sender,
+            sender= sender,
             sp= sp,
-            signer= self.signer,
-            method_args= args_with_payments
+            signer= signer,
+            method_args= args_with_payments,
+            note= note
         )
         txns = atc.gather_signatures()
         return txns
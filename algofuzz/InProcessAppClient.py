@@ -0,0 +1,135 @@
+import base64
+from algokit_utils import Account, ApplicationSpecification
+from algosdk import abi, transaction
+
+from algofuzz import avm, coverage
+from algofuzz.accounts import account_pool
+from algofuzz.backend import CallCheck, ExecutionBackend, ExecutionResult
+from algofuzz.FuzzAppClient import FuzzAppClient
+from algofuzz.ledger import Ledger
+from algofuzz.metrics import phase_timers
+from algofuzz.mutate import AccountMutator
+from algofuzz.utils import balance_tracker, create_app_spec, decode_state
+
+GENESIS_ID = 'algofuzz-inprocess'
+GENESIS_HASH = base64.b64encode(bytes(32)).decode()
+ACCOUNT_FUNDS = int(1e12)
+
+class InProcessAppClient(FuzzAppClient):
+    """Application client that executes calls with the in-process TEAL evaluator
+    against an in-memory ledger instead of a node."""
+
+    check_commits = True
+
+    def __init__(self, app_spec: ApplicationSpecification, ledger: Ledger = None, *, sender: str, signer) -> None:
+        super().__init__(None, app_spec, sender=sender, signer=signer)
+        self.ledger = ledger if ledger is not None else Ledger()
+        self.approval_program = avm.load_program(app_spec.approval_program)
+        self.clear_program = avm.load_program(app_spec.clear_program)
+
+        for account in AccountMutator.accs:
+            if self.ledger.balance(avm.address_bytes(account.address)) == 0:
+                self.ledger.fund(account.address, ACCOUNT_FUNDS)
+        balance_tracker.use_backend(self.ledger.account_info, self._fund)
+
+    @property
+    def approval_disassembled(self) -> list[str]:
+        return self.approval_program.listing
+
+    def _fund(self, amounts: dict[str, int]) -> None:
+        for address, amount in amounts.items():
+            self.ledger.fund(address, amount)
+
+    def create(self, *args, **kwargs):
+        txn = transaction.ApplicationCreateTxn(
+            self.sender,
+            self._suggested_params(),
+            transaction.OnComplete.NoOpOC,
+            self.approval_program.source.encode(),
+            self.clear_program.source.encode(),
+            self.app_spec.global_state_schema,
+            self.app_spec.local_state_schema,
+        )
+        result = self.ledger.apply_group([txn])
+        if not result.passed:
+            raise Exception(f'Creating application failed: {result.message}')
+
+        self.app_id = result.txns[0].created_app
+        return result.txns[0].to_pending()
+
+    def opt_in(self, *args, **kwargs):
+        txn = transaction.ApplicationOptInTxn(self.sender, self._suggested_params(), self.app_id)
+        result = self.ledger.apply_group([txn])
+        if not result.passed:
+            raise Exception(f'Opt in failed: {result.message}')
+
+        return result.txns[0].to_pending()
+
+    def check(self, method: abi.Method, args: list, account: Account = None) -> CallCheck:
+        """Executes a call, a passing call is applied to the ledger right away"""
+        start = phase_timers.now()
+        txns = self._prepare_txns(method, args, account)
+        start = phase_timers.record('prepare', start)
+        result = self.ledger.apply_group(txns)
+        cost = sum(txn.cost for txn in result.txns if txn.is_app_call)
+        if not result.passed:
+            phase_timers.record('check', start)
+            return CallCheck(txns, False, assertion_failed=result.assertion_failed, cost=cost)
+
+        traces = [txn.trace for txn in result.txns if txn.is_app_call]
+        check = CallCheck(
+            txns,
+            True,
+            coverage.collect(traces, self.coverage_size, self.track_edges),
+            result=result.txns[-1].to_pending(),
+            cost=cost
+        )
+        phase_timers.record('check', start)
+        return check
+
+    # checks commit, so every call sees the state left by the ones before it
+    check_batch = ExecutionBackend.check_batch
+
+    def commit(self, check: CallCheck) -> ExecutionResult:
+        if not check.passed:
+            return ExecutionResult.rejection(check)
+        balance_tracker.record(check.txns)
+        return ExecutionResult(check.result, check.coverage, False, check.cost)
+
+    def call_no_cov(self, method, args) -> ExecutionResult:
+        execution = self.execute(method, args)
+        execution.coverage = None
+        return execution
+
+    def get_global_state(self, *, raw: bool = False) -> dict[bytes | str, bytes | str | int]:
+        state = self.ledger.global_state(self.app_id)
+        return state if raw else decode_state(state)
+
+    def get_local_state(self, account: str | None = None, *, raw: bool = False) -> dict[bytes | str, bytes | str | int]:
+        state = self.ledger.local_state(account or self.sender, self.app_id)
+        return state if raw else decode_state(state)
+
+    def _suggested_params(self) -> transaction.SuggestedParams:
+        return transaction.SuggestedParams(
+            fee=avm.MIN_TXN_FEE,
+            first=self.ledger.round,
+            last=self.ledger.round + 1000,
+            gh=GENESIS_HASH,
+            gen=GENESIS_ID,
+            flat_fee=True,
+            min_fee=avm.MIN_TXN_FEE
+        )
+
+    @staticmethod
+    def from_compiled(approval: str, clear: str, contract: str, schema, ledger: Ledger = None) -> "InProcessAppClient":
+        app_spec = create_app_spec(approval, clear, contract, schema)
+        if not account_pool.created:
+            # the accounts are funded on the in-memory ledger, not by the dispenser
+            account_pool.configure(fund=False)
+        account: Account = AccountMutator().seed()
+        return InProcessAppClient(
+            app_spec,
+            ledger,
+            sender= account.address,
+            signer= account.signer
+        )
\ No newline at end of file
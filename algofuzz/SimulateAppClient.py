@@ -0,0 +1,125 @@
+import base64
+from algokit_utils import Account
+from algosdk import abi, encoding, transaction
+from algosdk.error import AlgodHTTPError
+
+from algofuzz import coverage
+from algofuzz.backend import CallCheck, ExecutionBackend, ExecutionResult
+from algofuzz.FuzzAppClient import FuzzAppClient
+from algofuzz.metrics import phase_timers
+from algofuzz.mutate import AccountMutator
+from algofuzz.transport import get_algod_client
+from algofuzz.utils import balance_tracker, create_app_spec, suggested_params_cache
+
+class SimulateAppClient(FuzzAppClient):
+    """Application client that gets coverage and rejection of a call from a single
+    simulate request with execution traces enabled, and only submits calls that passed.
+
+    :param wait_for_confirmation: Wait until a submitted call is confirmed, so the next
+    simulate runs against its state. Only a node in dev mode, like localnet by default,
+    confirms a transaction before the submission returns and can do without.
+    """
+
+    def __init__(self, *args, wait_for_confirmation: bool = True, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.wait_for_confirmation = wait_for_confirmation
+
+    @property
+    def approval_line_count(self) -> int:
+        return len(self._pc_to_line_index)
+
+    @property
+    def _pc_to_line_index(self) -> dict[int, int]:
+        """Maps program counters to an index over the TEAL source lines that hold opcodes"""
+        if getattr(self, '_pc_map_hash', None) != self.approval.binary_hash:
+            source_map = self.approval.source_map
+            lines = sorted(source_map.line_to_pc.keys())
+            index = {line: i for i, line in enumerate(lines)}
+            self._pc_map = {pc: index[line] for pc, line in source_map.pc_to_line.items()}
+            self._pc_map_hash = self.approval.binary_hash
+
+        return self._pc_map
+
+    def check(self, method: abi.Method, args: list, account: Account = None) -> CallCheck:
+        start = phase_timers.now()
+        txns = self._prepare_txns(method, args, account)
+        start = phase_timers.record('prepare', start)
+
+        try:
+            simulate_result = self.simulate(txns)
+        except AlgodHTTPError as e:
+            return CallCheck(txns, False, assertion_failed=self.foundAssertFail(e.args))
+        finally:
+            phase_timers.record('check', start)
+
+        suggested_params_cache.observe_round(simulate_result.get('last-round'))
+        group = simulate_result['txn-groups'][0]
+        cost = sum(txn_result.get('app-budget-consumed', 0) for txn_result in group['txn-results'])
+        failure = group.get('failure-message')
+        if failure:
+            return CallCheck(txns, False, assertion_failed=self.foundAssertFail([failure]), cost=cost)
+
+        pc_map = self._pc_to_line_index
+        traces: list[list[int]] = []
+        for txn_result in group['txn-results']:
+            trace = txn_result.get('exec-trace', {}).get('approval-program-trace', [])
+            if trace:
+                traces.append([pc_map[step['pc']] for step in trace])
+
+        return CallCheck(
+            txns,
+            True,
+            coverage.collect(traces, self.coverage_size, self.track_edges),
+            result=group['txn-results'][-1]['txn-result'],
+            cost=cost
+        )
+
+    def commit(self, check: CallCheck) -> ExecutionResult:
+        if not check.passed:
+            return ExecutionResult.rejection(check)
+
+        try:
+            start = phase_timers.now()
+            txid = self.algod_client.send_transactions(check.txns)
+            start = phase_timers.record('send', start)
+            if self.wait_for_confirmation:
+                transaction.wait_for_confirmation(self.algod_client, txid, 0)
+                phase_timers.record('confirm', start)
+        except AlgodHTTPError as e:
+            suggested_params_cache.observe_error(e)
+            return ExecutionResult.rejection(check, self.foundAssertFail(e.args))
+        except Exception as e:
+            return ExecutionResult.rejection(check, False)
+
+        balance_tracker.record(check.txns)
+        return ExecutionResult(check.result, check.coverage, False, check.cost)
+
+    # simulate evaluates a single group per request, so there is nothing to pack and
+    # calls are checked one by one, up to the first one that passes
+    check_batch = ExecutionBackend.check_batch
+
+    def simulate(self, txns: list[transaction.SignedTransaction]) -> dict:
+        request = {
+            'txn-groups': [{'txns': [txn.dictify() for txn in txns]}],
+            'exec-trace-config': {'enable': True},
+        }
+        body = base64.b64decode(encoding.msgpack_encode(request))
+        return self.algod_client.algod_request(
+            'POST',
+            '/transactions/simulate',
+            data=body,
+            headers={'Content-Type': 'application/msgpack'}
+        )
+
+    @staticmethod
+    def from_compiled(approval: str, clear: str, contract: str, schema, wait_for_confirmation: bool = True) -> "SimulateAppClient":
+        app_spec = create_app_spec(approval, clear, contract, schema)
+        algod_client = get_algod_client()
+        account: Account = AccountMutator().seed()
+        return SimulateAppClient(
+            algod_client,
+            app_spec,
+            sender= account.address,
+            signer= account.signer,
+            wait_for_confirmation= wait_for_confirmation
+        )
\ No newline at end of file
@@ -0,0 +1,132 @@
+"""Pool of the accounts the fuzzer sends its calls from.
+
+Accounts are created on first use rather than on import, and funded together with
+groups of up to 16 payments. A pool can be persisted to a file, with its private keys
+encrypted by a password (argon2id key derivation and a NaCl secret box), and reused by
+later runs, which then only top up accounts that ran low.
+"""
+import base64
+import json
+import os
+import threading
+from pathlib import Path
+
+import nacl.exceptions
+import nacl.pwhash
+import nacl.secret
+import nacl.utils
+from algokit_utils import Account
+from algosdk import mnemonic
+
+from algofuzz.transport import get_algod_client
+from algofuzz.utils import fund_accounts, new_account
+
+ACCOUNT_POOL_SIZE = int(os.getenv("ALGOFUZZ_ACCOUNTS", default="3"))
+ACCOUNT_FUNDS = int(2e8)
+PASSWORD_ENV = "ALGOFUZZ_ACCOUNTS_PASSWORD"
+
+
+class AccountPool:
+    """Accounts of a fuzzing run, created and funded when they are first needed.
+
+    :param size: Number of accounts
+    :param funds: Amount every account is funded with (and topped up to when reused)
+    :param fund: Whether to fund the accounts from the dispenser, backends with their own ledger fund them there
+    :param path: File to load the accounts from and save new accounts to
+    :param password: Password encrypting the file, defaults to the ALGOFUZZ_ACCOUNTS_PASSWORD variable
+    """
+
+    def __init__(self, size: int = ACCOUNT_POOL_SIZE, funds: int = ACCOUNT_FUNDS, fund: bool = True, path: Path = None, password: str = None) -> None:
+        self.size = size
+        self.funds = funds
+        self.fund = fund
+        self.path = Path(path) if path is not None else None
+        self.password = password
+        self._accounts: list[Account] | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def created(self) -> bool:
+        return self._accounts is not None
+
+    @property
+    def accounts(self) -> list[Account]:
+        if self._accounts is None:
+            with self._lock:
+                if self._accounts is None:
+                    self._accounts = self._create()
+        return self._accounts
+
+    def configure(self, **options) -> None:
+        """Changes the options of the pool, which must not have been created yet"""
+        if self.created:
+            raise RuntimeError("The account pool has already been created")
+        for name, value in options.items():
+            if not hasattr(self, name) or name.startswith('_'):
+                raise TypeError(f"Unknown account pool option {name}")
+            setattr(self, name, Path(value) if name == 'path' and value is not None else value)
+
+    def _create(self) -> list[Account]:
+        accounts = self._load() if self.path is not None and self.path.is_file() else []
+        loaded = len(accounts)
+        accounts = accounts[:self.size] + [new_account() for _ in range(self.size - loaded)]
+
+        if self.fund:
+            self._fund(accounts, loaded)
+        if self.path is not None and len(accounts) > loaded:
+            self._save(accounts)
+        return accounts
+
+    def _fund(self, accounts: list[Account], loaded: int) -> None:
+        algod_client = get_algod_client()
+        addresses = [account.address for account in accounts[loaded:]]
+        # reused accounts only need a top up if they ran low, e.g. after a network reset
+        for account in accounts[:loaded]:
+            if algod_client.account_info(account.address).get('amount', 0) < self.funds // 2:
+                addresses.append(account.address)
+        fund_accounts(algod_client, addresses, self.funds)
+
+    def _secret_box(self, salt: bytes) -> nacl.secret.SecretBox:
+        password = self.password if self.password is not None else os.getenv(PASSWORD_ENV)
+        if not password:
+            raise ValueError(f"A password is needed to persist accounts, set {PASSWORD_ENV}")
+        key = nacl.pwhash.argon2id.kdf(
+            nacl.secret.SecretBox.KEY_SIZE,
+            password.encode(),
+            salt,
+            opslimit=nacl.pwhash.argon2id.OPSLIMIT_MODERATE,
+            memlimit=nacl.pwhash.argon2id.MEMLIMIT_MODERATE
+        )
+        return nacl.secret.SecretBox(key)
+
+    def _load(self) -> list[Account]:
+        data = json.loads(self.path.read_text())
+        salt = base64.b64decode(data['salt'])
+        try:
+            keys = json.loads(self._secret_box(salt).decrypt(base64.b64decode(data['box'])))
+        except nacl.exceptions.CryptoError:
+            raise ValueError(f"Cannot decrypt the accounts of {self.path}, the password is wrong") from None
+        return [Account(private_key=mnemonic.to_private_key(words)) for words in keys]
+
+    def _save(self, accounts: list[Account]) -> None:
+        salt = nacl.utils.random(nacl.pwhash.argon2id.SALTBYTES)
+        keys = json.dumps([mnemonic.from_private_key(account.private_key) for account in accounts]).encode()
+        data = {
+            'salt': base64.b64encode(salt).decode(),
+            'box': base64.b64encode(self._secret_box(salt).encrypt(keys)).decode(),
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f'.{self.path.name}.tmp')
+        with open(os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp, self.path)
+
+
+account_pool = AccountPool()
+
+
+class PoolAccounts:
+    """Class attribute resolving to the accounts of the shared pool"""
+
+    def __get__(self, obj, owner=None) -> list[Account]:
+        return account_pool.accounts
\ No newline at end of file
@@ -0,0 +1,1649 @@
+"""A pure-Python evaluator for TEAL (AVM v8) application programs.
+
+Programs are loaded straight from TEAL source. Every instruction and label
+gets its own line in a normalized listing (line 0 is the version pragma),
+in the layout of algod's disassembly, so coverage produced here has the same
+shape as the one produced over HTTP. The line numbers are not the same though:
+algod disassembles the assembled bytecode, where the assembler adds `intcblock`
+and `bytecblock` lines and replaces `int` and `byte` with `intc`/`bytec`
+references, while the listing keeps the source as written. Coverage of the
+in-process backend and the stand-in can only be compared with itself.
+"""
+import base64
+import hashlib
+import math
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Callable
+
+from algosdk import encoding, logic
+from algosdk.abi import Method
+
+MAX_UINT = 2 ** 64 - 1
+MAX_BYTES = 4096
+MAX_KEY_LEN = 64
+MAX_KEY_VALUE_LEN = 128
+APP_CALL_BUDGET = 700
+MAX_INNER_TXNS = 16
+MIN_TXN_FEE = 1000
+MIN_BALANCE = 100_000
+ZERO_ADDRESS = bytes(32)
+
+NAMED_INTS = {
+    # OnComplete
+    'NoOp': 0,
+    'OptIn': 1,
+    'CloseOut': 2,
+    'ClearState': 3,
+    'UpdateApplication': 4,
+    'DeleteApplication': 5,
+    # TypeEnum
+    'unknown': 0,
+    'pay': 1,
+    'keyreg': 2,
+    'acfg': 3,
+    'axfer': 4,
+    'afrz': 5,
+    'appl': 6,
+}
+
+TYPE_ENUMS = {'pay': 1, 'keyreg': 2, 'acfg': 3, 'axfer': 4, 'afrz': 5, 'appl': 6}
+
+OP_COSTS = {
+    'sha256': 35,
+    'keccak256': 130,
+    'sha512_256': 45,
+    'sqrt': 4,
+    'divmodw': 20,
+    'divw': 1,
+    'expw': 10,
+    'bsqrt': 40,
+    'b+': 10,
+    'b-': 10,
+    'b/': 20,
+    'b*': 20,
+    'b%': 20,
+    'b|': 6,
+    'b&': 6,
+    'b^': 6,
+    'b~': 4,
+}
+
+
+Value = int | bytes
+
+
+class TealError(Exception):
+    """Raised when a program fails, carries the algod style message"""
+
+    def __init__(self, message: str, pc: int = None) -> None:
+        super().__init__(message)
+        self.message = message
+        self.pc = pc
+
+
+class Unsupported(Exception):
+    """Raised for opcodes, fields and transactions the evaluator does not implement.
+    It is not a `TealError`, so it stops the backend instead of rejecting the call."""
+
+    def __init__(self, message: str) -> None:
+        super().__init__(message)
+        self.message = message
+
+
+@dataclass
+class Instruction:
+    line: int
+    op: str
+    args: list[str]
+    handler: Callable = None
+    imm: object = None
+
+
+@dataclass
+class EvalResult:
+    """Outcome of a single program evaluation"""
+    passed: bool
+    trace: list[int]
+    messages: list[str]
+    logs: list[bytes] = field(default_factory=list)
+    cost: int = 0
+    error: str = None
+
+    @property
+    def assertion_failed(self) -> bool:
+        return self.error is not None and self.error.startswith('assert failed')
+
+
+def method_selector(signature: str) -> bytes:
+    return Method.from_signature(signature).get_selector()
+
+
+def checksum(data: bytes) -> bytes:
+    return encoding.checksum(data)
+
+
+def address_bytes(address: str) -> bytes:
+    return encoding.decode_address(address)
+
+
+def address_string(raw: bytes) -> str:
+    return encoding.encode_address(raw)
+
+
+def app_address(app_id: int) -> bytes:
+    return address_bytes(logic.get_application_address(app_id))
+
+
+# Source parsing
+
+_TOKEN = re.compile(r'"(?:[^"\\]|\\.)*"|\S+')
+
+
+def _strip_comment(line: str) -> str:
+    in_string = False
+    escaped = False
+    for i, char in enumerate(line):
+        if escaped:
+            escaped = False
+            continue
+        if char == '\\':
+            escaped = True
+            continue
+        if char == '"':
+            in_string = not in_string
+            continue
+        if not in_string and line.startswith('//', i):
+            return line[:i]
+    return line
+
+
+_ESCAPES = {'n': b'\n', 'r': b'\r', 't': b'\t', '"': b'"', '\\': b'\\'}
+
+
+def _parse_string(token: str) -> bytes:
+    body = token[1:-1]
+    out = bytearray()
+    i = 0
+    while i < len(body):
+        char = body[i]
+        if char != '\\':
+            out += char.encode()
+            i += 1
+            continue
+        esc = body[i + 1]
+        if esc == 'x':
+            out.append(int(body[i + 2:i + 4], 16))
+            i += 4
+            continue
+        out += _ESCAPES[esc]
+        i += 2
+    return bytes(out)
+
+
+def parse_bytes(args: list[str]) -> tuple[bytes, int]:
+    """Parses a byte constant from immediates, returns the value and number of tokens consumed"""
+    token = args[0]
+    if token.startswith('"'):
+        return _parse_string(token), 1
+    if token.startswith('0x'):
+        return bytes.fromhex(token[2:]), 1
+
+    for prefix in ('base64', 'b64'):
+        if token in (prefix,):
+            return base64.b64decode(args[1]), 2
+        if token.startswith(prefix + '(') and token.endswith(')'):
+            return base64.b64decode(token[len(prefix) + 1:-1]), 1
+
+    for prefix in ('base32', 'b32'):
+        if token in (prefix,):
+            return _b32decode(args[1]), 2
+        if token.startswith(prefix + '(') and token.endswith(')'):
+            return _b32decode(token[len(prefix) + 1:-1]), 1
+
+    raise TealError(f'unable to parse byte constant {token}')
+
+
+def _b32decode(text: str) -> bytes:
+    return base64.b32decode(text + '=' * (-len(text) % 8))
+
+
+def parse_int(token: str) -> int:
+    if token in NAMED_INTS:
+        return NAMED_INTS[token]
+    return int(token, 0)
+
+
+class Program:
+    """A TEAL program prepared for evaluation"""
+
+    def __init__(self, source: str) -> None:
+        self.source = source
+        self.version = 1
+        self.listing: list[str] = []
+        self.instructions: list[Instruction] = []
+        self.labels: dict[str, int] = {}
+        self._parse(source)
+        self._link()
+
+    @property
+    def line_count(self) -> int:
+        return len(self.listing)
+
+    def _parse(self, source: str) -> None:
+        for raw in source.split('\n'):
+            text = _strip_comment(raw).strip()
+            if not text:
+                continue
+
+            if text.startswith('#pragma'):
+                parts = text.split()
+                if len(parts) == 3 and parts[1] == 'version':
+                    self.version = int(parts[2])
+                self.listing.append(f'#pragma version {self.version}')
+                continue
+
+            tokens = _TOKEN.findall(text)
+            while tokens and tokens[0].endswith(':') and not tokens[0].startswith('"'):
+                label = tokens.pop(0)[:-1]
+                self.labels[label] = len(self.instructions)
+                self.listing.append(f'{label}:')
+
+            if not tokens:
+                continue
+
+            self.instructions.append(Instruction(len(self.listing), tokens[0], tokens[1:]))
+            self.listing.append(' '.join(tokens))
+
+        if not self.listing or not self.listing[0].startswith('#pragma'):
+            self.listing.insert(0, f'#pragma version {self.version}')
+            for instruction in self.instructions:
+                instruction.line += 1
+
+    def _link(self) -> None:
+        for instruction in self.instructions:
+            handler, imm = _assemble(self, instruction)
+            instruction.handler = handler
+            instruction.imm = imm
+
+    def label(self, name: str) -> int:
+        if name not in self.labels:
+            raise TealError(f'reference to undefined label "{name}"')
+        return self.labels[name]
+
+
+@lru_cache(maxsize=64)
+def load_program(source: bytes | str) -> Program:
+    """Returns the (cached) program for TEAL source text or bytes"""
+    if isinstance(source, bytes):
+        source = source.decode()
+    return Program(source)
+
+
+# Evaluation context
+
+
+class Evaluation:
+    """Evaluates one program for one transaction of a group against a ledger view.
+
+    The ledger view must provide the methods used below (`global_get`, `local_get`,
+    `balance`, ...), see `algofuzz.ledger.LedgerView`.
+    """
+
+    def __init__(self, program: Program, view, group: list, group_index: int, app_id: int, budget: list[int]) -> None:
+        self.program = program
+        self.view = view
+        self.group = group
+        self.group_index = group_index
+        self.txn = group[group_index]
+        self.app_id = app_id
+        self.budget = budget
+        self.stack: list[Value] = []
+        self.scratch: list[Value] = [0] * 256
+        self.callstack: list[tuple[int, int]] = []
+        self.trace: list[int] = []
+        self.logs: list[bytes] = []
+        self.intc: list[int] = []
+        self.bytec: list[bytes] = []
+        self.inner: list[dict] = []
+        self.inner_submitted: list[dict] = []
+        self.inner_count = 0
+        self.cost = 0
+        self.finished = False
+        self.pc = 0
+        self._available_accounts: set[bytes] | None = None
+
+    def run(self) -> EvalResult:
+        instructions = self.program.instructions
+        trace = self.trace
+        count = len(instructions)
+        try:
+            while self.pc < count:
+                instruction = instructions[self.pc]
+                trace.append(instruction.line)
+                self.cost += OP_COSTS.get(instruction.op, 1)
+                if self.cost > self.budget[0]:
+                    raise TealError(f'dynamic cost budget exceeded, executing {instruction.op}')
+                next_pc = instruction.handler(self, instruction.imm)
+                if self.finished:
+                    break
+                self.pc = self.pc + 1 if next_pc is None else next_pc
+        except TealError as e:
+            self.budget[0] -= self.cost
+            message = f'{e.message} pc={self.pc}' if e.message == 'assert failed' else e.message
+            return EvalResult(False, trace, ['REJECT', message], self.logs, self.cost, message)
+        except Unsupported:
+            raise
+        except Exception as e:
+            # a bug of the evaluator on an unusual program rejects the call, as algod
+            # would for any input it cannot evaluate, instead of stopping the campaign
+            self.budget[0] -= self.cost
+            message = f'evaluation error at pc={self.pc}: {type(e).__name__}: {e}'
+            return EvalResult(False, trace, ['REJECT', message], self.logs, self.cost, message)
+
+        self.budget[0] -= self.cost
+        if len(self.stack) != 1:
+            message = f'stack len is {len(self.stack)} instead of 1'
+            return EvalResult(False, trace, ['REJECT', message], self.logs, self.cost, message)
+
+        top = self.stack[0]
+        if not isinstance(top, int):
+            message = 'stack finished with bytes not int'
+            return EvalResult(False, trace, ['REJECT', message], self.logs, self.cost, message)
+
+        if top == 0:
+            return EvalResult(False, trace, ['REJECT'], self.logs, self.cost)
+
+        return EvalResult(True, trace, ['PASS'], self.logs, self.cost)
+
+    # stack helpers
+
+    def push(self, value: Value) -> None:
+        if isinstance(value, bytes) and len(value) > MAX_BYTES:
+            raise TealError(f'bytes too long: {len(value)}')
+        self.stack.append(value)
+
+    def pop(self) -> Value:
+        if not self.stack:
+            raise TealError('stack underflow')
+        return self.stack.pop()
+
+    def pop_uint(self, op: str = '') -> int:
+        value = self.pop()
+        if not isinstance(value, int):
+            raise TealError(f'{op} arg wanted type uint64 got []byte')
+        return value
+
+    def pop_bytes(self, op: str = '') -> bytes:
+        value = self.pop()
+        if not isinstance(value, bytes):
+            raise TealError(f'{op} arg wanted type []byte got uint64')
+        return value
+
+    def pop_uints(self, n: int, op: str) -> list[int]:
+        values = [self.pop_uint(op) for _ in range(n)]
+        values.reverse()
+        return values
+
+    def pop_bytess(self, n: int, op: str) -> list[bytes]:
+        values = [self.pop_bytes(op) for _ in range(n)]
+        values.reverse()
+        return values
+
+    def peek_depth(self, depth: int) -> None:
+        if depth >= len(self.stack):
+            raise TealError(f'dig {depth} with stack size = {len(self.stack)}')
+
+    # reference helpers
+
+    def resolve_account(self, ref: Value) -> bytes:
+        accounts = self.txn_accounts()
+        if isinstance(ref, int):
+            if ref >= len(accounts):
+                raise TealError(f'invalid Account reference {ref}')
+            return accounts[ref]
+        if len(ref) != 32:
+            raise TealError('invalid Account reference')
+        if ref not in self.available_accounts():
+            raise TealError(f'unavailable Account {address_string(ref)}')
+        return ref
+
+    def resolve_app(self, ref: int) -> int:
+        if ref == 0:
+            return self.app_id
+        apps = self.txn.foreign_apps or []
+        if ref <= len(apps):
+            return apps[ref - 1]
+        if ref not in self.available_apps():
+            raise TealError(f'unavailable App {ref}')
+        return ref
+
+    def txn_accounts(self) -> list[bytes]:
+        accounts = [address_bytes(self.txn.sender)]
+        accounts.extend(address_bytes(a) for a in (self.txn.accounts or []))
+        return accounts
+
+    def available_apps(self) -> set[int]:
+        """The current app and the apps referenced by the transactions of the group"""
+        apps = {self.app_id}
+        for txn in self.group:
+            if txn.type == 'appl':
+                apps.add(txn.index or 0)
+                apps.update(txn.foreign_apps or [])
+        apps.discard(0)
+        return apps
+
+    def available_accounts(self) -> set[bytes]:
+        """Accounts a program may read: the senders, receivers and referenced accounts of
+        the transactions of the group and the addresses of the available apps"""
+        if self._available_accounts is None:
+            accounts = {app_address(app) for app in self.available_apps()}
+            for txn in self.group:
+                addresses = [txn.sender, *(getattr(txn, 'accounts', None) or [])]
+                addresses += [getattr(txn, name, None) for name in ('receiver', 'close_remainder_to')]
+                accounts.update(address_bytes(address) for address in addresses if address)
+            self._available_accounts = accounts
+        return self._available_accounts
+
+    def group_txn(self, group_index: int, op: str):
+        if group_index >= len(self.group):
+            raise TealError(f'{op} lookup TxnGroup[{group_index}] but it only has {len(self.group)}')
+        return self.group[group_index]
+
+
+# Transaction fields
+
+
+def _txn_type(txn) -> bytes:
+    return txn.type.encode()
+
+
+def _addr(value: str | None) -> bytes:
+    return address_bytes(value) if value else ZERO_ADDRESS
+
+
+def _schema(schema, attr: str) -> int:
+    if schema is None:
+        return 0
+    return getattr(schema, attr) or 0
+
+
+def _item(name: str, items: list, index: int | None) -> Value:
+    if index is None or index >= len(items):
+        raise TealError(f'invalid {name} index {index}')
+    return items[index]
+
+
+def txn_field(ctx: Evaluation, txn, name: str, index: int = None, group_index: int = None) -> Value:
+    match name:
+        case 'Sender': return address_bytes(txn.sender)
+        case 'Fee': return txn.fee
+        case 'FirstValid': return txn.first_valid_round
+        case 'FirstValidTime': raise TealError('FirstValidTime is not supported')
+        case 'LastValid': return txn.last_valid_round
+        case 'Note': return txn.note or b''
+        case 'Lease': return txn.lease or ZERO_ADDRESS
+        case 'Receiver': return _addr(getattr(txn, 'receiver', None))
+        case 'Amount': return getattr(txn, 'amt', 0) or 0
+        case 'CloseRemainderTo': return _addr(getattr(txn, 'close_remainder_to', None))
+        case 'Type': return _txn_type(txn)
+        case 'TypeEnum': return TYPE_ENUMS.get(txn.type, 0)
+        case 'GroupIndex': return group_index
+        case 'TxID': return _b32decode(txn.get_txid())
+        case 'ApplicationID': return getattr(txn, 'index', 0) or 0
+        case 'OnCompletion': return int(getattr(txn, 'on_complete', 0) or 0)
+        case 'ApplicationArgs':
+            return _item(name, getattr(txn, 'app_args', None) or [], index)
+        case 'NumAppArgs': return len(getattr(txn, 'app_args', None) or [])
+        case 'Accounts':
+            return address_bytes(_item(name, [txn.sender, *(getattr(txn, 'accounts', None) or [])], index))
+        case 'NumAccounts': return len(getattr(txn, 'accounts', None) or [])
+        case 'Applications':
+            return _item(name, [getattr(txn, 'index', 0) or 0, *(getattr(txn, 'foreign_apps', None) or [])], index)
+        case 'NumApplications': return len(getattr(txn, 'foreign_apps', None) or [])
+        case 'Assets': return _item(name, getattr(txn, 'foreign_assets', None) or [], index)
+        case 'NumAssets': return len(getattr(txn, 'foreign_assets', None) or [])
+        case 'ApprovalProgram': return getattr(txn, 'approval_program', None) or b''
+        case 'ClearStateProgram': return getattr(txn, 'clear_program', None) or b''
+        case 'RekeyTo': return _addr(txn.rekey_to)
+        case 'GlobalNumUint': return _schema(getattr(txn, 'global_schema', None), 'num_uints')
+        case 'GlobalNumByteSlice': return _schema(getattr(txn, 'global_schema', None), 'num_byte_slices')
+        case 'LocalNumUint': return _schema(getattr(txn, 'local_schema', None), 'num_uints')
+        case 'LocalNumByteSlice': return _schema(getattr(txn, 'local_schema', None), 'num_byte_slices')
+        case 'ExtraProgramPages': return getattr(txn, 'extra_pages', 0) or 0
+        case 'Nonparticipation': return 0
+        case 'NumLogs' | 'Logs' | 'CreatedApplicationID' | 'LastLog':
+            raise TealError(f'{name} is only available for inner transactions')
+        case 'XferAsset' | 'AssetAmount' | 'ConfigAsset' | 'FreezeAsset':
+            return getattr(txn, {
+                'XferAsset': 'index', 'AssetAmount': 'amount', 'ConfigAsset': 'index', 'FreezeAsset': 'index'
+            }[name], 0) or 0
+        case 'AssetSender' | 'AssetReceiver' | 'AssetCloseTo' | 'FreezeAssetAccount':
+            return _addr(getattr(txn, {
+                'AssetSender': 'revocation_target', 'AssetReceiver': 'receiver',
+                'AssetCloseTo': 'close_assets_to', 'FreezeAssetAccount': 'target'
+            }[name], None))
+    raise Unsupported(f'txn field {name} is not supported')
+
+
+def inner_field(inner: dict, name: str, index: int = None) -> Value:
+    if name in ('Logs',):
+        return _item(name, inner.get('Logs', []), index)
+    if name == 'NumLogs':
+        return len(inner.get('Logs', []))
+    if name == 'LastLog':
+        logs = inner.get('Logs', [])
+        return logs[-1] if logs else b''
+    if name in ('ApplicationArgs', 'Accounts', 'Applications', 'Assets'):
+        return _item(name, inner.get(name, []), index)
+    if name in inner:
+        return inner[name]
+    if name in ('Sender', 'Receiver', 'CloseRemainderTo', 'RekeyTo', 'AssetReceiver', 'AssetSender', 'AssetCloseTo'):
+        return ZERO_ADDRESS
+    if name in ('Note', 'Type'):
+        return b''
+    return 0
+
+
+def global_field(ctx: Evaluation, name: str) -> Value:
+    view = ctx.view
+    match name:
+        case 'MinTxnFee': return MIN_TXN_FEE
+        case 'MinBalance': return MIN_BALANCE
+        case 'MaxTxnLife': return 1000
+        case 'ZeroAddress': return ZERO_ADDRESS
+        case 'GroupSize': return len(ctx.group)
+        case 'LogicSigVersion': return 8
+        case 'Round': return view.round
+        case 'LatestTimestamp': return view.timestamp
+        case 'CurrentApplicationID': return ctx.app_id
+        case 'CreatorAddress': return view.app_creator(ctx.app_id)
+        case 'CurrentApplicationAddress': return app_address(ctx.app_id)
+        case 'GroupID': return ctx.txn.group or bytes(32)
+        case 'OpcodeBudget': return ctx.budget[0] - ctx.cost
+        case 'CallerApplicationID': return 0
+        case 'CallerApplicationAddress': return ZERO_ADDRESS
+    raise Unsupported(f'global field {name} is not supported')
+
+
+# Opcodes
+
+OPS: dict[str, Callable] = {}
+ASSEMBLERS: dict[str, Callable] = {}
+
+
+def op(*names: str, assemble: Callable = None):
+    def decorator(fn):
+        for name in names:
+            OPS[name] = fn
+            if assemble is not None:
+                ASSEMBLERS[name] = assemble
+        return fn
+    return decorator
+
+
+def _assemble(program: Program, instruction: Instruction) -> tuple[Callable, object]:
+    name = instruction.op
+    if name not in OPS:
+        return _unsupported, name
+    assembler = ASSEMBLERS.get(name)
+    imm = assembler(program, instruction) if assembler else None
+    return OPS[name], imm
+
+
+def _unsupported(ctx: Evaluation, name: str):
+    raise Unsupported(f'opcode {name} is not supported by the in-process evaluator')
+
+
+def _imm_int(program, instruction):
+    return parse_int(instruction.args[0])
+
+
+def _imm_ints(program, instruction):
+    return [parse_int(arg) for arg in instruction.args]
+
+
+def _imm_bytes(program, instruction):
+    return parse_bytes(instruction.args)[0]
+
+
+def _imm_bytess(program, instruction):
+    values = []
+    args = instruction.args
+    while args:
+        value, used = parse_bytes(args)
+        values.append(value)
+        args = args[used:]
+    return values
+
+
+def _imm_label(program, instruction):
+    return program.label(instruction.args[0])
+
+
+def _imm_labels(program, instruction):
+    return [program.label(arg) for arg in instruction.args]
+
+
+def _imm_name(program, instruction):
+    return instruction.args[0]
+
+
+def _imm_args(program, instruction):
+    return instruction.args
+
+
+# constants
+
+
+@op('int', 'pushint', assemble=_imm_int)
+def op_int(ctx, value):
+    ctx.stack.append(value)
+
+
+@op('pushints', assemble=_imm_ints)
+def op_pushints(ctx, values):
+    ctx.stack.extend(values)
+
+
+@op('byte', 'pushbytes', assemble=_imm_bytes)
+def op_byte(ctx, value):
+    ctx.stack.append(value)
+
+
+@op('pushbytess', assemble=_imm_bytess)
+def op_pushbytess(ctx, values):
+    ctx.stack.extend(values)
+
+
+@op('addr', assemble=lambda p, i: address_bytes(i.args[0]))
+def op_addr(ctx, value):
+    ctx.stack.append(value)
+
+
+@op('method', assemble=lambda p, i: method_selector(_parse_string(i.args[0]).decode()))
+def op_method(ctx, value):
+    ctx.stack.append(value)
+
+
+@op('intcblock', assemble=_imm_ints)
+def op_intcblock(ctx, values):
+    ctx.intc = values
+
+
+@op('bytecblock', assemble=_imm_bytess)
+def op_bytecblock(ctx, values):
+    ctx.bytec = values
+
+
+@op('intc', assemble=_imm_int)
+def op_intc(ctx, index):
+    if index >= len(ctx.intc):
+        raise TealError(f'intc {index} beyond {len(ctx.intc)} constants')
+    ctx.stack.append(ctx.intc[index])
+
+
+@op('bytec', assemble=_imm_int)
+def op_bytec(ctx, index):
+    if index >= len(ctx.bytec):
+        raise TealError(f'bytec {index} beyond {len(ctx.bytec)} constants')
+    ctx.stack.append(ctx.bytec[index])
+
+
+for _i in range(4):
+    op(f'intc_{_i}', assemble=lambda p, i, n=_i: n)(op_intc)
+    op(f'bytec_{_i}', assemble=lambda p, i, n=_i: n)(op_bytec)
+
+
+# flow control
+
+
+@op('err')
+def op_err(ctx, imm):
+    raise TealError('err opcode executed')
+
+
+@op('bnz', assemble=_imm_label)
+def op_bnz(ctx, target):
+    if ctx.pop_uint('bnz') != 0:
+        return target
+
+
+@op('bz', assemble=_imm_label)
+def op_bz(ctx, target):
+    if ctx.pop_uint('bz') == 0:
+        return target
+
+
+@op('b', assemble=_imm_label)
+def op_b(ctx, target):
+    return target
+
+
+@op('return')
+def op_return(ctx, imm):
+    value = ctx.pop_uint('return')
+    ctx.stack = [value]
+    ctx.finished = True
+
+
+@op('assert')
+def op_assert(ctx, imm):
+    if ctx.pop_uint('assert') == 0:
+        raise TealError('assert failed')
+
+
+@op('callsub', assemble=_imm_label)
+def op_callsub(ctx, target):
+    if len(ctx.callstack) >= 1024:
+        raise TealError('callsub stack overflow')
+    ctx.callstack.append((ctx.pc + 1, -1, 0, 0))
+    return target
+
+
+@op('retsub')
+def op_retsub(ctx, imm):
+    if not ctx.callstack:
+        raise TealError('retsub stack is empty')
+    ret, frame, args, returns = ctx.callstack.pop()
+    if frame >= 0:
+        if len(ctx.stack) < frame + returns:
+            raise TealError('retsub executed with stack below frame')
+        results = ctx.stack[len(ctx.stack) - returns:] if returns else []
+        del ctx.stack[frame - args:]
+        ctx.stack.extend(results)
+    return ret
+
+
+@op('proto', assemble=_imm_ints)
+def op_proto(ctx, imm):
+    args, returns = imm
+    if not ctx.callstack:
+        raise TealError('proto was executed without a callsub')
+    ret, _, _, _ = ctx.callstack[-1]
+    if len(ctx.stack) < args:
+        raise TealError(f'callsub to proto that requires {args} args with stack height {len(ctx.stack)}')
+    ctx.callstack[-1] = (ret, len(ctx.stack), args, returns)
+
+
+def _frame(ctx) -> tuple[int, int]:
+    for _, frame, args, _ in reversed(ctx.callstack):
+        if frame >= 0:
+            return frame, args
+    raise TealError('frame_dig with empty callstack')
+
+
+@op('frame_dig', assemble=_imm_int)
+def op_frame_dig(ctx, index):
+    frame, args = _frame(ctx)
+    if index < 0 and -index > args:
+        raise TealError(f'frame_dig {index} in sub with {args} args')
+    position = frame + index
+    if position >= len(ctx.stack):
+        raise TealError(f'frame_dig above stack')
+    ctx.stack.append(ctx.stack[position])
+
+
+@op('frame_bury', assemble=_imm_int)
+def op_frame_bury(ctx, index):
+    frame, args = _frame(ctx)
+    if index < 0 and -index > args:
+        raise TealError(f'frame_bury {index} in sub with {args} args')
+    value = ctx.pop()
+    position = frame + index
+    if position >= len(ctx.stack):
+        raise TealError(f'frame_bury above stack')
+    ctx.stack[position] = value
+
+
+@op('switch', assemble=_imm_labels)
+def op_switch(ctx, targets):
+    index = ctx.pop_uint('switch')
+    if index < len(targets):
+        return targets[index]
+
+
+@op('match', assemble=_imm_labels)
+def op_match(ctx, targets):
+    n = len(targets)
+    if len(ctx.stack) < n + 1:
+        raise TealError('match stack underflow')
+    value = ctx.pop()
+    candidates = ctx.stack[len(ctx.stack) - n:]
+    del ctx.stack[len(ctx.stack) - n:]
+    for i, candidate in enumerate(candidates):
+        if type(candidate) is type(value) and candidate == value:
+            return targets[i]
+
+
+# stack manipulation
+
+
+@op('pop')
+def op_pop(ctx, imm):
+    ctx.pop()
+
+
+@op('popn', assemble=_imm_int)
+def op_popn(ctx, n):
+    if n > len(ctx.stack):
+        raise TealError(f'popn {n} while stack contains {len(ctx.stack)}')
+    if n:
+        del ctx.stack[-n:]
+
+
+@op('dup')
+def op_dup(ctx, imm):
+    ctx.peek_depth(0)
+    ctx.stack.append(ctx.stack[-1])
+
+
+@op('dup2')
+def op_dup2(ctx, imm):
+    ctx.peek_depth(1)
+    ctx.stack.extend(ctx.stack[-2:])
+
+
+@op('dupn', assemble=_imm_int)
+def op_dupn(ctx, n):
+    ctx.peek_depth(0)
+    ctx.stack.extend([ctx.stack[-1]] * n)
+
+
+@op('dig', assemble=_imm_int)
+def op_dig(ctx, n):
+    ctx.peek_depth(n)
+    ctx.stack.append(ctx.stack[-1 - n])
+
+
+@op('bury', assemble=_imm_int)
+def op_bury(ctx, n):
+    if n == 0 or n >= len(ctx.stack):
+        raise TealError(f'bury {n} with stack size = {len(ctx.stack)}')
+    ctx.stack[-1 - n] = ctx.stack[-1]
+    ctx.stack.pop()
+
+
+@op('swap')
+def op_swap(ctx, imm):
+    ctx.peek_depth(1)
+    ctx.stack[-1], ctx.stack[-2] = ctx.stack[-2], ctx.stack[-1]
+
+
+@op('select')
+def op_select(ctx, imm):
+    cond = ctx.pop_uint('select')
+    b = ctx.pop()
+    a = ctx.pop()
+    ctx.stack.append(b if cond != 0 else a)
+
+
+@op('cover', assemble=_imm_int)
+def op_cover(ctx, n):
+    ctx.peek_depth(n)
+    value = ctx.stack.pop()
+    ctx.stack.insert(len(ctx.stack) - n, value)
+
+
+@op('uncover', assemble=_imm_int)
+def op_uncover(ctx, n):
+    ctx.peek_depth(n)
+    value = ctx.stack.pop(len(ctx.stack) - 1 - n)
+    ctx.stack.append(value)
+
+
+# scratch space
+
+
+@op('load', assemble=_imm_int)
+def op_load(ctx, index):
+    ctx.stack.append(ctx.scratch[index])
+
+
+@op('store', assemble=_imm_int)
+def op_store(ctx, index):
+    ctx.scratch[index] = ctx.pop()
+
+
+@op('loads')
+def op_loads(ctx, imm):
+    index = ctx.pop_uint('loads')
+    if index > 255:
+        raise TealError(f'invalid Scratch index {index}')
+    ctx.stack.append(ctx.scratch[index])
+
+
+@op('stores')
+def op_stores(ctx, imm):
+    value = ctx.pop()
+    index = ctx.pop_uint('stores')
+    if index > 255:
+        raise TealError(f'invalid Scratch index {index}')
+    ctx.scratch[index] = value
+
+
+# arithmetic
+
+
+def _binary(name: str, fn: Callable[[int, int], int]):
+    def handler(ctx, imm):
+        b = ctx.pop_uint(name)
+        a = ctx.pop_uint(name)
+        ctx.stack.append(fn(a, b))
+    op(name)(handler)
+
+
+def _add(a, b):
+    if a + b > MAX_UINT:
+        raise TealError('+ overflowed')
+    return a + b
+
+
+def _sub(a, b):
+    if b > a:
+        raise TealError('- would result negative')
+    return a - b
+
+
+def _mul(a, b):
+    if a * b > MAX_UINT:
+        raise TealError('* overflowed')
+    return a * b
+
+
+def _div(a, b):
+    if b == 0:
+        raise TealError('/ 0')
+    return a // b
+
+
+def _mod(a, b):
+    if b == 0:
+        raise TealError('% 0')
+    return a % b
+
+
+def _exp(a, b):
+    if a == 0 and b == 0:
+        raise TealError('0^0 is undefined')
+    if a > 1 and b > 64:
+        raise TealError(f'{a}^{b} overflow')
+    result = a ** b
+    if result > MAX_UINT:
+        raise TealError(f'{a}^{b} overflow')
+    return result
+
+
+def _shl(a, b):
+    if b > 63:
+        raise TealError(f'shl arg too big, ({b})')
+    return (a << b) & MAX_UINT
+
+
+def _shr(a, b):
+    if b > 63:
+        raise TealError(f'shr arg too big, ({b})')
+    return a >> b
+
+
+for _name, _fn in {
+    '+': _add,
+    '-': _sub,
+    '*': _mul,
+    '/': _div,
+    '%': _mod,
+    'exp': _exp,
+    'shl': _shl,
+    'shr': _shr,
+    '<': lambda a, b: int(a < b),
+    '>': lambda a, b: int(a > b),
+    '<=': lambda a, b: int(a <= b),
+    '>=': lambda a, b: int(a >= b),
+    '&&': lambda a, b: int(a != 0 and b != 0),
+    '||': lambda a, b: int(a != 0 or b != 0),
+    '|': lambda a, b: a | b,
+    '&': lambda a, b: a & b,
+    '^': lambda a, b: a ^ b,
+}.items():
+    _binary(_name, _fn)
+
+
+@op('==')
+def op_eq(ctx, imm):
+    b = ctx.pop()
+    a = ctx.pop()
+    if type(a) is not type(b):
+        raise TealError('cannot compare (uint64 to []byte)')
+    ctx.stack.append(int(a == b))
+
+
+@op('!=')
+def op_neq(ctx, imm):
+    b = ctx.pop()
+    a = ctx.pop()
+    if type(a) is not type(b):
+        raise TealError('cannot compare (uint64 to []byte)')
+    ctx.stack.append(int(a != b))
+
+
+@op('!')
+def op_not(ctx, imm):
+    ctx.stack.append(int(ctx.pop_uint('!') == 0))
+
+
+@op('~')
+def op_bitnot(ctx, imm):
+    ctx.stack.append(ctx.pop_uint('~') ^ MAX_UINT)
+
+
+@op('sqrt')
+def op_sqrt(ctx, imm):
+    ctx.stack.append(math.isqrt(ctx.pop_uint('sqrt')))
+
+
+@op('bitlen')
+def op_bitlen(ctx, imm):
+    value = ctx.pop()
+    if isinstance(value, bytes):
+        value = int.from_bytes(value, 'big')
+    ctx.stack.append(value.bit_length())
+
+
+@op('mulw')
+def op_mulw(ctx, imm):
+    a, b = ctx.pop_uints(2, 'mulw')
+    result = a * b
+    ctx.stack.extend([result >> 64, result & MAX_UINT])
+
+
+@op('addw')
+def op_addw(ctx, imm):
+    a, b = ctx.pop_uints(2, 'addw')
+    result = a + b
+    ctx.stack.extend([result >> 64, result & MAX_UINT])
+
+
+@op('expw')
+def op_expw(ctx, imm):
+    a, b = ctx.pop_uints(2, 'expw')
+    if a == 0 and b == 0:
+        raise TealError('0^0 is undefined')
+    result = a ** b if a <= 1 or b <= 128 else 2 ** 128
+    if result >= 2 ** 128:
+        raise TealError(f'{a}^{b} overflow')
+    ctx.stack.extend([result >> 64, result & MAX_UINT])
+
+
+@op('divw')
+def op_divw(ctx, imm):
+    hi, lo, divisor = ctx.pop_uints(3, 'divw')
+    if divisor == 0:
+        raise TealError('divw 0')
+    result = ((hi << 64) | lo) // divisor
+    if result > MAX_UINT:
+        raise TealError('divw overflow')
+    ctx.stack.append(result)
+
+
+@op('divmodw')
+def op_divmodw(ctx, imm):
+    a_hi, a_lo, b_hi, b_lo = ctx.pop_uints(4, 'divmodw')
+    divisor = (b_hi << 64) | b_lo
+    if divisor == 0:
+        raise TealError('/ 0')
+    quotient, remainder = divmod((a_hi << 64) | a_lo, divisor)
+    ctx.stack.extend([quotient >> 64, quotient & MAX_UINT, remainder >> 64, remainder & MAX_UINT])
+
+
+# byte arrays
+
+
+@op('len')
+def op_len(ctx, imm):
+    ctx.stack.append(len(ctx.pop_bytes('len')))
+
+
+@op('itob')
+def op_itob(ctx, imm):
+    ctx.stack.append(ctx.pop_uint('itob').to_bytes(8, 'big'))
+
+
+@op('btoi')
+def op_btoi(ctx, imm):
+    value = ctx.pop_bytes('btoi')
+    if len(value) > 8:
+        raise TealError(f'btoi arg too long, got [{len(value)}]bytes')
+    ctx.stack.append(int.from_bytes(value, 'big'))
+
+
+@op('concat')
+def op_concat(ctx, imm):
+    b = ctx.pop_bytes('concat')
+    a = ctx.pop_bytes('concat')
+    ctx.push(a + b)
+
+
+def _substring(ctx, value: bytes, start: int, end: int) -> bytes:
+    if end < start:
+        raise TealError('substring end before start')
+    if end > len(value):
+        raise TealError('substring range beyond length of string')
+    return value[start:end]
+
+
+@op('substring', assemble=_imm_ints)
+def op_substring(ctx, imm):
+    start, end = imm
+    ctx.stack.append(_substring(ctx, ctx.pop_bytes('substring'), start, end))
+
+
+@op('substring3')
+def op_substring3(ctx, imm):
+    end = ctx.pop_uint('substring3')
+    start = ctx.pop_uint('substring3')
+    ctx.stack.append(_substring(ctx, ctx.pop_bytes('substring3'), start, end))
+
+
+def _extract(value: bytes, start: int, length: int) -> bytes:
+    if start > len(value) or start + length > len(value):
+        raise TealError('extraction end exceeds length of string' if start <= len(value) else 'extraction start exceeds length of string')
+    return value[start:start + length]
+
+
+@op('extract', assemble=_imm_ints)
+def op_extract(ctx, imm):
+    start, length = imm
+    value = ctx.pop_bytes('extract')
+    if length == 0:
+        if start > len(value):
+            raise TealError('extraction start exceeds length of string')
+        length = len(value) - start
+    ctx.stack.append(_extract(value, start, length))
+
+
+@op('extract3')
+def op_extract3(ctx, imm):
+    length = ctx.pop_uint('extract3')
+    start = ctx.pop_uint('extract3')
+    ctx.stack.append(_extract(ctx.pop_bytes('extract3'), start, length))
+
+
+def _extract_uint(size: int):
+    def handler(ctx, imm):
+        start = ctx.pop_uint(f'extract_uint{size * 8}')
+        value = ctx.pop_bytes(f'extract_uint{size * 8}')
+        ctx.stack.append(int.from_bytes(_extract(value, start, size), 'big'))
+    op(f'extract_uint{size * 8}')(handler)
+
+
+for _size in (2, 4, 8):
+    _extract_uint(_size)
+
+
+@op('replace2', assemble=_imm_int)
+def op_replace2(ctx, start):
+    replacement = ctx.pop_bytes('replace2')
+    value = ctx.pop_bytes('replace2')
+    if start + len(replacement) > len(value):
+        raise TealError('replacement end exceeds length of string')
+    ctx.stack.append(value[:start] + replacement + value[start + len(replacement):])
+
+
+@op('replace3')
+def op_replace3(ctx, imm):
+    replacement = ctx.pop_bytes('replace3')
+    start = ctx.pop_uint('replace3')
+    value = ctx.pop_bytes('replace3')
+    if start + len(replacement) > len(value):
+        raise TealError('replacement end exceeds length of string')
+    ctx.stack.append(value[:start] + replacement + value[start + len(replacement):])
+
+
+@op('getbyte')
+def op_getbyte(ctx, imm):
+    index = ctx.pop_uint('getbyte')
+    value = ctx.pop_bytes('getbyte')
+    if index >= len(value):
+        raise TealError(f'getbyte index {index} beyond length {len(value)}')
+    ctx.stack.append(value[index])
+
+
+@op('setbyte')
+def op_setbyte(ctx, imm):
+    byte = ctx.pop_uint('setbyte')
+    index = ctx.pop_uint('setbyte')
+    value = ctx.pop_bytes('setbyte')
+    if index >= len(value):
+        raise TealError(f'setbyte index {index} beyond length {len(value)}')
+    if byte > 255:
+        raise TealError(f'setbyte value {byte} > 255')
+    ctx.stack.append(value[:index] + bytes([byte]) + value[index + 1:])
+
+
+@op('getbit')
+def op_getbit(ctx, imm):
+    index = ctx.pop_uint('getbit')
+    value = ctx.pop()
+    if isinstance(value, int):
+        if index > 63:
+            raise TealError(f'getbit index {index} beyond 64 bits')
+        ctx.stack.append((value >> index) & 1)
+        return
+    if index >= len(value) * 8:
+        raise TealError(f'getbit index {index} beyond length')
+    ctx.stack.append((value[index // 8] >> (7 - index % 8)) & 1)
+
+
+@op('setbit')
+def op_setbit(ctx, imm):
+    bit = ctx.pop_uint('setbit')
+    index = ctx.pop_uint('setbit')
+    value = ctx.pop()
+    if bit > 1:
+        raise TealError('setbit value > 1')
+    if isinstance(value, int):
+        if index > 63:
+            raise TealError(f'setbit index {index} beyond 64 bits')
+        mask = 1 << index
+        ctx.stack.append(value | mask if bit else value & ~mask)
+        return
+    if index >= len(value) * 8:
+        raise TealError(f'setbit index {index} beyond length')
+    data = bytearray(value)
+    mask = 1 << (7 - index % 8)
+    if bit:
+        data[index // 8] |= mask
+    else:
+        data[index // 8] &= ~mask & 0xff
+    ctx.stack.append(bytes(data))
+
+
+@op('bzero')
+def op_bzero(ctx, imm):
+    length = ctx.pop_uint('bzero')
+    if length > MAX_BYTES:
+        raise TealError(f'bzero attempted to create {length} bytes')
+    ctx.stack.append(bytes(length))
+
+
+@op('sha256')
+def op_sha256(ctx, imm):
+    ctx.stack.append(hashlib.sha256(ctx.pop_bytes('sha256')).digest())
+
+
+@op('sha512_256')
+def op_sha512_256(ctx, imm):
+    ctx.stack.append(checksum(ctx.pop_bytes('sha512_256')))
+
+
+@op('keccak256')
+def op_keccak256(ctx, imm):
+    from Cryptodome.Hash import keccak
+    ctx.stack.append(keccak.new(data=ctx.pop_bytes('keccak256'), digest_bits=256).digest())
+
+
+# byte math
+
+
+def _bigint(value: bytes, op_name: str) -> int:
+    if len(value) > 64:
+        raise TealError(f'{op_name} arg too long')
+    return int.from_bytes(value, 'big')
+
+
+def _to_bytes(value: int) -> bytes:
+    return value.to_bytes((value.bit_length() + 7) // 8, 'big')
+
+
+def _bytes_binary(name: str, fn: Callable[[int, int], int | bool], math: bool):
+    def handler(ctx, imm):
+        b = _bigint(ctx.pop_bytes(name), name)
+        a = _bigint(ctx.pop_bytes(name), name)
+        result = fn(a, b)
+        ctx.stack.append(_to_bytes(result) if math else int(result))
+    op(name)(handler)
+
+
+def _bsub(a, b):
+    if b > a:
+        raise TealError('byte math would have negative result')
+    return a - b
+
+
+def _bdiv(a, b):
+    if b == 0:
+        raise TealError('division by zero')
+    return a // b
+
+
+def _bmod(a, b):
+    if b == 0:
+        raise TealError('modulo by zero')
+    return a % b
+
+
+for _name, _fn in {'b+': lambda a, b: a + b, 'b-': _bsub, 'b*': lambda a, b: a * b, 'b/': _bdiv, 'b%': _bmod}.items():
+    _bytes_binary(_name, _fn, True)
+
+for _name, _fn in {
+    'b<': lambda a, b: a < b,
+    'b>': lambda a, b: a > b,
+    'b<=': lambda a, b: a <= b,
+    'b>=': lambda a, b: a >= b,
+    'b==': lambda a, b: a == b,
+    'b!=': lambda a, b: a != b,
+}.items():
+    _bytes_binary(_name, _fn, False)
+
+
+def _bytes_bitwise(name: str, fn: Callable[[int, int], int]):
+    def handler(ctx, imm):
+        b = ctx.pop_bytes(name)
+        a = ctx.pop_bytes(name)
+        size = max(len(a), len(b))
+        a = a.rjust(size, b'\x00')
+        b = b.rjust(size, b'\x00')
+        ctx.stack.append(bytes(fn(x, y) for x, y in zip(a, b)))
+    op(name)(handler)
+
+
+_bytes_bitwise('b|', lambda x, y: x | y)
+_bytes_bitwise('b&', lambda x, y: x & y)
+_bytes_bitwise('b^', lambda x, y: x ^ y)
+
+
+@op('b~')
+def op_bnot(ctx, imm):
+    ctx.stack.append(bytes(x ^ 0xff for x in ctx.pop_bytes('b~')))
+
+
+@op('bsqrt')
+def op_bsqrt(ctx, imm):
+    ctx.stack.append(_to_bytes(math.isqrt(_bigint(ctx.pop_bytes('bsqrt'), 'bsqrt'))))
+
+
+# transaction and global access
+
+
+@op('txn', 'txna', assemble=_imm_args)
+def op_txn(ctx, args):
+    index = int(args[1]) if len(args) > 1 else None
+    ctx.push(txn_field(ctx, ctx.txn, args[0], index, ctx.group_index))
+
+
+@op('txnas', assemble=_imm_name)
+def op_txnas(ctx, name):
+    index = ctx.pop_uint('txnas')
+    ctx.push(txn_field(ctx, ctx.txn, name, index, ctx.group_index))
+
+
+@op('gtxn', 'gtxna', assemble=_imm_args)
+def op_gtxn(ctx, args):
+    group_index = int(args[0])
+    index = int(args[2]) if len(args) > 2 else None
+    ctx.push(txn_field(ctx, ctx.group_txn(group_index, 'gtxn'), args[1], index, group_index))
+
+
+@op('gtxnas', assemble=_imm_args)
+def op_gtxnas(ctx, args):
+    group_index = int(args[0])
+    index = ctx.pop_uint('gtxnas')
+    ctx.push(txn_field(ctx, ctx.group_txn(group_index, 'gtxnas'), args[1], index, group_index))
+
+
+@op('gtxns', 'gtxnsa', assemble=_imm_args)
+def op_gtxns(ctx, args):
+    index = int(args[1]) if len(args) > 1 else None
+    group_index = ctx.pop_uint('gtxns')
+    ctx.push(txn_field(ctx, ctx.group_txn(group_index, 'gtxns'), args[0], index, group_index))
+
+
+@op('gtxnsas', assemble=_imm_name)
+def op_gtxnsas(ctx, name):
+    index = ctx.pop_uint('gtxnsas')
+    group_index = ctx.pop_uint('gtxnsas')
+    ctx.push(txn_field(ctx, ctx.group_txn(group_index, 'gtxnsas'), name, index, group_index))
+
+
+@op('global', assemble=_imm_name)
+def op_global(ctx, name):
+    ctx.push(global_field(ctx, name))
+
+
+@op('log')
+def op_log(ctx, imm):
+    if len(ctx.logs) >= 32:
+        raise TealError('too many log calls in program. up to 32 is allowed.')
+    ctx.logs.append(ctx.pop_bytes('log'))
+
+
+# state access
+
+
+def _check_key(key: bytes) -> None:
+    if len(key) > MAX_KEY_LEN:
+        raise TealError(f'key too long: length was {len(key)}, maximum is {MAX_KEY_LEN}')
+
+
+@op('balance')
+def op_balance(ctx, imm):
+    account = ctx.resolve_account(ctx.pop())
+    ctx.stack.append(ctx.view.balance(account))
+
+
+@op('min_balance')
+def op_min_balance(ctx, imm):
+    account = ctx.resolve_account(ctx.pop())
+    ctx.stack.append(ctx.view.min_balance(account))
+
+
+@op('app_opted_in')
+def op_app_opted_in(ctx, imm):
+    app = ctx.resolve_app(ctx.pop_uint('app_opted_in'))
+    account = ctx.resolve_account(ctx.pop())
+    ctx.stack.append(int(ctx.view.opted_in(account, app)))
+
+
+@op('app_global_get')
+def op_app_global_get(ctx, imm):
+    key = ctx.pop_bytes('app_global_get')
+    value = ctx.view.global_get(ctx.app_id, key)
+    ctx.stack.append(0 if value is None else value)
+
+
+@op('app_global_get_ex')
+def op_app_global_get_ex(ctx, imm):
+    key = ctx.pop_bytes('app_global_get_ex')
+    app = ctx.resolve_app(ctx.pop_uint('app_global_get_ex'))
+    value = ctx.view.global_get(app, key)
+    ctx.stack.extend([0, 0] if value is None else [value, 1])
+
+
+@op('app_global_put')
+def op_app_global_put(ctx, imm):
+    value = ctx.pop()
+    key = ctx.pop_bytes('app_global_put')
+    _check_key(key)
+    if isinstance(value, bytes) and len(key) + len(value) > MAX_KEY_VALUE_LEN:
+        raise TealError(f'key/value total too long for key {key!r}')
+    ctx.view.global_put(ctx.app_id, key, value)
+
+
+@op('app_global_del')
+def op_app_global_del(ctx, imm):
+    ctx.view.global_del(ctx.app_id, ctx.pop_bytes('app_global_del'))
+
+
+@op('app_local_get')
+def op_app_local_get(ctx, imm):
+    key = ctx.pop_bytes('app_local_get')
+    account = ctx.resolve_account(ctx.pop())
+    value = ctx.view.local_get(account, ctx.app_id, key)
+    ctx.stack.append(0 if value is None else value)
+
+
+@op('app_local_get_ex')
+def op_app_local_get_ex(ctx, imm):
+    key = ctx.pop_bytes('app_local_get_ex')
+    app = ctx.resolve_app(ctx.pop_uint('app_local_get_ex'))
+    account = ctx.resolve_account(ctx.pop())
+    value = ctx.view.local_get(account, app, key)
+    ctx.stack.extend([0, 0] if value is None else [value, 1])
+
+
+@op('app_local_put')
+def op_app_local_put(ctx, imm):
+    value = ctx.pop()
+    key = ctx.pop_bytes('app_local_put')
+    account = ctx.resolve_account(ctx.pop())
+    _check_key(key)
+    if isinstance(value, bytes) and len(key) + len(value) > MAX_KEY_VALUE_LEN:
+        raise TealError(f'key/value total too long for key {key!r}')
+    ctx.view.local_put(account, ctx.app_id, key, value)
+
+
+@op('app_local_del')
+def op_app_local_del(ctx, imm):
+    key = ctx.pop_bytes('app_local_del')
+    account = ctx.resolve_account(ctx.pop())
+    ctx.view.local_del(account, ctx.app_id, key)
+
+
+@op('app_params_get', assemble=_imm_name)
+def op_app_params_get(ctx, name):
+    app = ctx.resolve_app(ctx.pop_uint('app_params_get'))
+    value = ctx.view.app_param(app, name)
+    ctx.stack.extend([0, 0] if value is None else [value, 1])
+
+
+@op('acct_params_get', assemble=_imm_name)
+def op_acct_params_get(ctx, name):
+    account = ctx.resolve_account(ctx.pop())
+    value = ctx.view.account_param(account, name)
+    ctx.stack.extend([value, int(ctx.view.balance(account) > 0)])
+
+
+# boxes
+
+
+@op('box_create')
+def op_box_create(ctx, imm):
+    size = ctx.pop_uint('box_create')
+    name = ctx.pop_bytes('box_create')
+    ctx.stack.append(int(ctx.view.box_create(ctx.app_id, name, size)))
+
+
+@op('box_put')
+def op_box_put(ctx, imm):
+    value = ctx.pop_bytes('box_put')
+    name = ctx.pop_bytes('box_put')
+    ctx.view.box_put(ctx.app_id, name, value)
+
+
+@op('box_get')
+def op_box_get(ctx, imm):
+    value = ctx.view.box_get(ctx.app_id, ctx.pop_bytes('box_get'))
+    ctx.stack.extend([b'', 0] if value is None else [value, 1])
+
+
+@op('box_len')
+def op_box_len(ctx, imm):
+    value = ctx.view.box_get(ctx.app_id, ctx.pop_bytes('box_len'))
+    ctx.stack.extend([0, 0] if value is None else [len(value), 1])
+
+
+@op('box_del')
+def op_box_del(ctx, imm):
+    ctx.stack.append(int(ctx.view.box_del(ctx.app_id, ctx.pop_bytes('box_del'))))
+
+
+@op('box_extract')
+def op_box_extract(ctx, imm):
+    length = ctx.pop_uint('box_extract')
+    start = ctx.pop_uint('box_extract')
+    value = ctx.view.box_get(ctx.app_id, ctx.pop_bytes('box_extract'))
+    if value is None:
+        raise TealError('no such box')
+    ctx.stack.append(_extract(value, start, length))
+
+
+@op('box_replace')
+def op_box_replace(ctx, imm):
+    replacement = ctx.pop_bytes('box_replace')
+    start = ctx.pop_uint('box_replace')
+    name = ctx.pop_bytes('box_replace')
+    value = ctx.view.box_get(ctx.app_id, name)
+    if value is None:
+        raise TealError('no such box')
+    if start + len(replacement) > len(value):
+        raise TealError('replacement end exceeds box size')
+    ctx.view.box_put(ctx.app_id, name, value[:start] + replacement + value[start + len(replacement):])
+
+
+# inner transactions
+
+
+@op('itxn_begin')
+def op_itxn_begin(ctx, imm):
+    if ctx.inner:
+        raise TealError('itxn_begin without itxn_submit')
+    ctx.inner = [{'Sender': app_address(ctx.app_id), 'Fee': 0}]
+
+
+@op('itxn_next')
+def op_itxn_next(ctx, imm):
+    if not ctx.inner:
+        raise TealError('itxn_next without itxn_begin')
+    ctx.inner.append({'Sender': app_address(ctx.app_id), 'Fee': 0})
+
+
+@op('itxn_field', assemble=_imm_name)
+def op_itxn_field(ctx, name):
+    if not ctx.inner:
+        raise TealError('itxn_field without itxn_begin')
+    value = ctx.pop()
+    if name == 'TypeEnum':
+        name, value = 'Type', {v: k for k, v in TYPE_ENUMS.items()}.get(value, '').encode()
+    if name in ('ApplicationArgs', 'Accounts', 'Applications', 'Assets'):
+        ctx.inner[-1].setdefault(name, []).append(value)
+        return
+    ctx.inner[-1][name] = value
+
+
+@op('itxn_submit')
+def op_itxn_submit(ctx, imm):
+    if not ctx.inner:
+        raise TealError('itxn_submit without itxn_begin')
+    ctx.inner_count += len(ctx.inner)
+    if ctx.inner_count > MAX_INNER_TXNS * len(ctx.group):
+        raise TealError('too many inner transactions')
+    for inner in ctx.inner:
+        ctx.view.submit_inner(inner)
+    ctx.inner_submitted = ctx.inner
+    ctx.inner = []
+
+
+@op('itxn', 'itxna', assemble=_imm_args)
+def op_itxn(ctx, args):
+    if not ctx.inner_submitted:
+        raise TealError('no inner transaction available')
+    index = int(args[1]) if len(args) > 1 else None
+    ctx.push(inner_field(ctx.inner_submitted[-1], args[0], index))
+
+
+@op('gitxn', 'gitxna', assemble=_imm_args)
+def op_gitxn(ctx, args):
+    group_index = int(args[0])
+    if group_index >= len(ctx.inner_submitted):
+        raise TealError('gitxn index beyond submitted inner transactions')
+    index = int(args[2]) if len(args) > 2 else None
+    ctx.push(inner_field(ctx.inner_submitted[group_index], args[1], index))
+
+
+def evaluate(program: Program, view, group: list, group_index: int, app_id: int, budget: list[int]) -> EvalResult:
+    """Runs `program` for the transaction at `group_index` of `group`.
+
+    `budget` is a single element list holding the pooled opcode budget of the group,
+    it is decreased by the cost of the evaluation."""
+    return Evaluation(program, view, group, group_index, app_id, budget).run()
@@ -0,0 +1,130 @@
+"""Interface between the fuzzer and whatever executes its calls.
+
+A backend creates the application, executes candidate calls and reads the application
+state. Executing a call is split into `check`, which evaluates the call against the
+current state, and `commit`, which applies a call that passed. The fuzzer only talks
+to this interface, so backends can be swapped without touching the fuzzing loop:
+`FuzzAppClient` checks with dryrun and commits to algod, `SimulateAppClient` checks
+with simulate, and `InProcessAppClient` runs calls with the in-process evaluator.
+"""
+from abc import ABC, abstractmethod
+
+from algokit_utils import Account
+from algosdk import abi
+
+
+class CallCheck:
+    """Outcome of executing a call without committing it"""
+
+    def __init__(self, txns: list, passed: bool, coverage: bytearray = None, assertion_failed: bool = False, result: dict = None, cost: int = 0) -> None:
+        self.txns = txns
+        self.passed = passed
+        self.coverage = coverage
+        self.assertion_failed = assertion_failed
+        # transaction result known from the check, if the backend provides it
+        self.result = result
+        # opcode budget consumed by the app calls of the group
+        self.cost = cost
+
+
+class ExecutionResult:
+    """Outcome of executing a call.
+
+    :param result: Transaction result of the app call holding its state deltas, None if the call was rejected
+    :param coverage: Coverage bitmap of the call, None if it was rejected
+    :param assertion_failed: Whether the call was rejected by a failed assertion
+    :param cost: Opcode budget consumed by the app calls, also known for most rejected calls
+    """
+
+    def __init__(self, result: dict | None, coverage: bytearray | None, assertion_failed: bool, cost: int = 0) -> None:
+        self.result = result
+        self.coverage = coverage
+        self.assertion_failed = assertion_failed
+        self.cost = cost
+
+    @property
+    def rejected(self) -> bool:
+        return self.result is None
+
+    @property
+    def state_delta(self) -> tuple[list[dict], list[dict]]:
+        """Global and local state deltas of the call, in the algod format"""
+        if self.result is None:
+            return [], []
+        return self.result.get('global-state-delta', []), self.result.get('local-state-delta', [])
+
+    @staticmethod
+    def rejection(check: CallCheck, assertion_failed: bool = None) -> "ExecutionResult":
+        return ExecutionResult(None, None, check.assertion_failed if assertion_failed is None else assertion_failed, check.cost)
+
+
+class ExecutionBackend(ABC):
+    """Executes the calls of a fuzzer. Besides the methods below, backends have the
+    `app_id`, `app_name`, `app_address` and `sender` attributes of an algokit
+    `ApplicationClient`."""
+
+    # whether calls also return the edge bitmap of their traces
+    track_edges = False
+    # whether check already applies a passing call, so checks must run one at a time and in order
+    check_commits = False
+
+    @property
+    @abstractmethod
+    def methods(self) -> list[abi.Method]:
+        pass
+
+    @property
+    @abstractmethod
+    def coverage_size(self) -> int:
+        """Size of the coverage bitmaps of the calls"""
+        pass
+
+    @abstractmethod
+    def create(self, *args, **kwargs):
+        """Creates the application"""
+        pass
+
+    @abstractmethod
+    def opt_in_all(self) -> None:
+        """Opts all accounts of the pool into the application"""
+        pass
+
+    @abstractmethod
+    def change_sender(self, account: Account) -> None:
+        pass
+
+    @abstractmethod
+    def get_method(self, name: str) -> abi.Method:
+        pass
+
+    @abstractmethod
+    def check(self, method: abi.Method, args: list, account: Account = None) -> CallCheck:
+        """Executes a call from account (the current sender by default) against the current state"""
+        pass
+
+    def check_batch(self, calls: list[tuple[abi.Method, list, Account]]) -> list[CallCheck]:
+        """Checks independent calls against the same state. Implementations may return
+        checks for a prefix of the calls only."""
+        checks: list[CallCheck] = []
+        for method, args, account in calls:
+            checks.append(self.check(method, args, account))
+            if checks[-1].passed and not self.check_commits:
+                break
+        return checks
+
+    @abstractmethod
+    def commit(self, check: CallCheck) -> ExecutionResult:
+        """Applies a checked call, rejected checks are returned as rejected results"""
+        pass
+
+    def execute(self, method: abi.Method, args: list, account: Account = None) -> ExecutionResult:
+        """Checks and commits a call"""
+        return self.commit(self.check(method, args, account))
+
+    @abstractmethod
+    def get_global_state(self, *, raw: bool = False) -> dict:
+        pass
+
+    @abstractmethod
+    def get_local_state(self, account: str | None = None, *, raw: bool = False) -> dict:
+        pass
\ No newline at end of file
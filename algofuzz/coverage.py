@@ -0,0 +1,126 @@
+"""Line coverage bitmaps with AFL-style hit count buckets.
+
+A bitmap holds one byte per line of the disassembled approval program. While a trace
+is recorded the byte counts the hits of its line (saturating at 255), afterwards the
+counts are classified into buckets with one bit each, so that a loop running a
+different number of iterations registers as new behaviour.
+
+Edge coverage counts the transitions between consecutive lines of a trace in the same
+way, hashed into a bitmap of EDGE_MAP_SIZE bytes.
+"""
+from typing import Iterable
+
+def _bucket(count: int) -> int:
+    if count == 0: return 0
+    if count == 1: return 1
+    if count == 2: return 2
+    if count == 3: return 4
+    if count <= 7: return 8
+    if count <= 15: return 16
+    if count <= 31: return 32
+    if count <= 127: return 64
+    return 128
+
+BUCKETS = bytes(_bucket(count) for count in range(256))
+
+EDGE_MAP_SIZE = 1 << 13
+_EDGE_MASK = EDGE_MAP_SIZE - 1
+
+
+def new_bitmap(size: int) -> bytearray:
+    return bytearray(size)
+
+
+def record(hits: bytearray, lines: Iterable[int]) -> None:
+    """Adds the traced lines to the hit counts"""
+    for line in lines:
+        if hits[line] != 255:
+            hits[line] += 1
+
+
+def record_edges(hits: bytearray, lines: Iterable[int]) -> None:
+    """Adds the edges between consecutive traced lines to the edge hit counts"""
+    prev = 0
+    for line in lines:
+        # multiplicative hash spreads neighbouring lines over the map, shifting the
+        # previous location keeps a->b and b->a apart
+        cur = (line * 0x9E3779B1) >> 7 & _EDGE_MASK
+        edge = cur ^ prev
+        if hits[edge] != 255:
+            hits[edge] += 1
+        prev = cur >> 1
+
+
+def classify(hits: bytearray) -> bytearray:
+    """Returns the bitmap with hit counts replaced by their bucket"""
+    return hits.translate(BUCKETS)
+
+
+def from_trace(lines: Iterable[int], size: int) -> bytearray:
+    hits = new_bitmap(size)
+    record(hits, lines)
+    return classify(hits)
+
+
+class Coverage(bytearray):
+    """Classified line bitmap of a call, `edges` holds the classified edge bitmap if edges were tracked"""
+    edges: bytearray | None = None
+
+
+def collect(traces: Iterable[list[int]], size: int, edges: bool = False) -> Coverage:
+    """Builds the coverage of a call from the line traces of its app calls"""
+    hits = new_bitmap(size)
+    edge_hits = new_bitmap(EDGE_MAP_SIZE) if edges else None
+    for lines in traces:
+        record(hits, lines)
+        if edge_hits is not None:
+            record_edges(edge_hits, lines)
+
+    result = Coverage(classify(hits))
+    if edge_hits is not None:
+        result.edges = classify(edge_hits)
+    return result
+
+
+class VirginMap:
+    """Bits of the classified bitmaps that have not been seen yet, shared by a campaign"""
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self._virgin = (1 << (8 * size)) - 1
+        self._covered_count = 0
+
+    def has_new_bits(self, bitmap: bytes | bytearray) -> int:
+        """Clears the bits of bitmap from the virgin map.
+
+        :return: 2 if a line was hit for the first time, 1 if only a new hit count bucket was hit, 0 otherwise"""
+        trace = int.from_bytes(bitmap, 'little')
+        new = trace & self._virgin
+        if not new:
+            return 0
+
+        virgin = self._virgin.to_bytes(self.size, 'little')
+        self._virgin &= ~trace
+
+        result = 1
+        for line, bits in enumerate(bitmap):
+            if bits and virgin[line] == 0xff:
+                self._covered_count += 1
+                result = 2
+
+        return result
+
+    @property
+    def covered_count(self) -> int:
+        """Number of lines hit at least once"""
+        return self._covered_count
+
+    def covered_bits(self) -> bytes:
+        """Returns the bits that have been seen, one byte per line"""
+        full = (1 << (8 * self.size)) - 1
+        return (full & ~self._virgin).to_bytes(self.size, 'little')
+
+    @property
+    def covered_lines(self) -> set[int]:
+        virgin = self._virgin.to_bytes(self.size, 'little')
+        return {line for line, bits in enumerate(virgin) if bits != 0xff}
\ No newline at end of file
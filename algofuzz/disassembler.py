@@ -0,0 +1,274 @@
+"""Disassembly of approval programs, cached per program hash.
+
+`disassemble` asks algod once per program and keeps the result in memory and on disk,
+keyed by the sha256 of the bytecode, so a campaign on a contract that was fuzzed before
+does not need algod for this step. If algod is not reachable the program is disassembled
+locally, in the same layout as algod: the `#pragma version` line, one line per label and
+one line per opcode, so line numbers of dryrun traces index the same lines.
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from algosdk import encoding
+from algosdk.v2client import algod
+
+CACHE_DIR = Path(os.getenv("ALGOFUZZ_CACHE_DIR", default=Path.home() / ".cache" / "algofuzz")) / "disassembly"
+
+TXN_FIELDS = [
+    'Sender', 'Fee', 'FirstValid', 'FirstValidTime', 'LastValid', 'Note', 'Lease', 'Receiver', 'Amount',
+    'CloseRemainderTo', 'VotePK', 'SelectionPK', 'VoteFirst', 'VoteLast', 'VoteKeyDilution', 'Type', 'TypeEnum',
+    'XferAsset', 'AssetAmount', 'AssetSender', 'AssetReceiver', 'AssetCloseTo', 'GroupIndex', 'TxID',
+    'ApplicationID', 'OnCompletion', 'ApplicationArgs', 'NumAppArgs', 'Accounts', 'NumAccounts', 'ApprovalProgram',
+    'ClearStateProgram', 'RekeyTo', 'ConfigAsset', 'ConfigAssetTotal', 'ConfigAssetDecimals',
+    'ConfigAssetDefaultFrozen', 'ConfigAssetUnitName', 'ConfigAssetName', 'ConfigAssetURL',
+    'ConfigAssetMetadataHash', 'ConfigAssetManager', 'ConfigAssetReserve', 'ConfigAssetFreeze',
+    'ConfigAssetClawback', 'FreezeAsset', 'FreezeAssetAccount', 'FreezeAssetFrozen', 'Assets', 'NumAssets',
+    'Applications', 'NumApplications', 'GlobalNumUint', 'GlobalNumByteSlice', 'LocalNumUint', 'LocalNumByteSlice',
+    'ExtraProgramPages', 'Nonparticipation', 'Logs', 'NumLogs', 'CreatedAssetID', 'CreatedApplicationID',
+    'LastLog', 'StateProofPK', 'ApprovalProgramPages', 'NumApprovalProgramPages', 'ClearStateProgramPages',
+    'NumClearStateProgramPages',
+]
+
+FIELDS = {
+    'txn': TXN_FIELDS,
+    'global': [
+        'MinTxnFee', 'MinBalance', 'MaxTxnLife', 'ZeroAddress', 'GroupSize', 'LogicSigVersion', 'Round',
+        'LatestTimestamp', 'CurrentApplicationID', 'CreatorAddress', 'CurrentApplicationAddress', 'GroupID',
+        'OpcodeBudget', 'CallerApplicationID', 'CallerApplicationAddress',
+    ],
+    'asset_holding': ['AssetBalance', 'AssetFrozen'],
+    'asset_params': [
+        'AssetTotal', 'AssetDecimals', 'AssetDefaultFrozen', 'AssetUnitName', 'AssetName', 'AssetURL',
+        'AssetMetadataHash', 'AssetManager', 'AssetReserve', 'AssetFreeze', 'AssetClawback', 'AssetCreator',
+    ],
+    'app_params': [
+        'AppApprovalProgram', 'AppClearStateProgram', 'AppGlobalNumUint', 'AppGlobalNumByteSlice',
+        'AppLocalNumUint', 'AppLocalNumByteSlice', 'AppExtraProgramPages', 'AppCreator', 'AppAddress',
+    ],
+    'acct_params': ['AcctBalance', 'AcctMinBalance', 'AcctAuthAddr'],
+    'curve': ['Secp256k1', 'Secp256r1'],
+    'encoding': ['URLEncoding', 'StdEncoding'],
+    'json': ['JSONString', 'JSONUint64', 'JSONObject'],
+    'vrf': ['VrfAlgorand'],
+    'block': ['BlkSeed', 'BlkTimestamp'],
+}
+
+# opcode -> name and kinds of its immediates
+OPCODES: dict[int, tuple[str, ...]] = {
+    0x00: ('err',), 0x01: ('sha256',), 0x02: ('keccak256',), 0x03: ('sha512_256',), 0x04: ('ed25519verify',),
+    0x05: ('ecdsa_verify', 'curve'), 0x06: ('ecdsa_pk_decompress', 'curve'), 0x07: ('ecdsa_pk_recover', 'curve'),
+    0x08: ('+',), 0x09: ('-',), 0x0a: ('/',), 0x0b: ('*',), 0x0c: ('<',), 0x0d: ('>',), 0x0e: ('<=',),
+    0x0f: ('>=',), 0x10: ('&&',), 0x11: ('||',), 0x12: ('==',), 0x13: ('!=',), 0x14: ('!',), 0x15: ('len',),
+    0x16: ('itob',), 0x17: ('btoi',), 0x18: ('%',), 0x19: ('|',), 0x1a: ('&',), 0x1b: ('^',), 0x1c: ('~',),
+    0x1d: ('mulw',), 0x1e: ('addw',), 0x1f: ('divmodw',),
+    0x20: ('intcblock', 'ints'), 0x21: ('intc', 'u8'), 0x22: ('intc_0',), 0x23: ('intc_1',), 0x24: ('intc_2',),
+    0x25: ('intc_3',), 0x26: ('bytecblock', 'bytess'), 0x27: ('bytec', 'u8'), 0x28: ('bytec_0',),
+    0x29: ('bytec_1',), 0x2a: ('bytec_2',), 0x2b: ('bytec_3',), 0x2c: ('arg', 'u8'), 0x2d: ('arg_0',),
+    0x2e: ('arg_1',), 0x2f: ('arg_2',), 0x30: ('arg_3',),
+    0x31: ('txn', 'txn'), 0x32: ('global', 'global'), 0x33: ('gtxn', 'u8', 'txn'), 0x34: ('load', 'u8'),
+    0x35: ('store', 'u8'), 0x36: ('txna', 'txn', 'u8'), 0x37: ('gtxna', 'u8', 'txn', 'u8'), 0x38: ('gtxns', 'txn'),
+    0x39: ('gtxnsa', 'txn', 'u8'), 0x3a: ('gload', 'u8', 'u8'), 0x3b: ('gloads', 'u8'), 0x3c: ('gaid', 'u8'),
+    0x3d: ('gaids',), 0x3e: ('loads',), 0x3f: ('stores',),
+    0x40: ('bnz', 'label'), 0x41: ('bz', 'label'), 0x42: ('b', 'label'), 0x43: ('return',), 0x44: ('assert',),
+    0x45: ('bury', 'u8'), 0x46: ('popn', 'u8'), 0x47: ('dupn', 'u8'), 0x48: ('pop',), 0x49: ('dup',),
+    0x4a: ('dup2',), 0x4b: ('dig', 'u8'), 0x4c: ('swap',), 0x4d: ('select',), 0x4e: ('cover', 'u8'),
+    0x4f: ('uncover', 'u8'), 0x50: ('concat',), 0x51: ('substring', 'u8', 'u8'), 0x52: ('substring3',),
+    0x53: ('getbit',), 0x54: ('setbit',), 0x55: ('getbyte',), 0x56: ('setbyte',), 0x57: ('extract', 'u8', 'u8'),
+    0x58: ('extract3',), 0x59: ('extract_uint16',), 0x5a: ('extract_uint32',), 0x5b: ('extract_uint64',),
+    0x5c: ('replace2', 'u8'), 0x5d: ('replace3',), 0x5e: ('base64_decode', 'encoding'), 0x5f: ('json_ref', 'json'),
+    0x60: ('balance',), 0x61: ('app_opted_in',), 0x62: ('app_local_get',), 0x63: ('app_local_get_ex',),
+    0x64: ('app_global_get',), 0x65: ('app_global_get_ex',), 0x66: ('app_local_put',), 0x67: ('app_global_put',),
+    0x68: ('app_local_del',), 0x69: ('app_global_del',),
+    0x70: ('asset_holding_get', 'asset_holding'), 0x71: ('asset_params_get', 'asset_params'),
+    0x72: ('app_params_get', 'app_params'), 0x73: ('acct_params_get', 'acct_params'), 0x78: ('min_balance',),
+    0x80: ('pushbytes', 'bytes'), 0x81: ('pushint', 'varuint'), 0x82: ('pushbytess', 'bytess'),
+    0x83: ('pushints', 'ints'), 0x84: ('ed25519verify_bare',),
+    0x88: ('callsub', 'label'), 0x89: ('retsub',), 0x8a: ('proto', 'u8', 'u8'), 0x8b: ('frame_dig', 'i8'),
+    0x8c: ('frame_bury', 'i8'), 0x8d: ('switch', 'labels'), 0x8e: ('match', 'labels'),
+    0x90: ('shl',), 0x91: ('shr',), 0x92: ('sqrt',), 0x93: ('bitlen',), 0x94: ('exp',), 0x95: ('expw',),
+    0x96: ('bsqrt',), 0x97: ('divw',), 0x98: ('sha3_256',),
+    0xa0: ('b+',), 0xa1: ('b-',), 0xa2: ('b/',), 0xa3: ('b*',), 0xa4: ('b<',), 0xa5: ('b>',), 0xa6: ('b<=',),
+    0xa7: ('b>=',), 0xa8: ('b==',), 0xa9: ('b!=',), 0xaa: ('b%',), 0xab: ('b|',), 0xac: ('b&',), 0xad: ('b^',),
+    0xae: ('b~',), 0xaf: ('bzero',), 0xb0: ('log',), 0xb1: ('itxn_begin',), 0xb2: ('itxn_field', 'txn'),
+    0xb3: ('itxn_submit',), 0xb4: ('itxn', 'txn'), 0xb5: ('itxna', 'txn', 'u8'), 0xb6: ('itxn_next',),
+    0xb7: ('gitxn', 'u8', 'txn'), 0xb8: ('gitxna', 'u8', 'txn', 'u8'), 0xb9: ('box_create',),
+    0xba: ('box_extract',), 0xbb: ('box_replace',), 0xbc: ('box_del',), 0xbd: ('box_len',), 0xbe: ('box_get',),
+    0xbf: ('box_put',), 0xc0: ('txnas', 'txn'), 0xc1: ('gtxnas', 'u8', 'txn'), 0xc2: ('gtxnsas', 'txn'),
+    0xc3: ('args',), 0xc4: ('gloadss',), 0xc5: ('itxnas', 'txn'), 0xc6: ('gitxnas', 'u8', 'txn'),
+    0xd0: ('vrf_verify', 'vrf'), 0xd1: ('block', 'block'),
+}
+
+
+class DisassemblyError(Exception):
+    pass
+
+
+def _varuint(program: bytes, pc: int) -> tuple[int, int]:
+    value = shift = 0
+    while True:
+        if pc >= len(program):
+            raise DisassemblyError('truncated varuint')
+        byte = program[pc]
+        value |= (byte & 0x7f) << shift
+        pc += 1
+        if byte < 0x80:
+            return value, pc
+        shift += 7
+
+
+def _guess_format(value: bytes) -> str:
+    """The comment algod adds to byte constants: an address, a string or hex"""
+    if len(value) == 32:
+        return f'addr {encoding.encode_address(value)}'
+    if all(32 <= byte < 127 for byte in value):
+        return json.dumps(value.decode())
+    return f'0x{value.hex()}'
+
+
+def _decode(program: bytes, pc: int) -> tuple[str, list, list[int], int]:
+    """Decodes the instruction at pc.
+    :return: name, immediates, branch targets and pc of the next instruction"""
+    opcode = OPCODES.get(program[pc])
+    if opcode is None:
+        raise DisassemblyError(f'invalid opcode {program[pc]:#04x} at pc={pc}')
+
+    name, *kinds = opcode
+    pc += 1
+    immediates, targets = [], []
+    for kind in kinds:
+        if kind in ('u8', 'i8') or kind in FIELDS:
+            if pc >= len(program):
+                raise DisassemblyError(f'{name} is missing an immediate')
+            value = program[pc]
+            pc += 1
+            if kind == 'i8':
+                immediates.append(value - 256 if value > 127 else value)
+            elif kind in FIELDS:
+                names = FIELDS[kind]
+                immediates.append(names[value] if value < len(names) else str(value))
+            else:
+                immediates.append(value)
+        elif kind == 'varuint':
+            value, pc = _varuint(program, pc)
+            immediates.append(value)
+        elif kind == 'ints':
+            count, pc = _varuint(program, pc)
+            for _ in range(count):
+                value, pc = _varuint(program, pc)
+                immediates.append(value)
+        elif kind in ('bytes', 'bytess'):
+            count = 1
+            if kind == 'bytess':
+                count, pc = _varuint(program, pc)
+            for _ in range(count):
+                length, pc = _varuint(program, pc)
+                immediates.append(program[pc:pc + length])
+                pc += length
+        elif kind == 'label':
+            offset = int.from_bytes(program[pc:pc + 2], 'big', signed=True)
+            pc += 2
+            targets.append(pc + offset)
+        elif kind == 'labels':
+            count = program[pc]
+            offsets = [int.from_bytes(program[pc + 1 + 2 * i:pc + 3 + 2 * i], 'big', signed=True) for i in range(count)]
+            pc += 1 + 2 * count
+            targets.extend(pc + offset for offset in offsets)
+
+    if pc > len(program):
+        raise DisassemblyError(f'{name} is truncated')
+    return name, immediates, targets, pc
+
+
+def disassemble_local(program: bytes) -> str:
+    """Disassembles TEAL bytecode without algod"""
+    version, start = _varuint(program, 0)
+
+    instructions = []
+    labels: dict[int, str] = {}
+    intc: list[int] = []
+    bytec: list[bytes] = []
+    pc = start
+    while pc < len(program):
+        name, immediates, targets, next_pc = _decode(program, pc)
+        for target in targets:
+            labels.setdefault(target, f'label{len(labels) + 1}')
+        instructions.append((pc, name, immediates, targets))
+        pc = next_pc
+
+    lines = [f'#pragma version {version}']
+    for pc, name, immediates, targets in instructions:
+        if pc in labels:
+            lines.append(f'{labels[pc]}:')
+        args = [f'0x{value.hex()}' if isinstance(value, bytes) else str(value) for value in immediates]
+        args += [labels[target] for target in targets]
+        line = ' '.join([name, *args])
+        # like algod, constants are shown next to the opcodes that push them
+        if name == 'intcblock':
+            intc = immediates
+        elif name == 'bytecblock':
+            bytec = immediates
+        elif name == 'pushbytes':
+            line += f' // {_guess_format(immediates[0])}'
+        elif name.startswith(('intc', 'bytec')):
+            constants = intc if name.startswith('intc') else bytec
+            index = immediates[0] if immediates else int(name[-1])
+            if index < len(constants):
+                value = constants[index]
+                line += f' // {value}' if isinstance(value, int) else f' // {_guess_format(value)}'
+        lines.append(line)
+    if len(program) in labels:
+        lines.append(f'{labels[len(program)]}:')
+
+    return '\n'.join(lines) + '\n'
+
+
+_memory: dict[str, str] = {}
+
+
+def program_hash(program: bytes) -> str:
+    return hashlib.sha256(program).hexdigest()
+
+
+def disassemble(program: bytes, algod_client: algod.AlgodClient = None) -> list[str]:
+    """Returns the lines of the disassembled program, from memory, the disk cache, algod
+    or the local disassembler, in that order"""
+    key = program_hash(program)
+    text = _memory.get(key)
+    if text is None:
+        text = _read_cache(key)
+    if text is None:
+        text = _disassemble_remote(program, algod_client)
+        if text is None:
+            text = disassemble_local(program)
+        _write_cache(key, text)
+
+    _memory[key] = text
+    return text.split('\n')
+
+
+def _disassemble_remote(program: bytes, algod_client: algod.AlgodClient | None) -> str | None:
+    if algod_client is None:
+        return None
+    try:
+        return algod_client.disassemble(program).get('result', '')
+    except Exception:
+        return None
+
+
+def _read_cache(key: str) -> str | None:
+    try:
+        return (CACHE_DIR / f'{key}.teal').read_text()
+    except OSError:
+        return None
+
+
+def _write_cache(key: str, text: str) -> None:
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = CACHE_DIR / f'.{key}.{os.getpid()}.tmp'
+        tmp.write_text(text)
+        os.replace(tmp, CACHE_DIR / f'{key}.teal')
+    except OSError:
+        pass
\ No newline at end of file
@@ -1,20 +1,76 @@
+import atexit
+import json
+import struct
+import threading
 import time
+from collections import deque
 from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from algofuzz.metrics import PhaseTimers
+
+COLUMNS = ("call_count", "calls_rejected", "percent_rejected", "lines_covered", "percent_covered", "unique_paths", "unique_transitions")
+# struct codes of the columns in the binary format
+COLUMN_TYPES = "qqdqdqq"
+BINARY_MAGIC = b"ALGOFUZZ-DUMP-1\n"
+PHASES_MAGIC = b"ALGOFUZZ-PHASES-1\n"
 
 class DataDumper:
-    def __init__(self, path: Path, interval: int, is_time_interval: bool):
+    """Writes the metrics of a fuzzing run every `interval` seconds or calls.
+
+    Rows are put into a ring buffer and written by a background thread, which flushes
+    the file every `flush_interval` seconds and when the dumper is closed. If the writer
+    falls more than `buffer_size` rows behind, the oldest rows are dropped and counted.
+
+    The binary format writes the rows in blocks, each a row count followed by one packed
+    array per column, see `read_binary`.
+
+    A fuzzer closes the dumper it was started with when its run ends. Otherwise `close`
+    must be called, or the dumper used as a context manager, to write the last rows.
+    """
+
+    def __init__(self, path: Path, interval: int, is_time_interval: bool, binary: bool = False, buffer_size: int = 1 << 16, flush_interval: float = 1.0):
         self.path = path
         self.interval = interval # seconds or calls
         self.is_time_interval = is_time_interval
+        self.binary = binary
+        self.flush_interval = flush_interval
         self.last_time = None
+        self.last_call_count = None
+        self.dropped = 0
+        self.file = None
+        self._buffer: deque[tuple] = deque(maxlen=buffer_size)
+        # latest row that was not due, written on close so the dump ends with the final state
+        self._pending: tuple | None = None
+        # latency of the call phases as (phase, count, p50, p99, mean, max) in ns, written on close
+        self._phases: list[tuple] | None = None
+        self._wake = threading.Event()
+        self._closed = threading.Event()
+        self._writer: threading.Thread | None = None
+        self._write_lock = threading.Lock()
+
+    def __enter__(self) -> "DataDumper":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
 
-    
     def create_dump(self, *args):
-        self.file = open(self.path, "a")
-        for arg in args:
-            self.file.write(f"#{arg}\n")
-        self.file.write("call_count, calls_rejected, percent_rejected, lines_covered, percent_covered, unique_paths, unique_transitions \n")
-        
+        if self.binary:
+            self.file = open(self.path, "ab")
+            self.file.write(BINARY_MAGIC)
+            self.file.write(json.dumps({"info": [str(arg) for arg in args], "columns": COLUMNS, "types": COLUMN_TYPES}).encode() + b"\n")
+        else:
+            self.file = open(self.path, "a")
+            for arg in args:
+                self.file.write(f"#{arg}\n")
+            self.file.write("call_count, calls_rejected, percent_rejected, lines_covered, percent_covered, unique_paths, unique_transitions \n")
+        self.file.flush()
+
+        self._writer = threading.Thread(target=self._run, name="algofuzz-dumper", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
 
     def dump(
         self,
@@ -25,23 +81,131 @@ class DataDumper:
         rejected_calls: int,
         call_count: int
     ):
-        
         percent_rejected = rejected_calls / call_count * 100 if call_count > 0 else 0
-        if(self.last_time is None):
+        row = (call_count, rejected_calls, percent_rejected, covered_line_count, coverage, covered_paths, transitions)
+
+        if not self._is_due(call_count):
+            self._pending = row
+            return
+
+        self._append(row)
+        self._pending = None
+
+    def _append(self, row: tuple) -> None:
+        if len(self._buffer) == self._buffer.maxlen:
+            self.dropped += 1
+        self._buffer.append(row)
+
+    def dump_phases(self, timers: "PhaseTimers") -> None:
+        """Records the latency of the call phases of the run, written when the dumper is closed"""
+        self._phases = [
+            (phase, histogram.count, histogram.percentile(50), histogram.percentile(99), round(histogram.mean), histogram.max)
+            for phase, histogram in timers.histograms.items()
+            if histogram.count > 0
+        ]
+
+    def _is_due(self, call_count: int) -> bool:
+        now = time.time() if self.is_time_interval else None
+        if self.last_time is None:
             self.first_time = time.time()
             self.last_time = self.first_time
-            self.file.write(f"{call_count}, {rejected_calls}, {percent_rejected:.2f}, {covered_line_count}, {coverage:.2f}, {covered_paths}, {transitions}\n")
-            return
+            self.last_call_count = call_count
+            return True
 
-        
         if self.is_time_interval:
-            time_passed = time.time() - self.last_time
-            if time_passed < self.interval:
+            if now - self.last_time < self.interval:
+                return False
+            # keep to the grid of intervals, a late row does not delay the following ones
+            self.last_time += (now - self.last_time) // self.interval * self.interval
+            return True
+
+        if call_count - self.last_call_count < self.interval:
+            return False
+        self.last_call_count = call_count
+        return True
+
+    def close(self) -> None:
+        """Writes the remaining rows, including the final state, and closes the file"""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        atexit.unregister(self.close)
+        if self._pending is not None:
+            self._append(self._pending)
+            self._pending = None
+        if self._writer is not None:
+            self._wake.set()
+            self._writer.join()
+        if self.file is not None:
+            self._write()
+            self._write_phases()
+            if self.dropped > 0 and not self.binary:
+                self.file.write(f"#dropped {self.dropped} rows\n")
+            self.file.close()
+
+    def _run(self) -> None:
+        while not self._closed.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self._write()
+
+    def _write(self) -> None:
+        with self._write_lock:
+            rows = []
+            while self._buffer:
+                rows.append(self._buffer.popleft())
+            if not rows:
                 return
-            
-            self.file.write(f"{call_count}, {rejected_calls}, {rejected_calls / call_count * 100:.2f}, {covered_line_count}, {coverage:.2f}, {covered_paths}, {transitions}\n")
-            self.last_time = time.time()
+
+            if self.binary:
+                self.file.write(struct.pack("<I", len(rows)))
+                for column, code in zip(zip(*rows), COLUMN_TYPES):
+                    self.file.write(struct.pack(f"<{len(rows)}{code}", *column))
+            else:
+                self.file.write("".join(
+                    f"{call_count}, {rejected}, {percent_rejected:.2f}, {lines}, {coverage:.2f}, {paths}, {transitions}\n"
+                    for call_count, rejected, percent_rejected, lines, coverage, paths, transitions in rows
+                ))
+            self.file.flush()
+
+    def _write_phases(self) -> None:
+        if self._phases is None:
             return
-        
-        if call_count % self.interval == 0:
-            self.file.write(f"{call_count}, {rejected_calls}, {rejected_calls / call_count * 100:.2f}, {covered_line_count}, {coverage:.2f}, {covered_paths}, {transitions}\n")
\ No newline at end of file
+        if self.binary:
+            self.file.write(PHASES_MAGIC + json.dumps(self._phases).encode() + b"\n")
+            return
+        self.file.write("#phase, count, p50_ns, p99_ns, mean_ns, max_ns\n")
+        for row in self._phases:
+            self.file.write("#" + ", ".join(str(value) for value in row) + "\n")
+
+
+def read_binary(path: Path) -> tuple[dict, list[tuple]]:
+    """Reads a binary dump.
+    :return: Header with the run info, column names and phase latencies, and the rows"""
+    with open(path, "rb") as f:
+        data = f.read()
+
+    header = None
+    rows = []
+    offset = 0
+    while offset < len(data):
+        # a file that was appended to holds several dumps
+        if data.startswith(BINARY_MAGIC, offset):
+            end = data.index(b"\n", offset + len(BINARY_MAGIC))
+            header = json.loads(data[offset + len(BINARY_MAGIC):end])
+            offset = end + 1
+            continue
+        if data.startswith(PHASES_MAGIC, offset):
+            end = data.index(b"\n", offset + len(PHASES_MAGIC))
+            header["phases"] = json.loads(data[offset + len(PHASES_MAGIC):end])
+            offset = end + 1
+            continue
+
+        (count,) = struct.unpack_from("<I", data, offset)
+        offset += 4
+        columns = []
+        for code in COLUMN_TYPES:
+            columns.append(struct.unpack_from(f"<{count}{code}", data, offset))
+            offset += count * struct.calcsize(code)
+        rows.extend(zip(*columns))
+    return header, rows
\ No newline at end of file
@@ -1,27 +1,35 @@
 import random
-from typing import Callable, Set
+from collections import deque
+from typing import TYPE_CHECKING, Callable
 from algokit_utils import Account
 from algosdk import (abi)
-from algofuzz.FuzzAppClient import FuzzAppClient
+from algofuzz.backend import ExecutionBackend, ExecutionResult
 from algofuzz.dumper import DataDumper
 
 from algofuzz.mutate import AccountMutator, MethodMutator
 from algofuzz.ContractState import ContractState
+from algofuzz.coverage import EDGE_MAP_SIZE, VirginMap
 from enum import Enum
 from abc import ABC, abstractmethod
-import curses
 import time
-from algofuzz.scheduler import PowerSchedule, Seed
+from algofuzz.pipeline import BatchRunner, Pipeline
+from algofuzz.scheduler import Ids, PowerSchedule, Seed, SeenIds
+from algofuzz.metrics import phase_timers
+from algofuzz.status import MethodStats, StatusDisplay
+
+if TYPE_CHECKING:
+    from algofuzz.parallel import CorpusSync
 
 class Driver(Enum):
     COVERAGE = 0
     STATE = 1
     COMBINED = 2
+    EDGE = 3
 
 Candidate = tuple[str, list, Account]
 
 class ContractFuzzer(ABC):
-    def __init__(self, app_client: FuzzAppClient):
+    def __init__(self, app_client: ExecutionBackend):
         self.app_client = app_client
 
     def start(
@@ -33,7 +41,11 @@ class ContractFuzzer(ABC):
             schedule_coef: float = 0.5,
             breakout_coef = 0.1,
             suppress_output: bool = False,
-            dumper: DataDumper = None
+            dumper: DataDumper = None,
+            state_resync_interval: int = 0,
+            sync: "CorpusSync" = None,
+            pipeline_window: int = 1,
+            batch_size: int = 1
         ) -> int | None:
 
         self.eval = eval
@@ -41,14 +53,23 @@ class ContractFuzzer(ABC):
         self.schedule_coef = schedule_coef
         self.breakout_coef = breakout_coef
         self.dumper = dumper
+        self.sync = sync
+        self.runs = runs
+        self.timeout_seconds = timeout_seconds
+        self.suppress_output = suppress_output
+        # candidates found by other workers, executed before fuzzing new ones
+        self.imports: deque[Candidate] = deque()
+        self.property_violated = False
 
         self.rejected_calls = 0
         self.transitions_count = 0
-        self.covered_lines: Set[int] = set()
         self.cov_paths = 0
         
         self.app_client.create()
-        self.lines_count = self.app_client.approval_line_count
+        self.lines_count = self.app_client.coverage_size
+        self.virgin = VirginMap(self.lines_count)
+        self.edge_virgin = VirginMap(EDGE_MAP_SIZE) if driver == Driver.EDGE else None
+        self.app_client.track_edges = driver == Driver.EDGE
         try:
             self.app_client.opt_in_all()
         except:
@@ -57,37 +78,73 @@ class ContractFuzzer(ABC):
         if self.dumper is not None:
             self.dumper.create_dump(self.app_client.app_id, self.app_client.app_name, self.lines_count, self.driver, self.schedule_coef, self.breakout_coef)
         
-        self.contract_state = ContractState(self.app_client)
+        self.contract_state = ContractState(self.app_client, resync_interval=state_resync_interval)
         self.contract_state.load()
 
+        # ids of the paths and transitions of this run
+        self.ids = Ids()
         self._setup()
 
-        if not suppress_output:
-            self.stdscr = curses.initscr()
+        # per method counters are only kept for the status screen
+        self.method_stats = None if suppress_output else {method.name: MethodStats() for method in self.app_client.methods}
+        self.status = None if suppress_output else StatusDisplay(self)
         self.call_count = 0
 
         self._dump()
-        start_time = time.time()
-        while (True):
-            if timeout_seconds is None:
-                if self.call_count >= runs:
-                    break
-            elif time.time() - start_time > timeout_seconds:
-                break
+        phase_timers.reset()
+        self.start_time = time.time()
+        self.last_find_time = self.start_time
+        if self.status is not None:
+            self.status.start()
+        try:
+            self._run(pipeline_window, batch_size)
+        finally:
+            if self.status is not None:
+                self.status.stop()
+            if self.dumper is not None:
+                self.dumper.dump_phases(phase_timers)
+                self.dumper.close()
+
+    def _run(self, pipeline_window: int, batch_size: int) -> None:
+        if batch_size > 1:
+            BatchRunner(self, batch_size).run()
+            return
+        if pipeline_window > 1:
+            Pipeline(self, pipeline_window).run()
+            return
 
+        while self._has_budget():
             self.call_count += 1
             assert_failed = self._call()
-            self.transitions_count = self._count_transitions()
-            self.cov_paths = self._count_cov_paths()
+            if not self._after_call(assert_failed):
+                break
 
-            if not suppress_output:
-                self._print_status(runs if timeout_seconds is None else None)
-            
-            self._dump()
+    def _has_budget(self, in_flight: int = 0) -> bool:
+        """Whether another call may be started, given the number of calls in flight"""
+        if self.timeout_seconds is None:
+            return self.call_count + in_flight < self.runs
+        return time.time() - self.start_time <= self.timeout_seconds
+
+    def _after_call(self, assert_failed: bool) -> bool:
+        """Updates the status after a call.
+        :return: Whether fuzzing should go on"""
+        self.transitions_count = self._count_transitions()
+        self.cov_paths = self._count_cov_paths()
+        self._dump()
 
-            if not self._eval(assert_failed):
-                break
-        
+        start = phase_timers.now()
+        passed = self._eval(assert_failed)
+        phase_timers.record('eval', start)
+        if not passed:
+            self.property_violated = True
+            return False
+
+        if self.sync is not None and self.call_count % self.sync.interval == 0:
+            self.sync.sync(self)
+            if self.sync.stopped:
+                return False
+
+        return True
             
     @abstractmethod
     def _setup(self):
@@ -95,35 +152,30 @@ class ContractFuzzer(ABC):
 
     def _create_power_schedule(self) -> PowerSchedule:
         match self.driver:
-            case Driver.STATE: return PowerSchedule(trans_coef=1.0)
-            case Driver.COVERAGE: return PowerSchedule(trans_coef=0.0)
+            case Driver.STATE: return PowerSchedule(trans_coef=1.0, ids=self.ids)
+            case Driver.COVERAGE | Driver.EDGE: return PowerSchedule(trans_coef=0.0, ids=self.ids)
             case Driver.COMBINED: 
                 trans_coef = 0.5
                 if 0.0 <= self.schedule_coef and self.schedule_coef <= 1.0:
                     trans_coef = self.schedule_coef
                 
-                return PowerSchedule(trans_coef=trans_coef)
-            
-    def _print_status(self, total_runs) -> None:
-        mode = "Property Test" if self.eval is not None else "Assertion"
-        self.stdscr.addstr(0, 0, f"Fuzzing contract {self.app_client.app_name} (id: {self.app_client.app_id}) in {mode} mode\n")
-
-        total_runs_str = f"/{total_runs}" if total_runs is not None else ""
-        self.stdscr.addstr(2, 0, f"Calls executed: \t{self.call_count}{total_runs_str}")
-        self.stdscr.addstr(3, 0, f"Calls rejected: \t{self.rejected_calls} ({self.rejected_calls/(self.call_count) * 100:.2f}%)\n")
-        self.stdscr.addstr(4, 0, f"State transitions: \t{self.transitions_count}\n")
-        self.stdscr.addstr(5, 0, f"Lines covered: \t\t{len(self.covered_lines)}/{self.lines_count} ({len(self.covered_lines) / self.lines_count * 100:.2f}%)")
-        self.stdscr.addstr(6, 0, f"Unique coverage paths: \t{self.cov_paths}")
+                return PowerSchedule(trans_coef=trans_coef, ids=self.ids)
 
-        self.stdscr.refresh()
+    @property
+    def covered_line_count(self) -> int:
+        return self.virgin.covered_count
 
+    @property
+    def covered_edge_count(self) -> int | None:
+        return self.edge_virgin.covered_count if self.edge_virgin is not None else None
+            
     def _dump(self) -> None:
         if self.dumper is None:
             return
 
         self.dumper.dump(
-            covered_line_count=len(self.covered_lines),
-            coverage=len(self.covered_lines) / self.lines_count * 100,
+            covered_line_count=self.covered_line_count,
+            coverage=self.covered_line_count / self.lines_count * 100,
             covered_paths=self.cov_paths,
             transitions=self.transitions_count,
             rejected_calls=self.rejected_calls,
@@ -138,6 +190,10 @@ class ContractFuzzer(ABC):
     def _count_cov_paths(self) -> int:
         pass
 
+    def merge_path(self, schedule: PowerSchedule, path_id: int, count: int) -> None:
+        """Adds count occurrences of a path found elsewhere, e.g. by another worker"""
+        schedule.path_frequency[path_id] = schedule.path_frequency.get(path_id, 0) + count
+
     def _eval(self, assertion_failed):
         if self.eval is None:
             return not assertion_failed
@@ -148,47 +204,108 @@ class ContractFuzzer(ABC):
     def _call(self) -> bool:
         """Makes a call to the applicaiton with a fuzzed value.
         :return: Boolean indicating whether there was an assertion failure"""
-        method_name, args, acc = self.fuzz()
+        (method_name, args, acc), imported = self._next_candidate()
         method = self.app_client.get_method(method_name)
         self.app_client.change_sender(acc)
 
-        res, cov, assert_failed = self.app_client.call(method, args)
-
-        if res is None:
+        return self._process(self.app_client.execute(method, args), imported)
+
+    def _complete_call(self, candidate: Candidate, imported: bool, execution: ExecutionResult) -> bool:
+        """Processes the result of a call of candidate made outside of `_call`.
+        :return: Whether fuzzing should go on"""
+        self.call_count += 1
+        self._set_input(candidate)
+        self.app_client.change_sender(candidate[2])
+        return self._after_call(self._process(execution, imported))
+
+    def _next_candidate(self) -> tuple[Candidate, bool]:
+        """:return: The next candidate and whether it was imported from another worker"""
+        if len(self.imports) > 0:
+            return self._take_import(), True
+        start = phase_timers.now()
+        candidate = self.fuzz()
+        phase_timers.record('mutate', start)
+        return candidate, False
+
+    def _process(self, execution: ExecutionResult, imported: bool) -> bool:
+        """Updates coverage, state and schedule with the result of the call of `self.inp`.
+        :return: Boolean indicating whether there was an assertion failure"""
+        stats = self.method_stats[self.inp[0]] if self.method_stats is not None else None
+        if stats is not None:
+            stats.calls += 1
+        if execution.rejected:
             self.rejected_calls += 1
-            return assert_failed
+            if stats is not None:
+                stats.rejected += 1
+            return execution.assertion_failed
         
-        self.covered_lines.update(cov)
-        transition = self.contract_state.load() 
-        self._update(cov, transition)
+        cov = execution.coverage
+        new_bits = self.virgin.has_new_bits(cov)
+        if self.edge_virgin is not None:
+            # paths and novelty of the edge driver are judged on the edge bitmap
+            cov, new_bits = cov.edges, self.edge_virgin.has_new_bits(cov.edges)
+
+        start = phase_timers.now()
+        transition = self.contract_state.load(execution.result)
+        start = phase_timers.record('state', start)
+        is_interesting = self._update(cov, transition, new_bits)
+        phase_timers.record('update', start)
+        if is_interesting:
+            self.last_find_time = time.time()
+            if stats is not None:
+                stats.finds += 1
+        if is_interesting and self.sync is not None and not imported:
+            self.sync.export(self.inp)
         return False
 
     @abstractmethod
     def fuzz(self) -> Candidate:
         pass
+
+    def _take_import(self) -> Candidate:
+        return self._set_input(self.imports.popleft())
+
+    def _set_input(self, candidate: Candidate) -> Candidate:
+        """Makes candidate the input that the next update refers to"""
+        self.inp = candidate
+        return self.inp
+
+    @abstractmethod
+    def schedules(self) -> dict[str, PowerSchedule]:
+        """Power schedules of the fuzzer by name"""
+        pass
         
     @abstractmethod
-    def _update(self, cov: set[int], transition: tuple[dict, dict]) -> None:
+    def _update(self, cov: bytearray, transition: tuple[dict, dict], new_bits: int) -> bool:
+        """Updates the schedule with the result of a call.
+        :param cov: Classified coverage bitmap of the call
+        :param new_bits: Result of checking the bitmap against the campaign wide virgin map
+        :return: Whether the candidate was added to the population"""
         pass
 
     def _is_interesting(self, is_new_transition: bool, is_new_coverage: bool) -> bool:
         match self.driver:
             case Driver.STATE: return is_new_transition
-            case Driver.COVERAGE: return is_new_coverage
+            case Driver.COVERAGE | Driver.EDGE: return is_new_coverage
             case Driver.COMBINED: return is_new_transition or is_new_coverage
 
 
 MethodCandidate = tuple[list, Account]
 class MethodFuzzer:
-    def __init__(self, method: abi.Method, addr: str, schedule: PowerSchedule, breakout_coef: float):
+    def __init__(self, method: abi.Method, addr: str, schedule: PowerSchedule, breakout_coef: float, seen: SeenIds = None):
         self.method = method
         self.acc_mutator = AccountMutator()
         self.mutator = MethodMutator(method, addr)
         self.seeds: list[MethodCandidate] = [(self.mutator.seed(), acc) for acc in self.acc_mutator.accs]
         self.seed_index = 0
-        self.population: list[MethodCandidate] = []
         self.schedule = schedule
+        self.population: list[Seed] = schedule.population
         self.breakout_coef = breakout_coef
+        self.seen = seen if seen is not None else SeenIds()
+        # novelty is judged per method: a method taking a new path over lines another
+        # method already covered still gains a seed. Sized by the first bitmap, lines
+        # or edges depending on the driver
+        self.virgin: VirginMap | None = None
     
     def fuzz(self):
         if self.seed_index < len(self.seeds):
@@ -205,7 +322,7 @@ class MethodFuzzer:
         """Returns an input generated by fuzzing a seed in the population"""
         candidate = None
         if len(self.population) > 0 and random.random() > self.breakout_coef:
-            seed = self.schedule.choose(self.population)
+            seed = self.schedule.choose()
             candidate = seed.data
         else:
             candidate = random.choice(self.seeds)
@@ -222,45 +339,64 @@ class MethodFuzzer:
         new_acc = self.acc_mutator.mutate(acc)
         return (new_args, new_acc)
     
-    def update(self, cov: set[int], transition: tuple[dict, dict], is_interesting: Callable[[bool, bool], bool]) -> None:
+    def update(self, cov: bytearray, transition: tuple[dict, dict], is_interesting: Callable[[bool, bool], bool]) -> bool:
         is_new_transition, transition_id = self.schedule.addTransition(transition) 
-        is_new_coverage, path_id = self.schedule.addPath(cov)
-
-        if is_interesting(is_new_transition, is_new_coverage):
-            seed = Seed(self.inp)
-            seed.transition_id = transition_id
-            seed.path_id = path_id
-            self.population.append(seed) 
+        is_new_path, path_id = self.schedule.addPath(cov)
+        if self.virgin is None:
+            self.virgin = VirginMap(len(cov))
+        is_new_coverage = self.virgin.has_new_bits(cov) > 0
+        if is_new_transition:
+            self.seen.transitions.add(transition_id)
+        if is_new_path:
+            self.seen.paths.add(path_id)
+
+        if not is_interesting(is_new_transition, is_new_coverage):
+            return False
+
+        seed = Seed(self.inp)
+        seed.transition_id = transition_id
+        seed.path_id = path_id
+        self.schedule.add(seed)
+        return True
 
 class PartialFuzzer(ContractFuzzer):
     def _setup(self):
+        # paths and transitions of all methods, updated by the method fuzzers
+        self.seen = SeenIds()
         self.method_fuzzers = {
-            method.name: MethodFuzzer(method, self.app_client.sender, self._create_power_schedule(), self.breakout_coef) 
+            method.name: MethodFuzzer(method, self.app_client.sender, self._create_power_schedule(), self.breakout_coef, self.seen) 
             for method in self.app_client.methods
         }
 
     def _count_transitions(self) -> int:
-        transitions = set()
-        for method_fuzzer in self.method_fuzzers.values():
-            transitions.update(method_fuzzer.schedule.transition_frequency.keys())
-        return len(transitions)
+        return len(self.seen.transitions)
     
     def _count_cov_paths(self) -> int:
-        paths = set()
-        for method_fuzzer in self.method_fuzzers.values():
-            paths.update(method_fuzzer.schedule.path_frequency.keys())
-        return len(paths)
+        return len(self.seen.paths)
+
+    def merge_path(self, schedule: PowerSchedule, path_id: int, count: int) -> None:
+        super().merge_path(schedule, path_id, count)
+        self.seen.paths.add(path_id)
 
     def fuzz(self) -> Candidate:
         method = random.choice(self.app_client.methods)
         method_fuzzer = self.method_fuzzers[method.name]
         self.inp: Candidate = method.name, *method_fuzzer.fuzz()
         return self.inp
+
+    def _set_input(self, candidate: Candidate) -> Candidate:
+        method_name, args, acc = super()._set_input(candidate)
+        self.method_fuzzers[method_name].inp = (args, acc)
+        return self.inp
+
+    def schedules(self) -> dict[str, PowerSchedule]:
+        return {name: method_fuzzer.schedule for name, method_fuzzer in self.method_fuzzers.items()}
     
-    def _update(self, cov: set[int], transition: tuple[dict, dict]) -> None:
+    def _update(self, cov: bytearray, transition: tuple[dict, dict], new_bits: int) -> bool:
         method = self.app_client.get_method(self.inp[0])
         method_fuzzer = self.method_fuzzers[method.name]
-        method_fuzzer.update(cov, transition, self._is_interesting)
+        # the campaign wide new_bits only count for the status, see `MethodFuzzer.virgin`
+        return method_fuzzer.update(cov, transition, self._is_interesting)
 
 
 class TotalFuzzer(ContractFuzzer):    
@@ -274,8 +410,8 @@ class TotalFuzzer(ContractFuzzer):
                 self.seeds.append((method.name, self.method_mutators[method.name].seed(), acc))
 
         self.seed_index = 0
-        self.population: list[Seed] = []
         self.schedule = self._create_power_schedule()
+        self.population: list[Seed] = self.schedule.population
 
     def _count_transitions(self) -> int:
         return len(self.schedule.transition_frequency.keys())
@@ -283,6 +419,9 @@ class TotalFuzzer(ContractFuzzer):
     def _count_cov_paths(self) -> int:
         return len(self.schedule.path_frequency.keys())
 
+    def schedules(self) -> dict[str, PowerSchedule]:
+        return {'': self.schedule}
+
     def fuzz(self):
         if self.seed_index < len(self.seeds):
             # Still seeding
@@ -299,7 +438,7 @@ class TotalFuzzer(ContractFuzzer):
         
         breakout_cond = random.random() > self.breakout_coef
         if len(self.population) > 0 and breakout_cond:
-            seed = self.schedule.choose(self.population)
+            seed = self.schedule.choose()
             candidate = seed.data
         else:
             candidate = random.choice(self.seeds)
@@ -316,12 +455,16 @@ class TotalFuzzer(ContractFuzzer):
         new_acc = self.acc_mutator.mutate(acc)
         return (method, mutator.mutate(args), new_acc)
 
-    def _update(self, cov: set[int], transition: tuple[dict, dict]) -> None:
+    def _update(self, cov: bytearray, transition: tuple[dict, dict], new_bits: int) -> bool:
         is_new_transition, transition_id = self.schedule.addTransition(transition) 
-        is_new_coverage, path_id = self.schedule.addPath(cov)
+        _, path_id = self.schedule.addPath(cov)
+        is_new_coverage = new_bits > 0
+
+        if not self._is_interesting(is_new_transition, is_new_coverage):
+            return False
 
-        if self._is_interesting(is_new_transition, is_new_coverage):
-            seed = Seed(self.inp)
-            seed.transition_id = transition_id
-            seed.path_id = path_id
-            self.population.append(seed) 
+        seed = Seed(self.inp)
+        seed.transition_id = transition_id
+        seed.path_id = path_id
+        self.schedule.add(seed)
+        return True
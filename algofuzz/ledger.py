@@ -0,0 +1,480 @@
+"""In-memory ledger that applies transaction groups with the in-process TEAL evaluator."""
+import base64
+import time
+from dataclasses import dataclass, field
+
+from algosdk import transaction
+
+from algofuzz import avm
+from algofuzz.avm import Program, TealError, Value, address_bytes, address_string, app_address
+
+FIRST_APP_ID = 1001
+SCHEMA_UINT_COST = 25_000 + 3_500
+SCHEMA_BYTES_COST = 25_000 + 25_000
+BOX_FLAT_COST = 2_500
+BOX_BYTE_COST = 400
+
+_MISSING = object()
+
+
+@dataclass
+class AppData:
+    app_id: int
+    creator: bytes
+    approval: Program
+    clear: Program
+    global_schema: tuple[int, int]
+    local_schema: tuple[int, int]
+    extra_pages: int = 0
+
+
+@dataclass
+class TxnResult:
+    """Per transaction outcome, mirrors the fields algod reports for dryrun and confirmed transactions"""
+    txn: transaction.Transaction
+    trace: list[int] = field(default_factory=list)
+    messages: list[str] = field(default_factory=list)
+    logs: list[bytes] = field(default_factory=list)
+    cost: int = 0
+    global_delta: list[dict] = field(default_factory=list)
+    local_deltas: list[dict] = field(default_factory=list)
+    created_app: int = None
+    confirmed_round: int = None
+
+    @property
+    def is_app_call(self) -> bool:
+        return self.txn.type == 'appl'
+
+    def to_pending(self) -> dict:
+        """Returns the result in the format of algod's pending transaction information"""
+        result = {
+            'pool-error': '',
+            'txn': {'txn': self.txn.dictify()},
+        }
+        if self.confirmed_round is not None:
+            result['confirmed-round'] = self.confirmed_round
+        if self.created_app is not None:
+            result['application-index'] = self.created_app
+        if self.global_delta:
+            result['global-state-delta'] = self.global_delta
+        if self.local_deltas:
+            result['local-state-delta'] = self.local_deltas
+        if self.logs:
+            result['logs'] = [base64.b64encode(log).decode() for log in self.logs]
+        return result
+
+
+@dataclass
+class GroupResult:
+    passed: bool
+    txns: list[TxnResult]
+    message: str = ''
+    failed_index: int = None
+
+    @property
+    def assertion_failed(self) -> bool:
+        return 'assert failed' in self.message
+
+
+def _delta_value(value: Value | None) -> dict:
+    if value is None:
+        return {'action': 3}
+    if isinstance(value, int):
+        return {'action': 2, 'uint': value}
+    return {'action': 1, 'bytes': base64.b64encode(value).decode()}
+
+
+def _encode_delta(changes: dict[bytes, Value | None]) -> list[dict]:
+    return [
+        {'key': base64.b64encode(key).decode(), 'value': _delta_value(value)}
+        for key, value in changes.items()
+    ]
+
+
+class Ledger:
+    """Accounts, applications and their state, kept in memory.
+
+    Every mutation goes through a journal so that a failed group (or a dry run)
+    can be rolled back without copying the ledger."""
+
+    def __init__(self, round: int = 1, timestamp: int = None) -> None:
+        self.round = round
+        self.timestamp = int(time.time()) if timestamp is None else timestamp
+        self._realtime = timestamp is None
+        self.balances: dict[bytes, int] = {}
+        self.apps: dict[int, AppData] = {}
+        self.globals: dict[int, dict[bytes, Value]] = {}
+        self.locals: dict[tuple[bytes, int], dict[bytes, Value]] = {}
+        self.boxes: dict[tuple[int, bytes], bytes] = {}
+        self.next_app_id = FIRST_APP_ID
+        self._journal: list[tuple[dict, object, object]] = []
+
+    # funding and queries
+
+    def fund(self, address: str, amount: int) -> None:
+        raw = address_bytes(address)
+        self.balances[raw] = self.balances.get(raw, 0) + amount
+
+    def account_info(self, address: str) -> dict:
+        raw = address_bytes(address)
+        return {
+            'address': address,
+            'amount': self.balances.get(raw, 0),
+            'min-balance': self.min_balance(raw),
+            'round': self.round,
+        }
+
+    def global_state(self, app_id: int) -> dict[bytes, Value]:
+        return dict(self.globals.get(app_id, {}))
+
+    def local_state(self, address: str, app_id: int) -> dict[bytes, Value]:
+        key = (address_bytes(address), app_id)
+        if key not in self.locals:
+            raise TealError(f'account {address} is not opted in to app {app_id}')
+        return dict(self.locals[key])
+
+    # journal
+
+    def _set(self, container: dict, key, value) -> None:
+        self._journal.append((container, key, container.get(key, _MISSING)))
+        container[key] = value
+
+    def _delete(self, container: dict, key) -> None:
+        if key not in container:
+            return
+        self._journal.append((container, key, container[key]))
+        del container[key]
+
+    def _rollback(self, position: int) -> None:
+        while len(self._journal) > position:
+            container, key, old = self._journal.pop()
+            if old is _MISSING:
+                container.pop(key, None)
+            else:
+                container[key] = old
+
+    # view used by the evaluator
+
+    def balance(self, account: bytes) -> int:
+        return self.balances.get(account, 0)
+
+    def min_balance(self, account: bytes) -> int:
+        total = avm.MIN_BALANCE
+        for (address, app_id) in self.locals:
+            if address != account:
+                continue
+            uints, byte_slices = self.apps[app_id].local_schema
+            total += avm.MIN_BALANCE + uints * SCHEMA_UINT_COST + byte_slices * SCHEMA_BYTES_COST
+        for app in self.apps.values():
+            if app.creator != account:
+                continue
+            uints, byte_slices = app.global_schema
+            total += avm.MIN_BALANCE * (1 + app.extra_pages) + uints * SCHEMA_UINT_COST + byte_slices * SCHEMA_BYTES_COST
+        for (app_id, name), value in self.boxes.items():
+            if app_address(app_id) == account:
+                total += BOX_FLAT_COST + BOX_BYTE_COST * (len(name) + len(value))
+        return total
+
+    def opted_in(self, account: bytes, app_id: int) -> bool:
+        return (account, app_id) in self.locals
+
+    def app_creator(self, app_id: int) -> bytes:
+        return self.apps[app_id].creator
+
+    def app_param(self, app_id: int, name: str) -> Value | None:
+        app = self.apps.get(app_id)
+        if app is None:
+            return None
+        match name:
+            case 'AppApprovalProgram': return app.approval.source.encode()
+            case 'AppClearStateProgram': return app.clear.source.encode()
+            case 'AppGlobalNumUint': return app.global_schema[0]
+            case 'AppGlobalNumByteSlice': return app.global_schema[1]
+            case 'AppLocalNumUint': return app.local_schema[0]
+            case 'AppLocalNumByteSlice': return app.local_schema[1]
+            case 'AppExtraProgramPages': return app.extra_pages
+            case 'AppCreator': return app.creator
+            case 'AppAddress': return app_address(app_id)
+        raise TealError(f'invalid app_params_get field {name}')
+
+    def account_param(self, account: bytes, name: str) -> Value:
+        match name:
+            case 'AcctBalance': return self.balance(account)
+            case 'AcctMinBalance': return self.min_balance(account)
+            case 'AcctAuthAddr': return avm.ZERO_ADDRESS
+            case 'AcctTotalNumUint' | 'AcctTotalNumByteSlice' | 'AcctTotalExtraAppPages' | \
+                 'AcctTotalAppsCreated' | 'AcctTotalAppsOptedIn' | 'AcctTotalAssetsCreated' | \
+                 'AcctTotalAssets' | 'AcctTotalBoxes' | 'AcctTotalBoxBytes':
+                return 0
+        raise TealError(f'invalid acct_params_get field {name}')
+
+    def global_get(self, app_id: int, key: bytes) -> Value | None:
+        return self.globals.get(app_id, {}).get(key)
+
+    def global_put(self, app_id: int, key: bytes, value: Value) -> None:
+        self._set(self.globals[app_id], key, value)
+
+    def global_del(self, app_id: int, key: bytes) -> None:
+        self._delete(self.globals[app_id], key)
+
+    def _local(self, account: bytes, app_id: int) -> dict[bytes, Value]:
+        state = self.locals.get((account, app_id))
+        if state is None:
+            raise TealError(f'{address_string(account)} has not opted in to app {app_id}')
+        return state
+
+    def local_get(self, account: bytes, app_id: int, key: bytes) -> Value | None:
+        return self._local(account, app_id).get(key)
+
+    def local_put(self, account: bytes, app_id: int, key: bytes, value: Value) -> None:
+        self._set(self._local(account, app_id), key, value)
+
+    def local_del(self, account: bytes, app_id: int, key: bytes) -> None:
+        self._delete(self._local(account, app_id), key)
+
+    def box_create(self, app_id: int, name: bytes, size: int) -> bool:
+        if (app_id, name) in self.boxes:
+            if len(self.boxes[(app_id, name)]) != size:
+                raise TealError('box size mismatch')
+            return False
+        self._set(self.boxes, (app_id, name), bytes(size))
+        return True
+
+    def box_get(self, app_id: int, name: bytes) -> bytes | None:
+        return self.boxes.get((app_id, name))
+
+    def box_put(self, app_id: int, name: bytes, value: bytes) -> None:
+        current = self.boxes.get((app_id, name))
+        if current is not None and len(current) != len(value):
+            raise TealError('box_put wrong size')
+        self._set(self.boxes, (app_id, name), value)
+
+    def box_del(self, app_id: int, name: bytes) -> bool:
+        if (app_id, name) not in self.boxes:
+            return False
+        self._delete(self.boxes, (app_id, name))
+        return True
+
+    def submit_inner(self, inner: dict) -> None:
+        kind = inner.get('Type', b'')
+        if kind != b'pay':
+            raise avm.Unsupported(f'inner transactions of type {kind!r} are not supported')
+        sender = inner['Sender']
+        fee = inner.get('Fee') or avm.MIN_TXN_FEE
+        self._transfer(sender, inner.get('Receiver', avm.ZERO_ADDRESS), inner.get('Amount', 0), fee)
+        close_to = inner.get('CloseRemainderTo', avm.ZERO_ADDRESS)
+        if close_to != avm.ZERO_ADDRESS:
+            self._transfer(sender, close_to, self.balance(sender), 0)
+
+    def _transfer(self, sender: bytes, receiver: bytes, amount: int, fee: int) -> None:
+        balance = self.balance(sender)
+        if balance < amount + fee:
+            raise TealError(f'overspend (account {address_string(sender)}, data {balance}, tried to spend {amount + fee})')
+        self._set(self.balances, sender, balance - amount - fee)
+        self._set(self.balances, receiver, self.balance(receiver) + amount)
+
+    # transaction application
+
+    def apply_group(self, txns: list, commit: bool = True) -> GroupResult:
+        """Applies a group of (signed) transactions atomically.
+
+        With `commit=False` the group is only evaluated, as algod does for dryrun and simulate."""
+        group = [getattr(txn, 'transaction', txn) for txn in txns]
+        budget = [avm.APP_CALL_BUDGET * sum(1 for txn in group if txn.type == 'appl')]
+        results = [TxnResult(txn) for txn in group]
+
+        for index, txn in enumerate(group):
+            try:
+                self._apply(group, index, results[index], budget)
+            except TealError as e:
+                self._rollback(0)
+                return GroupResult(False, results, e.message, index)
+            except avm.Unsupported:
+                # not a rejection of the call, the evaluator cannot tell its outcome
+                self._rollback(0)
+                raise
+
+        for account in self._touched_accounts():
+            balance = self.balance(account)
+            if balance != 0 and balance < self.min_balance(account):
+                self._rollback(0)
+                message = f'account {address_string(account)} balance {balance} below min {self.min_balance(account)}'
+                return GroupResult(False, results, message, len(group) - 1)
+
+        if not commit:
+            self._rollback(0)
+            return GroupResult(True, results)
+
+        self._journal.clear()
+        self.round += 1
+        self.timestamp = max(self.timestamp + 1, int(time.time())) if self._realtime else self.timestamp + 1
+        for result in results:
+            result.confirmed_round = self.round
+        return GroupResult(True, results)
+
+    def dryrun(self, txns: list) -> list[TxnResult]:
+        """Evaluates every app call of a group on its own against the current state, as
+        algod's dryrun does: the calls see the group and share its opcode budget, but not
+        the fees, payments or state changes of the other transactions, and a rejected call
+        does not stop the evaluation of the next ones. Nothing is applied."""
+        group = [getattr(txn, 'transaction', txn) for txn in txns]
+        budget = [avm.APP_CALL_BUDGET * sum(1 for txn in group if txn.type == 'appl')]
+        results = [TxnResult(txn) for txn in group]
+        next_app_id = self.next_app_id
+
+        for index, txn in enumerate(group):
+            if txn.type != 'appl':
+                continue
+            result = results[index]
+            try:
+                self._apply_app_call(group, index, result, budget)
+            except TealError as e:
+                if not result.messages:
+                    result.messages = ['ApprovalProgram']
+                if 'REJECT' not in result.messages:
+                    # rejected after the program passed (e.g. on the schema) or before it ran
+                    result.messages = [*result.messages, 'REJECT', e.message]
+            finally:
+                self._rollback(0)
+                self.next_app_id = next_app_id
+        return results
+
+    def _touched_accounts(self) -> set[bytes]:
+        return {key for container, key, _ in self._journal if container is self.balances}
+
+    def _apply(self, group: list, index: int, result: TxnResult, budget: list[int]) -> None:
+        txn = group[index]
+        sender = address_bytes(txn.sender)
+        if self.balance(sender) < txn.fee:
+            raise TealError(f'overspend (account {txn.sender}, data {self.balance(sender)}, tried to spend {txn.fee})')
+        self._set(self.balances, sender, self.balance(sender) - txn.fee)
+
+        if txn.type == 'pay':
+            self._transfer(sender, address_bytes(txn.receiver), txn.amt, 0)
+            if txn.close_remainder_to:
+                self._transfer(sender, address_bytes(txn.close_remainder_to), self.balance(sender), 0)
+            return
+
+        if txn.type != 'appl':
+            raise avm.Unsupported(f'transactions of type {txn.type} are not supported')
+
+        self._apply_app_call(group, index, result, budget)
+
+    def _apply_app_call(self, group: list, index: int, result: TxnResult, budget: list[int]) -> None:
+        txn = group[index]
+        sender = address_bytes(txn.sender)
+        on_complete = int(txn.on_complete or 0)
+        app_id = txn.index or 0
+
+        if app_id == 0:
+            app_id = self._create_app(txn, sender)
+            result.created_app = app_id
+        elif app_id not in self.apps:
+            raise TealError(f'application {app_id} does not exist')
+
+        app = self.apps[app_id]
+        start = len(self._journal)
+
+        if on_complete == transaction.OnComplete.OptInOC:
+            if self.opted_in(sender, app_id):
+                raise TealError(f'account {txn.sender} has already opted in to app {app_id}')
+            self._set(self.locals, (sender, app_id), {})
+
+        if on_complete == transaction.OnComplete.ClearStateOC:
+            if not self.opted_in(sender, app_id):
+                raise TealError(f'account {txn.sender} is not opted in to app {app_id}')
+            evaluation = avm.evaluate(app.clear, self, group, index, app_id, budget)
+            self._record(result, evaluation, 'ClearStateProgram')
+            if not evaluation.passed:
+                self._rollback(start)
+            self._delete(self.locals, (sender, app_id))
+            return
+
+        evaluation = avm.evaluate(app.approval, self, group, index, app_id, budget)
+        self._record(result, evaluation, 'ApprovalProgram')
+        if not evaluation.passed:
+            message = evaluation.error or 'transaction rejected by ApprovalProgram'
+            raise TealError(f'logic eval error: {message}' if evaluation.error else message)
+
+        self._check_schema(app, sender)
+        result.global_delta, result.local_deltas = self._deltas(start, app_id)
+
+        if on_complete == transaction.OnComplete.CloseOutOC:
+            if not self.opted_in(sender, app_id):
+                raise TealError(f'account {txn.sender} is not opted in to app {app_id}')
+            self._delete(self.locals, (sender, app_id))
+        elif on_complete == transaction.OnComplete.UpdateApplicationOC:
+            self._set(self.apps, app_id, AppData(
+                app_id, app.creator,
+                avm.load_program(txn.approval_program), avm.load_program(txn.clear_program),
+                app.global_schema, app.local_schema, app.extra_pages
+            ))
+        elif on_complete == transaction.OnComplete.DeleteApplicationOC:
+            self._delete(self.apps, app_id)
+            self._delete(self.globals, app_id)
+
+    def _create_app(self, txn, sender: bytes) -> int:
+        app_id = self.next_app_id
+        self.next_app_id += 1
+        global_schema = txn.global_schema
+        local_schema = txn.local_schema
+        self._set(self.apps, app_id, AppData(
+            app_id,
+            sender,
+            avm.load_program(txn.approval_program),
+            avm.load_program(txn.clear_program),
+            (global_schema.num_uints or 0, global_schema.num_byte_slices or 0) if global_schema else (0, 0),
+            (local_schema.num_uints or 0, local_schema.num_byte_slices or 0) if local_schema else (0, 0),
+            txn.extra_pages or 0,
+        ))
+        self._set(self.globals, app_id, {})
+        return app_id
+
+    @staticmethod
+    def _record(result: TxnResult, evaluation: avm.EvalResult, program: str) -> None:
+        result.trace = evaluation.trace
+        result.messages = [program, *evaluation.messages]
+        result.logs = evaluation.logs
+        result.cost = evaluation.cost
+
+    def _check_schema(self, app: AppData, sender: bytes) -> None:
+        def check(state: dict[bytes, Value], schema: tuple[int, int]) -> None:
+            uints = sum(1 for value in state.values() if isinstance(value, int))
+            byte_slices = len(state) - uints
+            if uints > schema[0]:
+                raise TealError(f'store integer count {uints} exceeds schema integer count {schema[0]}')
+            if byte_slices > schema[1]:
+                raise TealError(f'store bytes count {byte_slices} exceeds schema bytes count {schema[1]}')
+
+        check(self.globals[app.app_id], app.global_schema)
+        for (account, app_id), state in self.locals.items():
+            if app_id == app.app_id:
+                check(state, app.local_schema)
+
+    def _deltas(self, start: int, app_id: int) -> tuple[list[dict], list[dict]]:
+        global_state = self.globals[app_id]
+        global_changes: dict[bytes, Value | None] = {}
+        local_changes: dict[bytes, dict[bytes, Value | None]] = {}
+        originals: dict[tuple[int, object], object] = {}
+
+        for container, key, old in self._journal[start:]:
+            originals.setdefault((id(container), key), old)
+
+        for (container_id, key), old in originals.items():
+            if container_id == id(global_state):
+                new = global_state.get(key)
+                if (None if old is _MISSING else old) != new:
+                    global_changes[key] = new
+                continue
+            for (account, local_app), state in self.locals.items():
+                if local_app != app_id or id(state) != container_id:
+                    continue
+                new = state.get(key)
+                if (None if old is _MISSING else old) != new:
+                    local_changes.setdefault(account, {})[key] = new
+
+        local_deltas = [
+            {'address': address_string(account), 'delta': _encode_delta(changes)}
+            for account, changes in local_changes.items()
+        ]
+        return _encode_delta(global_changes), local_deltas
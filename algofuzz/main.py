@@ -2,28 +2,95 @@ from dotenv import load_dotenv
 load_dotenv()
 
 import argparse
+from functools import partial
 from pathlib import Path
 from typing import Any
+from algofuzz import transport
+from algofuzz.accounts import account_pool
 from algofuzz.property_test import evaluate
+from algofuzz.backend import ExecutionBackend
 from algofuzz.FuzzAppClient import FuzzAppClient
+from algofuzz.InProcessAppClient import InProcessAppClient
+from algofuzz.SimulateAppClient import SimulateAppClient
 from algofuzz.fuzzers import Driver, PartialFuzzer, TotalFuzzer, ContractFuzzer
+from algofuzz.parallel import fuzz_parallel
+from algofuzz.utils import set_seed, suggested_params_cache
 
 
 def main(*args: Any, **kwds: Any) -> Any:
-    contract_args, fuzzer_args = parse_args()
-    app_client = FuzzAppClient.from_compiled(*contract_args)
-    fuzzer_type, driver, driver_coef, breakout_coef, suppress_output, assertion_mode, runs, timeout = fuzzer_args
-    fuzzer = fuzzer_type(app_client)
-
-    fuzzer.start(
+    contract_args, fuzzer_args, parallel_args = parse_args()
+    fuzzer_type, driver, driver_coef, breakout_coef, suppress_output, assertion_mode, runs, timeout, state_resync = fuzzer_args
+    start_args = dict(
         eval = evaluate if not assertion_mode else None,
         driver = driver,
         breakout_coef = breakout_coef,
         suppress_output = suppress_output,
         runs = runs,
         timeout_seconds = timeout,
-        schedule_coef = driver_coef
+        schedule_coef = driver_coef,
+        state_resync_interval = state_resync,
+        pipeline_window = parallel_args.pipeline,
+        batch_size = parallel_args.batch
     )
+    account_options = dict(size = parallel_args.accounts, path = parallel_args.accounts_file)
+    client_factory = backend_map[parallel_args.backend].from_compiled
+    if parallel_args.backend == 'simulate' and parallel_args.no_confirmation:
+        client_factory = partial(client_factory, wait_for_confirmation = False)
+
+    if parallel_args.jobs > 1:
+        stats = fuzz_parallel(
+            parallel_args.jobs,
+            contract_args,
+            fuzzer_type,
+            client_factory = client_factory,
+            sync_dir = parallel_args.sync_dir,
+            sync_interval = parallel_args.sync_interval,
+            account_options = account_options,
+            seed = parallel_args.seed,
+            **start_args
+        )
+        print_parallel_summary(stats)
+        return
+
+    if parallel_args.seed is not None:
+        set_seed(parallel_args.seed)
+    tape = None
+    if parallel_args.record is not None or parallel_args.replay is not None:
+        # params are refetched after a number of rounds only, not after some time
+        suggested_params_cache.max_age = float('inf')
+        tape = transport.record(parallel_args.record) if parallel_args.record is not None else transport.replay(parallel_args.replay)
+
+    try:
+        account_pool.configure(**account_options)
+        app_client = client_factory(*contract_args)
+        fuzzer = fuzzer_type(app_client)
+        fuzzer.start(**start_args)
+    finally:
+        transport.stop_tape()
+
+    if isinstance(tape, transport.Recorder):
+        print(f"Recorded {tape.requests} requests to {tape.path}")
+    elif isinstance(tape, transport.Replayer):
+        print(f"Replayed {tape.requests} requests from {tape.path} ({tape.repeated} repeated, {tape.missing} missing)")
+
+
+def print_parallel_summary(stats: list[dict]) -> None:
+    for worker in stats:
+        if worker.get('error') is not None:
+            print(f"Worker {worker['worker']} failed: {worker['error']}")
+    # a worker that failed early has no coverage
+    stats = [worker for worker in stats if 'covered' in worker]
+
+    covered = 0
+    for worker in stats:
+        covered |= int.from_bytes(worker['covered'], 'little')
+        violation = ' (property violated)' if worker['property_violated'] else ''
+        print(f"Worker {worker['worker']} (id: {worker['app_id']}): {worker['calls']} calls, {worker['rejected']} rejected, {worker['covered_lines']}/{worker['lines']} lines{violation}")
+
+    if len(stats) > 0:
+        size = len(stats[0]['covered'])
+        covered_count = size - covered.to_bytes(size, 'little').count(0)
+        print(f"Total: {sum(worker['calls'] for worker in stats)} calls, {covered_count}/{stats[0]['lines']} lines covered")
 
     
 
@@ -35,10 +102,17 @@ fuzzer_map: dict[str, type[ContractFuzzer]] = {
     'partial': PartialFuzzer
 }
 
+backend_map: dict[str, type[ExecutionBackend]] = {
+    'dryrun': FuzzAppClient,
+    'simulate': SimulateAppClient,
+    'inprocess': InProcessAppClient
+}
+
 driver_map = {
     'coverage': Driver.COVERAGE,
     'state': Driver.STATE,
-    'combined': Driver.COMBINED
+    'combined': Driver.COMBINED,
+    'edge': Driver.EDGE
 }
 
 def parse_args():
@@ -70,6 +144,17 @@ def parse_args():
         choices=fuzzer_map.keys(),
         help='Fuzzer to use'
     )
+    parser.add_argument(
+        '--backend',
+        default='dryrun',
+        choices=backend_map.keys(),
+        help='Backend executing the calls: dryrun and simulate check calls with a node, inprocess runs them with the in-process TEAL evaluator'
+    )
+    parser.add_argument(
+        '--no_confirmation',
+        action='store_true',
+        help="Don't wait for calls submitted by the simulate backend to be confirmed, only for nodes in dev mode"
+    )
     parser.add_argument(
         '--driver',
         default='combined',
@@ -114,10 +199,76 @@ def parse_args():
         type=int,
         help="Number of seconds to run the fuzzer (overrides --runs)"
     )
+    parser.add_argument(
+        '--state_resync',
+        type=int,
+        default=0,
+        help="Reload the whole contract state from the node every n successful calls (0 disables it)"
+    )
+    parser.add_argument(
+        '--pipeline',
+        type=int,
+        default=1,
+        help="Number of calls kept in flight, candidates are checked while earlier calls are committed"
+    )
+    parser.add_argument(
+        '--batch',
+        type=int,
+        default=1,
+        help="Number of candidates checked at once against the same state (takes precedence over --pipeline)"
+    )
+    parser.add_argument(
+        '--jobs',
+        type=int,
+        default=1,
+        help="Number of worker processes, each fuzzing its own instance of the contract"
+    )
+    parser.add_argument(
+        '--sync_dir',
+        type=Path,
+        help="Directory the workers share their corpus through (defaults to a temporary directory that is removed at the end)"
+    )
+    parser.add_argument(
+        '--sync_interval',
+        type=int,
+        default=500,
+        help="Number of calls between two synchronizations of a worker"
+    )
+    parser.add_argument(
+        '--accounts',
+        type=int,
+        default=account_pool.size,
+        help="Number of accounts the calls are sent from"
+    )
+    parser.add_argument(
+        '--accounts_file',
+        type=Path,
+        help="File the accounts are saved to and reused from, encrypted with ALGOFUZZ_ACCOUNTS_PASSWORD"
+    )
+    parser.add_argument(
+        '--seed',
+        type=int,
+        help="Seed of the mutators and of the generated accounts, worker n of --jobs uses seed + n"
+    )
+    tape = parser.add_mutually_exclusive_group()
+    tape.add_argument(
+        '--record',
+        type=Path,
+        help="Record all requests to the node to this file"
+    )
+    tape.add_argument(
+        '--replay',
+        type=Path,
+        help="Answer all requests from a file written by --record instead of a node (use the same --seed)"
+    )
 
     args = parser.parse_args()
+    if args.jobs > 1 and (args.record is not None or args.replay is not None):
+        parser.error("--record and --replay need a single job")
+    if args.replay is not None and not args.replay.is_file():
+        parser.error(f"No recording at {args.replay}")
 
-    return parse_contract(args), parse_fuzzer(args)
+    return parse_contract(args), parse_fuzzer(args), args
 
 def parse_contract(args) -> ContractArgs:
     approval_path = Path(args.approval)
@@ -151,7 +302,7 @@ def parse_fuzzer(args):
     fuzzer = fuzzer_map[args.fuzzer]
     driver = driver_map[args.driver]
 
-    return fuzzer, driver, args.driver_coef, args.breakout_coef, args.suppress_output, args.assertion, args.runs, args.timeout
+    return fuzzer, driver, args.driver_coef, args.breakout_coef, args.suppress_output, args.assertion, args.runs, args.timeout, args.state_resync
 
     
 def restricted_float(x):
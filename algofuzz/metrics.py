@@ -0,0 +1,120 @@
+"""Latency of the phases of a fuzzer call.
+
+Every phase of a call (mutating the candidate, preparing its transactions, checking,
+sending, waiting for the confirmation, loading the state, updating the schedule and
+evaluating the property) records its duration into a histogram with HDR-style
+log-linear buckets: values are grouped by their power of two and every power of two
+is split into linear sub buckets, which bounds the relative error of a percentile by
+1 / SUB_BUCKETS whatever the range of the values.
+
+Recording takes a clock read and a few integer operations. Calls made from several
+threads, as in pipelined mode, may rarely lose a count, which is fine for statistics.
+"""
+import os
+import time
+
+# number of linear sub buckets per power of two, bounds the relative error to ~3%
+SUB_BUCKET_BITS = 5
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+# values up to 2^40 ns (~18 minutes)
+MAX_MAGNITUDE = 40
+BUCKET_COUNT = (MAX_MAGNITUDE - SUB_BUCKET_BITS + 1) * SUB_BUCKETS
+PHASES = ("mutate", "prepare", "check", "send", "confirm", "state", "update", "eval")
+PHASE_TIMERS_ENABLED = os.getenv("ALGOFUZZ_PHASE_TIMERS", default="1") != "0"
+
+
+class Histogram:
+    """Histogram of non-negative integer values (durations in ns)"""
+
+    def __init__(self) -> None:
+        self.counts = [0] * BUCKET_COUNT
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    @staticmethod
+    def bucket(value: int) -> int:
+        # values below 2 * SUB_BUCKETS have a bucket each, larger values are shifted
+        # down into [SUB_BUCKETS, 2 * SUB_BUCKETS) and the shift selects the group
+        shift = max(value.bit_length() - SUB_BUCKET_BITS - 1, 0)
+        return min(shift * SUB_BUCKETS + (value >> shift), BUCKET_COUNT - 1)
+
+    @staticmethod
+    def bucket_value(bucket: int) -> int:
+        """Highest value of a bucket"""
+        shift = max(bucket // SUB_BUCKETS - 1, 0)
+        return ((bucket - shift * SUB_BUCKETS + 1) << shift) - 1
+
+    def record(self, value: int) -> None:
+        self.counts[self.bucket(value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: "Histogram") -> None:
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count > 0 else 0.0
+
+    def percentile(self, percent: float) -> int:
+        """Value below which percent of the recorded values lie, up to the bucket precision"""
+        if self.count == 0:
+            return 0
+        rank = max(1, round(percent / 100 * self.count))
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self.bucket_value(bucket), self.max)
+        return self.max
+
+
+class PhaseTimers:
+    """Latency histograms of the phases of the calls of a process"""
+
+    def __init__(self, enabled: bool = PHASE_TIMERS_ENABLED) -> None:
+        self.enabled = enabled
+        self.histograms = {phase: Histogram() for phase in PHASES}
+
+    @staticmethod
+    def now() -> int:
+        return time.perf_counter_ns()
+
+    def record(self, phase: str, start: int) -> int:
+        """Records the time since start for phase.
+        :return: The current time, to start the next phase"""
+        end = time.perf_counter_ns()
+        if self.enabled:
+            self.histograms[phase].record(end - start)
+        return end
+
+    def reset(self) -> None:
+        self.histograms = {phase: Histogram() for phase in PHASES}
+
+    def summary(self) -> dict[str, tuple[int, int, int]]:
+        """Count, p50 and p99 in ns of every phase that was recorded"""
+        return {
+            phase: (histogram.count, histogram.percentile(50), histogram.percentile(99))
+            for phase, histogram in self.histograms.items()
+            if histogram.count > 0
+        }
+
+
+phase_timers = PhaseTimers()
+
+
+def format_ns(value: int) -> str:
+    if value < 1_000:
+        return f"{value}ns"
+    if value < 1_000_000:
+        return f"{value / 1e3:.1f}us"
+    if value < 1_000_000_000:
+        return f"{value / 1e6:.1f}ms"
+    return f"{value / 1e9:.2f}s"
\ No newline at end of file
@@ -1,8 +1,9 @@
 import random
-from algokit_utils import Account, get_algod_client
+from algokit_utils import Account
 from algosdk.abi import *
 
-from algofuzz.utils import dispense, get_account_balance, get_funded_account
+from algofuzz.accounts import PoolAccounts
+from algofuzz.utils import balance_tracker
 
 # uintN mutator
 class UintMutator:
@@ -214,15 +215,14 @@ class PaymentMutator:
         return PaymentObject(0)
     
     def mutate(self, value: PaymentObject):
-        balance, min_balance = get_account_balance(self.addr)
-        if balance < 2e8:
-            dispense(get_algod_client(), self.addr, int(1e12))
+        balance_tracker.top_up(self.addr, int(2e8), int(1e12))
 
         value.amount = random.randint(0, int(1e8))
         return value
 
 class AccountMutator:
-    accs: list[Account] = [get_funded_account(get_algod_client()) for _ in range(3)]
+    # accounts of the shared pool, created and funded on first use
+    accs: list[Account] = PoolAccounts()
 
     def seed(self):
         return self.accs[0]
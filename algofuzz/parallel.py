@@ -0,0 +1,302 @@
+"""Parallel fuzzing with worker processes that share their corpus.
+
+Every worker deploys its own instance of the application with its own accounts and
+fuzzes it independently. Like AFL's main/secondary mode the workers exchange their
+findings through a sync directory: each worker writes the candidates it found
+interesting into its own queue and periodically replays the new queue entries of the
+others, keeping those that are interesting against its own state. Path frequencies and
+line coverage are shared through per worker stats files. Worker 0 is the main worker,
+it is the only one showing the status screen.
+"""
+import multiprocessing
+import os
+import pickle
+import tempfile
+from pathlib import Path
+from typing import Any, Callable
+
+from algokit_utils import Account
+
+from algofuzz.accounts import account_pool
+from algofuzz.backend import ExecutionBackend
+from algofuzz.FuzzAppClient import FuzzAppClient
+from algofuzz.mutate import AccountMutator, PaymentObject
+from algofuzz.utils import set_seed
+
+STATS_FILE = 'stats.pkl'
+QUEUE_DIR = 'queue'
+
+
+class AccountRef:
+    """Stands in for an account in synced candidates, workers have their own accounts
+    and private keys never leave the worker"""
+
+    def __init__(self, index: int) -> None:
+        self.index = index
+
+
+def to_portable(value):
+    """Replaces the accounts in a candidate with their index in `AccountMutator.accs`"""
+    if isinstance(value, Account):
+        addresses = [acc.address for acc in AccountMutator.accs]
+        return AccountRef(addresses.index(value.address))
+    if isinstance(value, PaymentObject):
+        return PaymentObject(value.amount)
+    if isinstance(value, (list, tuple)):
+        return type(value)(to_portable(item) for item in value)
+    return value
+
+
+def from_portable(value):
+    """Replaces the account references in a synced candidate with the worker's accounts"""
+    if isinstance(value, AccountRef):
+        return AccountMutator.accs[value.index % len(AccountMutator.accs)]
+    if isinstance(value, (list, tuple)):
+        return type(value)(from_portable(item) for item in value)
+    return value
+
+
+def _write_atomic(path: Path, data: Any) -> None:
+    tmp = path.with_name(f'.{path.name}.tmp')
+    with open(tmp, 'wb') as f:
+        pickle.dump(data, f)
+    os.replace(tmp, path)
+
+
+def _read(path: Path) -> Any:
+    try:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+        return None
+
+
+class CorpusSync:
+    """Synchronizes a worker with the other workers of a parallel campaign.
+
+    :param sync_dir: Directory shared by the workers
+    :param worker: Index of this worker
+    :param interval: Number of calls between two synchronizations
+    :param stop_event: Event set by the worker that finds a violation, stops the others
+    """
+
+    def __init__(self, sync_dir: Path, worker: int, interval: int = 500, stop_event=None) -> None:
+        self.sync_dir = Path(sync_dir)
+        self.worker = worker
+        self.interval = interval
+        self.stop_event = stop_event
+        self.dir = self.sync_dir / f'worker_{worker}'
+        self.queue_dir = self.dir / QUEUE_DIR
+        self.queue_dir.mkdir(parents=True, exist_ok=True)
+
+        self.exported = 0
+        self.imported = 0
+        self.global_covered_count = 0
+        # next queue entry to import per worker
+        self._next_entry: dict[str, int] = {}
+        # path counts seen per (worker, schedule, path key)
+        self._seen_counts: dict[tuple[str, str, bytes], int] = {}
+        # path counts added by other workers per schedule, not exported again
+        self._remote_counts: dict[str, dict[int, int]] = {}
+
+    @property
+    def stopped(self) -> bool:
+        return self.stop_event is not None and self.stop_event.is_set()
+
+    def export(self, candidate) -> None:
+        """Adds an interesting candidate to the queue of this worker"""
+        _write_atomic(self.queue_dir / f'{self.exported:06d}.pkl', to_portable(candidate))
+        self.exported += 1
+
+    def sync(self, fuzzer) -> None:
+        """Imports the new findings of the other workers and publishes the stats of this one"""
+        schedules = fuzzer.schedules()
+        covered = int.from_bytes(fuzzer.virgin.covered_bits(), 'little')
+
+        for worker_dir in sorted(self.sync_dir.glob('worker_*')):
+            if worker_dir == self.dir:
+                continue
+
+            self._import_queue(worker_dir, fuzzer)
+            stats = _read(worker_dir / STATS_FILE)
+            if stats is None:
+                continue
+
+            covered |= int.from_bytes(stats['covered'], 'little')
+            self._merge_paths(worker_dir.name, stats['paths'], schedules, fuzzer)
+
+        covered_bytes = covered.to_bytes(fuzzer.virgin.size, 'little')
+        self.global_covered_count = len(covered_bytes) - covered_bytes.count(0)
+        self.write_stats(fuzzer)
+
+    def finish(self, fuzzer, error: str = None) -> None:
+        """Writes the final stats of the worker, with the error that stopped it if it failed"""
+        try:
+            self.write_stats(fuzzer, error)
+        except Exception:
+            if error is None:
+                raise
+            # the worker failed before its fuzzer was set up, there are no stats to write
+            _write_atomic(self.dir / STATS_FILE, {'worker': self.worker, 'error': error})
+            return
+        if fuzzer.property_violated and self.stop_event is not None:
+            self.stop_event.set()
+
+    def write_stats(self, fuzzer, error: str = None) -> None:
+        paths = {}
+        for name, schedule in fuzzer.schedules().items():
+            remote = self._remote_counts.get(name, {})
+            paths[name] = {
+                fuzzer.ids.paths.keys[path_id]: count - remote.get(path_id, 0)
+                for path_id, count in schedule.path_frequency.items()
+                if count > remote.get(path_id, 0)
+            }
+
+        _write_atomic(self.dir / STATS_FILE, {
+            'worker': self.worker,
+            'app_id': fuzzer.app_client.app_id,
+            'calls': fuzzer.call_count,
+            'rejected': fuzzer.rejected_calls,
+            'covered_lines': fuzzer.covered_line_count,
+            'lines': fuzzer.lines_count,
+            'property_violated': fuzzer.property_violated,
+            'covered': fuzzer.virgin.covered_bits(),
+            'paths': paths,
+            'error': error,
+        })
+
+    def _import_queue(self, worker_dir: Path, fuzzer) -> None:
+        entry = self._next_entry.get(worker_dir.name, 0)
+        while True:
+            candidate = _read(worker_dir / QUEUE_DIR / f'{entry:06d}.pkl')
+            if candidate is None:
+                break
+
+            fuzzer.imports.append(from_portable(candidate))
+            self.imported += 1
+            entry += 1
+        self._next_entry[worker_dir.name] = entry
+
+    def _merge_paths(self, worker: str, paths: dict[str, dict[bytes, int]], schedules: dict, fuzzer) -> None:
+        """Adds the path frequencies of another worker, so that paths it explored a lot
+        lose energy here as well. Frequencies only grow, as the schedule expects."""
+        for name, counts in paths.items():
+            schedule = schedules.get(name)
+            if schedule is None:
+                continue
+
+            remote = self._remote_counts.setdefault(name, {})
+            for key, count in counts.items():
+                seen = self._seen_counts.get((worker, name, key), 0)
+                if count <= seen:
+                    continue
+
+                self._seen_counts[(worker, name, key)] = count
+                path_id = fuzzer.ids.paths(key)
+                fuzzer.merge_path(schedule, path_id, count - seen)
+                remote[path_id] = remote.get(path_id, 0) + count - seen
+
+
+def run_worker(
+        worker: int,
+        sync_dir: Path,
+        sync_interval: int,
+        stop_event,
+        client_factory: Callable[..., ExecutionBackend],
+        contract_args: tuple,
+        fuzzer_type: type,
+        start_args: dict,
+        account_options: dict = None,
+        seed: int = None
+    ) -> None:
+    if seed is not None:
+        set_seed(seed + worker)
+    account_options = dict(account_options or {})
+    if account_options.get('path') is not None:
+        # workers must not send from the same accounts
+        path = Path(account_options['path'])
+        account_options['path'] = path.with_name(f'{path.stem}_{worker}{path.suffix}')
+    account_pool.configure(**account_options)
+
+    sync = CorpusSync(sync_dir, worker, sync_interval, stop_event)
+    start_args = dict(start_args)
+    start_args['suppress_output'] = start_args.get('suppress_output', False) or worker != 0
+    fuzzer = None
+    error = None
+    try:
+        fuzzer = fuzzer_type(client_factory(*contract_args))
+        fuzzer.start(**start_args, sync=sync)
+    except BaseException as e:
+        error = f'{type(e).__name__}: {e}'
+        raise
+    finally:
+        # the parent reads the stats of a failed worker too, they tell it why it stopped
+        sync.finish(fuzzer, error)
+
+
+def fuzz_parallel(
+        jobs: int,
+        contract_args: tuple,
+        fuzzer_type: type,
+        client_factory: Callable[..., ExecutionBackend] = FuzzAppClient.from_compiled,
+        sync_dir: Path = None,
+        sync_interval: int = 500,
+        account_options: dict = None,
+        seed: int = None,
+        **start_args
+    ) -> list[dict]:
+    """Fuzzes a contract with `jobs` worker processes.
+
+    :param sync_dir: Directory the workers share their corpus through, a temporary directory removed at the end by default
+    :param account_options: Options of the account pool of every worker, see `AccountPool.configure`
+    :param seed: Seed of the first worker, the others use the following seeds
+    :param start_args: Arguments passed to `ContractFuzzer.start` of every worker
+    :return: Final stats of every worker, a worker that failed has its error under 'error'
+    """
+    if sync_dir is None:
+        # the stats are read before the temporary directory is removed
+        with tempfile.TemporaryDirectory(prefix='algofuzz-sync-') as temporary_dir:
+            return _run_workers(jobs, Path(temporary_dir), sync_interval, client_factory, contract_args, fuzzer_type, start_args, account_options, seed)
+
+    sync_dir = Path(sync_dir)
+    sync_dir.mkdir(parents=True, exist_ok=True)
+    return _run_workers(jobs, sync_dir, sync_interval, client_factory, contract_args, fuzzer_type, start_args, account_options, seed)
+
+
+def _run_workers(
+        jobs: int,
+        sync_dir: Path,
+        sync_interval: int,
+        client_factory: Callable[..., ExecutionBackend],
+        contract_args: tuple,
+        fuzzer_type: type,
+        start_args: dict,
+        account_options: dict,
+        seed: int
+    ) -> list[dict]:
+    """Runs the workers until all of them are done and returns their final stats"""
+    # spawn, so that every worker creates and funds its own account pool
+    context = multiprocessing.get_context('spawn')
+    stop_event = context.Event()
+    workers = [
+        context.Process(
+            target=run_worker,
+            args=(worker, sync_dir, sync_interval, stop_event, client_factory, contract_args, fuzzer_type, start_args, account_options, seed),
+            name=f'algofuzz-worker-{worker}'
+        )
+        for worker in range(jobs)
+    ]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join()
+
+    results = []
+    for worker, process in enumerate(workers):
+        stats = _read(sync_dir / f'worker_{worker}' / STATS_FILE)
+        if process.exitcode != 0 and (stats is None or stats.get('error') is None):
+            # killed, or failed before it could write its stats
+            stats = {**(stats or {}), 'worker': worker, 'error': f'exit code {process.exitcode}'}
+        if stats is not None:
+            results.append(stats)
+    return results
@@ -0,0 +1,112 @@
+"""Pipelined execution of fuzzer calls.
+
+A call is split into a check (dryrun or simulate of the candidate) and a commit
+(submitting it and waiting for the confirmation). The pipeline keeps up to `window`
+candidates in flight, so the next candidates are generated and checked while a passing
+call is being committed. Results are processed strictly in the order the candidates
+were generated, which keeps the updates of state and schedule deterministic.
+
+A check runs against the state of the node at the time it starts. Every commit bumps a
+version, and checks in flight that started before it are redone before their result is
+processed. Rejected calls commit nothing, so runs of rejected calls overlap completely.
+
+The batch runner amortizes requests instead of hiding their latency: it checks several
+candidates at once against state fetched once for all of them, and processes them up to
+the first one that commits.
+"""
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
+
+from algofuzz import transport
+from algofuzz.backend import CallCheck
+
+if TYPE_CHECKING:
+    from algofuzz.fuzzers import Candidate, ContractFuzzer
+
+
+class Pipeline:
+    def __init__(self, fuzzer: "ContractFuzzer", window: int) -> None:
+        self.fuzzer = fuzzer
+        self.client = fuzzer.app_client
+        self.window = window
+        # number of commits so far
+        self.version = 0
+        self.rechecks = 0
+
+    def run(self) -> None:
+        # one connection per check thread plus the commit thread
+        transport.set_pool_size(max(transport.POOL_SIZE, self.window + 1))
+        asyncio.run(self._run())
+
+    def _check(self, candidate: "Candidate") -> CallCheck:
+        method_name, args, acc = candidate
+        return self.client.check(self.client.get_method(method_name), args, acc)
+
+    async def _run(self) -> None:
+        fuzzer = self.fuzzer
+        loop = asyncio.get_running_loop()
+        # checks of a client that applies calls when checking must not overtake each other
+        check_workers = 1 if self.client.check_commits else self.window
+
+        with ThreadPoolExecutor(check_workers, 'algofuzz-check') as checks, ThreadPoolExecutor(1, 'algofuzz-commit') as commits:
+            in_flight = deque()
+            while True:
+                while len(in_flight) < self.window and fuzzer._has_budget(len(in_flight)):
+                    candidate, imported = fuzzer._next_candidate()
+                    check = loop.run_in_executor(checks, self._check, candidate)
+                    in_flight.append((candidate, imported, self.version, check))
+
+                if len(in_flight) == 0:
+                    break
+
+                candidate, imported, version, check = in_flight.popleft()
+                check = await check
+                if version != self.version and not self.client.check_commits:
+                    self.rechecks += 1
+                    check = await loop.run_in_executor(checks, self._check, candidate)
+
+                execution = await loop.run_in_executor(commits, self.client.commit, check)
+                if not execution.rejected and not self.client.check_commits:
+                    self.version += 1
+
+                if not fuzzer._complete_call(candidate, imported, execution):
+                    break
+
+
+class BatchRunner:
+    """Checks `size` candidates at a time with `ExecutionBackend.check_batch`.
+
+    The candidates of a batch are checked against the same state, so they are processed
+    in order up to the first one that commits. The ones after it are checked again
+    together with new candidates in the next batch."""
+
+    def __init__(self, fuzzer: "ContractFuzzer", size: int) -> None:
+        self.fuzzer = fuzzer
+        self.client = fuzzer.app_client
+        self.size = size
+        self.batches = 0
+
+    def run(self) -> None:
+        fuzzer = self.fuzzer
+        pending: deque[tuple["Candidate", bool]] = deque()
+        while True:
+            while len(pending) < self.size and fuzzer._has_budget(len(pending)):
+                pending.append(fuzzer._next_candidate())
+
+            if len(pending) == 0:
+                return
+
+            calls = [(self.client.get_method(method_name), args, acc) for (method_name, args, acc), _ in pending]
+            checks = self.client.check_batch(calls)
+            self.batches += 1
+
+            for check in checks:
+                candidate, imported = pending.popleft()
+                execution = self.client.commit(check)
+                if not fuzzer._complete_call(candidate, imported, execution):
+                    return
+
+                if not execution.rejected and not self.client.check_commits:
+                    break
\ No newline at end of file
@@ -1,8 +1,11 @@
+import io
 import pickle
 import random
-import hashlib
-import json
-from typing import Set, Sequence, Dict, List
+from hashlib import blake2b
+from typing import Iterable, Dict, List
+
+# bytes of the path and transition digests, collisions are negligible at 128 bits
+DIGEST_SIZE = 16
 
 
 class Seed:
@@ -12,8 +15,8 @@ class Seed:
         """Initialize from seed data"""
         self.data = data
 
-        self.path_id: str = None
-        self.transition_id: str = None
+        self.path_id: int = None
+        self.transition_id: int = None
         self.energy = 0.0
 
     def __str__(self):
@@ -23,47 +26,195 @@ class Seed:
     __repr__ = __str__
 
 
-def getPathID(coverage: set[int]) -> str:
-    """Returns a unique hash for the covered statements"""
-    pickled = pickle.dumps(sorted(coverage))
-    return hashlib.md5(pickled).hexdigest()
+class Interner:
+    """Maps digests to small consecutive integer ids"""
+
+    def __init__(self) -> None:
+        self.ids: Dict[bytes, int] = {}
+        self.keys: List[bytes] = []
+
+    def __call__(self, key: bytes) -> int:
+        id = self.ids.get(key)
+        if id is None:
+            id = len(self.keys)
+            self.ids[key] = id
+            self.keys.append(key)
+        return id
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+
+class Ids:
+    """Path and transition ids of a fuzzer, shared by all of its schedules.
+
+    Paths and transitions are interned by a fixed-size digest of their canonical
+    encoding, so the memory per id does not grow with the program or the state, and
+    digests can be exchanged with other processes while the ids are only valid here."""
+
+    def __init__(self) -> None:
+        self.paths = Interner()
+        self.transitions = Interner()
+
+    def path_id(self, coverage: bytes | bytearray | Iterable[int]) -> int:
+        return self.paths(path_digest(coverage))
+
+    def transition_id(self, transition: tuple[dict, dict]) -> int:
+        return self.transitions(transition_digest(transition))
+
+
+class SeenIds:
+    """Ids of the paths and transitions seen by any of several schedules, kept up to
+    date as they are added so they are counted without merging the schedules"""
+
+    def __init__(self) -> None:
+        self.paths: set[int] = set()
+        self.transitions: set[int] = set()
+
+
+def state_key(state: dict) -> tuple:
+    """Returns a canonical, hashable encoding of a contract state"""
+    local_state = state['local']
+    return (
+        tuple(sorted(state['global'].items())),
+        tuple(sorted((address, tuple(sorted(local_state[address].items()))) for address in local_state))
+    )
+
+
+def canonical_bytes(value) -> bytes:
+    """Encodes nested tuples and lists of str, bytes and int so that equal values give
+    equal bytes. Pickles without the memo, which would otherwise depend on whether equal
+    parts are the same object."""
+    buffer = io.BytesIO()
+    pickler = pickle.Pickler(buffer, protocol=4)
+    pickler.fast = True
+    pickler.dump(value)
+    return buffer.getvalue()
+
 
+def path_digest(coverage: bytes | bytearray | Iterable[int]) -> bytes:
+    """Returns the digest of the covered statements, given either as a coverage bitmap
+    or as the traced line numbers (in any order, repeats count)"""
+    if isinstance(coverage, (bytes, bytearray)):
+        return blake2b(coverage, digest_size=DIGEST_SIZE).digest()
+    return blake2b(canonical_bytes(sorted(coverage)), digest_size=DIGEST_SIZE, person=b'trace').digest()
+
+
+def transition_digest(transition: tuple[dict, dict]) -> bytes:
+    """Returns the digest of an (old state, new state) transition"""
+    old_state, new_state = transition
+    return blake2b(canonical_bytes((state_key(old_state), state_key(new_state))), digest_size=DIGEST_SIZE).digest()
+
+class FenwickTree:
+    """Binary indexed tree over seed weights, supports O(log n) updates and weighted sampling"""
+
+    def __init__(self) -> None:
+        self.weights: List[float] = []
+        self._tree: List[float] = [0.0]
+        self._capacity = 0
+
+    def __len__(self) -> int:
+        return len(self.weights)
+
+    def append(self, weight: float) -> int:
+        index = len(self.weights)
+        self.weights.append(0.0)
+        if index >= self._capacity:
+            self._rebuild(max(16, 2 * self._capacity))
+        self.update(index, weight)
+        return index
+
+    def update(self, index: int, weight: float) -> None:
+        delta = weight - self.weights[index]
+        self.weights[index] = weight
+        i = index + 1
+        while i <= self._capacity:
+            self._tree[i] += delta
+            i += i & -i
+
+    def total(self) -> float:
+        total = 0.0
+        i = self._capacity
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def find(self, value: float) -> int:
+        """Returns the first index whose cumulative weight exceeds value"""
+        position = 0
+        step = 1 << self._capacity.bit_length()
+        while step:
+            next_position = position + step
+            if next_position <= self._capacity and self._tree[next_position] <= value:
+                position = next_position
+                value -= self._tree[next_position]
+            step >>= 1
+        return min(position, len(self.weights) - 1)
+
+    def _rebuild(self, capacity: int) -> None:
+        """Rebuilds the tree in O(n), also clears accumulated floating point drift"""
+        self._capacity = capacity
+        tree = [0.0] * (capacity + 1)
+        for index, weight in enumerate(self.weights):
+            i = index + 1
+            tree[i] += weight
+            parent = i + (i & -i)
+            if parent <= capacity:
+                tree[parent] += tree[i]
+        self._tree = tree
 
-def get_transition_id(transition: tuple[dict, dict]) -> str:
-    pickled = json.dumps(transition, sort_keys=True).encode()
-    return hashlib.md5(pickled).hexdigest()
 
 class PowerSchedule:
-    def __init__(self, exponent: int = 5, trans_coef = 0.5) -> None:
+    """Chooses seeds with a probability proportional to their energy.
+
+    Frequencies only grow, so the energy of a seed can only decrease. The weights in
+    the tree are therefore upper bounds of the energies: a sampled seed is accepted with
+    probability energy / weight and its weight is refreshed whenever it is stale. This
+    samples exactly by energy while only re-weighting seeds whose frequencies changed.
+    """
+
+    def __init__(self, exponent: int = 5, trans_coef = 0.5, ids: Ids = None) -> None:
+        # schedules of the same fuzzer share their ids
+        self.ids = ids if ids is not None else Ids()
         self.path_frequency: Dict = {}
         self.transition_frequency: Dict = {}
         self.exponent = exponent
         self.trans_coef = trans_coef
         self.cov_coef = 1 - trans_coef
+        self.population: List[Seed] = []
+        self._weights = FenwickTree()
 
-    def assignEnergy(self, population: Sequence[Seed]) -> None:
-        for seed in population:
-            trans_freq = self.transition_frequency[seed.transition_id]
-            path_freq = self.path_frequency[seed.path_id]
-
-            weighted_freqs = self.trans_coef * trans_freq + self.cov_coef * path_freq
-            seed.energy = 1 / (weighted_freqs ** self.exponent)
-
-    def normalizedEnergy(self, population: Sequence[Seed]) -> List[float]:
-        energy = list(map(lambda seed: seed.energy, population))
-        sum_energy = sum(energy)  
-        assert sum_energy != 0
-        norm_energy = list(map(lambda nrg: nrg / sum_energy, energy))
-        return norm_energy
-
-    def choose(self, population: Sequence[Seed]) -> Seed:
-        self.assignEnergy(population)
-        norm_energy = self.normalizedEnergy(population)
-        seed: Seed = random.choices(population, weights=norm_energy)[0]
-        return seed
-    
-    def addTransition(self, transition: tuple[dict, dict]) -> tuple[bool, str]:
-        transition_id = get_transition_id(transition)
+    def energy(self, seed: Seed) -> float:
+        trans_freq = self.transition_frequency[seed.transition_id]
+        path_freq = self.path_frequency[seed.path_id]
+
+        weighted_freqs = self.trans_coef * trans_freq + self.cov_coef * path_freq
+        return 1 / (weighted_freqs ** self.exponent)
+
+    def add(self, seed: Seed) -> None:
+        """Adds a seed to the population"""
+        seed.energy = self.energy(seed)
+        self.population.append(seed)
+        self._weights.append(seed.energy)
+
+    def choose(self) -> Seed:
+        assert len(self.population) > 0
+        while True:
+            total = self._weights.total()
+            index = self._weights.find(random.random() * total)
+            seed = self.population[index]
+            weight = self._weights.weights[index]
+            energy = self.energy(seed)
+            if energy != weight:
+                seed.energy = energy
+                self._weights.update(index, energy)
+
+            if weight <= 0 or random.random() * weight < energy:
+                return seed
+
+    def addTransition(self, transition: tuple[dict, dict]) -> tuple[bool, int]:
+        transition_id = self.ids.transition_id(transition)
         if transition_id not in self.transition_frequency:
             self.transition_frequency[transition_id] = 1
             return True, transition_id
@@ -71,8 +222,8 @@ class PowerSchedule:
         self.transition_frequency[transition_id] += 1
         return False, transition_id
     
-    def addPath(self, path: Set[int]) -> tuple[bool, str]:
-        path_id = getPathID(path)
+    def addPath(self, path: bytes | bytearray | Iterable[int]) -> tuple[bool, int]:
+        path_id = self.ids.path_id(path)
         if path_id not in self.path_frequency:
             self.path_frequency[path_id] = 1
             return True, path_id
@@ -0,0 +1,390 @@
+"""Offline stand-in for the algod and KMD endpoints of a localnet.
+
+Serves the endpoints used by the clients, `ContractState` and `utils` (suggested params,
+status, compile, disassemble, dryrun, simulate, sending transactions, pending
+transaction, account and application info, and the KMD wallet and key export calls)
+from an in-memory `Ledger` and the in-process TEAL evaluator. Like the in-process
+backend it treats TEAL source as bytecode: compiling returns the normalized listing of
+the program, and traces, disassembly and source maps all refer to lines of that listing.
+
+The state only depends on the requests and the seed, so runs against the stand-in are
+reproducible without Docker. Start it on the ports of the `.env` file with
+`python -m algofuzz.standin` and run the fuzzer as usual.
+"""
+import argparse
+import base64
+import hashlib
+import json
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib import parse
+
+import msgpack
+from algosdk import encoding, logic
+from nacl.signing import SigningKey
+
+from algofuzz import avm
+from algofuzz.ledger import Ledger, TxnResult
+from algofuzz.utils import DEFAULT_KMD_WALLET_NAME
+
+GENESIS_ID = 'algofuzz-standin'
+GENESIS_HASH = base64.b64encode(hashlib.sha256(GENESIS_ID.encode()).digest()).decode()
+CONSENSUS_VERSION = 'future'
+MIN_FEE = 1000
+# first round and timestamp of the ledger, fixed so that runs are reproducible
+GENESIS_ROUND = 1
+GENESIS_TIMESTAMP = 1_700_000_000
+DISPENSER_FUNDS = 10 ** 16
+WALLET_ID = 'standin-wallet'
+
+
+class StandInError(Exception):
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _decode_stxns(payloads: list[bytes]) -> list:
+    return [encoding.msgpack_decode(base64.b64encode(payload).decode()) for payload in payloads]
+
+
+def _split_msgpack(body: bytes) -> list[bytes]:
+    """Splits concatenated msgpack objects, as sent for a transaction group"""
+    unpacker = msgpack.Unpacker(raw=False, strict_map_key=False)
+    unpacker.feed(body)
+    payloads = []
+    start = 0
+    for _ in unpacker:
+        end = unpacker.tell()
+        payloads.append(body[start:end])
+        start = end
+    return payloads
+
+
+def _json_default(value):
+    # byte fields of transactions, algod encodes them in base64 as well
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def _state_value(value: avm.Value) -> dict:
+    if isinstance(value, int):
+        return {'type': 2, 'bytes': '', 'uint': value}
+    return {'type': 1, 'bytes': base64.b64encode(value).decode(), 'uint': 0}
+
+
+def _key_values(state: dict[bytes, avm.Value]) -> list[dict]:
+    return [
+        {'key': base64.b64encode(key).decode(), 'value': _state_value(value)}
+        for key, value in state.items()
+    ]
+
+
+def _source_map(line_count: int) -> dict:
+    # the program counter of the stand-in is the listing line, so pc i maps to line i:
+    # the first segment starts at line 0, every further one moves one line down
+    return {
+        'version': 3,
+        'sources': [],
+        'names': [],
+        'mappings': ';'.join(['AAAA'] + ['AACA'] * (line_count - 1)),
+    }
+
+
+class StandIn:
+    """Ledger and request handling of the stand-in, safe to use from several threads.
+
+    :param seed: Seed of the dispenser account in the KMD wallet
+    """
+
+    def __init__(self, seed: int = 0) -> None:
+        self.ledger = Ledger(GENESIS_ROUND, GENESIS_TIMESTAMP)
+        self.pending: dict[str, TxnResult] = {}
+        self.lock = threading.RLock()
+
+        signing_key = SigningKey(hashlib.sha256(f'{GENESIS_ID}-{seed}'.encode()).digest())
+        self.dispenser_key = base64.b64encode(bytes(signing_key) + bytes(signing_key.verify_key)).decode()
+        self.dispenser_address = encoding.encode_address(bytes(signing_key.verify_key))
+        self.ledger.fund(self.dispenser_address, DISPENSER_FUNDS)
+
+    # algod
+
+    def suggested_params(self) -> dict:
+        return {
+            'consensus-version': CONSENSUS_VERSION,
+            'fee': 0,
+            'genesis-hash': GENESIS_HASH,
+            'genesis-id': GENESIS_ID,
+            'last-round': self.ledger.round,
+            'min-fee': MIN_FEE,
+        }
+
+    def status(self) -> dict:
+        return {
+            'last-round': self.ledger.round,
+            'last-version': CONSENSUS_VERSION,
+            'next-version': CONSENSUS_VERSION,
+            'next-version-round': self.ledger.round + 1,
+            'next-version-supported': True,
+            'time-since-last-round': 0,
+            'catchup-time': 0,
+            'stopped-at-unsupported-round': False,
+        }
+
+    def compile(self, source: bytes, sourcemap: bool) -> dict:
+        program = self._load(source)
+        listing = '\n'.join(program.listing).encode()
+        result = {
+            'hash': logic.address(listing),
+            'result': base64.b64encode(listing).decode(),
+        }
+        if sourcemap:
+            result['sourcemap'] = _source_map(len(program.listing))
+        return result
+
+    def disassemble(self, program: bytes) -> dict:
+        return {'result': '\n'.join(self._load(program).listing)}
+
+    def send(self, body: bytes) -> dict:
+        stxns = _decode_stxns(_split_msgpack(body))
+        if not stxns:
+            raise StandInError(400, 'empty transaction group')
+
+        txid = stxns[0].get_txid()
+        with self.lock:
+            result = self.ledger.apply_group(stxns)
+            if not result.passed:
+                failed = stxns[result.failed_index].get_txid()
+                raise StandInError(400, f'TransactionPool.Remember: transaction {failed}: {result.message}')
+            for stxn, txn_result in zip(stxns, result.txns):
+                self.pending[stxn.get_txid()] = txn_result
+        return {'txId': txid}
+
+    def dryrun(self, body: bytes) -> dict:
+        request = msgpack.unpackb(body, raw=False, strict_map_key=False)
+        stxns = _decode_stxns([msgpack.packb(txn, use_bin_type=True) for txn in request.get('txns') or []])
+        with self.lock:
+            results = self.ledger.dryrun(stxns)
+
+        txns = []
+        for txn_result in results:
+            entry = {'disassembly': [], 'logs': [base64.b64encode(log).decode() for log in txn_result.logs]}
+            if txn_result.is_app_call:
+                entry['app-call-messages'] = txn_result.messages
+                entry['app-call-trace'] = [{'line': line, 'pc': line, 'stack': []} for line in txn_result.trace]
+                entry['budget-consumed'] = txn_result.cost
+                entry['global-delta'] = txn_result.global_delta
+                entry['local-deltas'] = txn_result.local_deltas
+            txns.append(entry)
+        return {'error': '', 'protocol-version': CONSENSUS_VERSION, 'txns': txns}
+
+    def simulate(self, body: bytes) -> dict:
+        request = msgpack.unpackb(body, raw=False, strict_map_key=False)
+        groups = []
+        with self.lock:
+            for group in request.get('txn-groups') or []:
+                stxns = _decode_stxns([msgpack.packb(txn, use_bin_type=True) for txn in group.get('txns') or []])
+                result = self.ledger.apply_group(stxns, commit=False)
+                simulated = {
+                    'txn-results': [
+                        {
+                            'txn-result': txn_result.to_pending(),
+                            'exec-trace': {'approval-program-trace': [{'pc': line} for line in txn_result.trace]},
+                            'app-budget-consumed': txn_result.cost,
+                        }
+                        for txn_result in result.txns
+                    ]
+                }
+                if not result.passed:
+                    simulated['failure-message'] = f'transaction {stxns[result.failed_index].get_txid()}: {result.message}'
+                    simulated['failed-at'] = [result.failed_index]
+                groups.append(simulated)
+            return {'last-round': self.ledger.round, 'txn-groups': groups, 'version': 2}
+
+    def pending_transaction(self, txid: str) -> dict:
+        with self.lock:
+            result = self.pending.get(txid)
+        if result is None:
+            raise StandInError(404, 'txn not found')
+        return result.to_pending()
+
+    def account_info(self, address: str) -> dict:
+        with self.lock:
+            info = self.ledger.account_info(address)
+            raw = avm.address_bytes(address)
+            info['apps-local-state'] = [
+                {'id': app_id, 'key-value': _key_values(state)}
+                for (account, app_id), state in self.ledger.locals.items()
+                if account == raw
+            ]
+        return info
+
+    def account_application_info(self, address: str, app_id: int) -> dict:
+        with self.lock:
+            if not self.ledger.opted_in(avm.address_bytes(address), app_id):
+                raise StandInError(404, 'account application info not found')
+            state = self.ledger.local_state(address, app_id)
+            return {
+                'round': self.ledger.round,
+                'app-local-state': {'id': app_id, 'key-value': _key_values(state)},
+            }
+
+    def application_info(self, app_id: int) -> dict:
+        with self.lock:
+            app = self.ledger.apps.get(app_id)
+            if app is None:
+                raise StandInError(404, 'application does not exist')
+            return {
+                'id': app_id,
+                'params': {
+                    'creator': avm.address_string(app.creator),
+                    'approval-program': base64.b64encode(app.approval.source.encode()).decode(),
+                    'clear-state-program': base64.b64encode(app.clear.source.encode()).decode(),
+                    'global-state': _key_values(self.ledger.global_state(app_id)),
+                    'global-state-schema': {'num-uint': app.global_schema[0], 'num-byte-slice': app.global_schema[1]},
+                    'local-state-schema': {'num-uint': app.local_schema[0], 'num-byte-slice': app.local_schema[1]},
+                    'extra-program-pages': app.extra_pages,
+                },
+            }
+
+    @staticmethod
+    def _load(program: bytes) -> avm.Program:
+        try:
+            return avm.load_program(program)
+        except Exception as e:
+            raise StandInError(400, f'could not parse program: {e}')
+
+    # kmd
+
+    def list_wallets(self) -> dict:
+        return {'wallets': [{'id': WALLET_ID, 'name': DEFAULT_KMD_WALLET_NAME, 'driver_name': 'sqlite', 'mnemonic_ux': False}]}
+
+    def init_wallet(self, request: dict) -> dict:
+        if request.get('wallet_id') != WALLET_ID:
+            raise StandInError(404, 'wallet not found')
+        return {'wallet_handle_token': WALLET_ID}
+
+    def list_keys(self, request: dict) -> dict:
+        return {'addresses': [self.dispenser_address]}
+
+    def export_key(self, request: dict) -> dict:
+        if request.get('address') != self.dispenser_address:
+            raise StandInError(404, 'key does not exist in this wallet')
+        return {'private_key': self.dispenser_key}
+
+
+# (method, path pattern, handler taking the stand-in, the match, query and body)
+ALGOD_ROUTES = [
+    ('GET', r'/v2/transactions/params', lambda s, m, q, b: s.suggested_params()),
+    ('GET', r'/v2/status', lambda s, m, q, b: s.status()),
+    ('GET', r'/v2/status/wait-for-block-after/(\d+)', lambda s, m, q, b: s.status()),
+    ('POST', r'/v2/teal/compile', lambda s, m, q, b: s.compile(b, q.get('sourcemap', '').lower() == 'true')),
+    ('POST', r'/v2/teal/disassemble', lambda s, m, q, b: s.disassemble(b)),
+    ('POST', r'/v2/teal/dryrun', lambda s, m, q, b: s.dryrun(b)),
+    ('POST', r'/v2/transactions/simulate', lambda s, m, q, b: s.simulate(b)),
+    ('POST', r'/v2/transactions', lambda s, m, q, b: s.send(b)),
+    ('GET', r'/v2/transactions/pending/(\w+)', lambda s, m, q, b: s.pending_transaction(m[1])),
+    ('GET', r'/v2/accounts/(\w+)/applications/(\d+)', lambda s, m, q, b: s.account_application_info(m[1], int(m[2]))),
+    ('GET', r'/v2/accounts/(\w+)', lambda s, m, q, b: s.account_info(m[1])),
+    ('GET', r'/v2/applications/(\d+)', lambda s, m, q, b: s.application_info(int(m[1]))),
+    ('GET', r'/health', lambda s, m, q, b: {}),
+]
+
+KMD_ROUTES = [
+    ('GET', r'/v1/wallets', lambda s, m, q, b: s.list_wallets()),
+    ('POST', r'/v1/wallet/init', lambda s, m, q, b: s.init_wallet(json.loads(b or b'{}'))),
+    ('POST', r'/v1/wallet/release', lambda s, m, q, b: {}),
+    ('POST', r'/v1/key/list', lambda s, m, q, b: s.list_keys(json.loads(b or b'{}'))),
+    ('POST', r'/v1/key/export', lambda s, m, q, b: s.export_key(json.loads(b or b'{}'))),
+]
+
+
+def make_handler(stand_in: StandIn, routes: list) -> type[BaseHTTPRequestHandler]:
+    compiled = [(method, re.compile(pattern + '$'), handler) for method, pattern, handler in routes]
+
+    class Handler(BaseHTTPRequestHandler):
+        # keep-alive, as the pooled transport expects
+        protocol_version = 'HTTP/1.1'
+        # responses are written in several parts, don't let them wait for the client's ack
+        disable_nagle_algorithm = True
+
+        def do_GET(self) -> None:
+            self._handle('GET')
+
+        def do_POST(self) -> None:
+            self._handle('POST')
+
+        def do_DELETE(self) -> None:
+            self._handle('DELETE')
+
+        def _handle(self, method: str) -> None:
+            url = parse.urlsplit(self.path)
+            query = dict(parse.parse_qsl(url.query))
+            body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+            for route_method, pattern, handler in compiled:
+                match = pattern.match(url.path)
+                if match is None or route_method != method:
+                    continue
+                try:
+                    self._respond(200, handler(stand_in, match, query, body))
+                except StandInError as e:
+                    self._respond(e.status, {'message': e.message})
+                except Exception as e:
+                    self._respond(500, {'message': f'{type(e).__name__}: {e}'})
+                return
+            self._respond(404, {'message': f'unknown endpoint {method} {url.path}'})
+
+        def _respond(self, status: int, result: dict) -> None:
+            data = json.dumps(result, default=_json_default).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format: str, *args) -> None:
+            pass
+
+    return Handler
+
+
+def serve(algod_port: int, kmd_port: int, host: str = '127.0.0.1', seed: int = 0) -> tuple[StandIn, list[ThreadingHTTPServer]]:
+    """Starts the algod and KMD servers of a stand-in in background threads"""
+    stand_in = StandIn(seed)
+    servers = [
+        ThreadingHTTPServer((host, algod_port), make_handler(stand_in, ALGOD_ROUTES)),
+        ThreadingHTTPServer((host, kmd_port), make_handler(stand_in, KMD_ROUTES)),
+    ]
+    for server in servers:
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name=f'algofuzz-standin-{server.server_port}', daemon=True).start()
+    return stand_in, servers
+
+
+def main() -> None:
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Offline stand-in for the algod and KMD endpoints used by AlgoFuzz")
+    parser.add_argument('--algod_port', type=int, default=int(os.getenv("ALGOD_PORT", default="4001")))
+    parser.add_argument('--kmd_port', type=int, default=int(os.getenv("KMD_PORT", default="4002")))
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the dispenser account")
+    args = parser.parse_args()
+
+    _, servers = serve(args.algod_port, args.kmd_port, args.host, args.seed)
+    print(f"algod stand-in on {args.host}:{args.algod_port}, KMD stand-in on {args.host}:{args.kmd_port}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        for server in servers:
+            server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,120 @@
+"""Status screen of a fuzzing run.
+
+The screen is redrawn on a timer by a background thread from the counters of the
+fuzzer, so the fuzzing loop does not wait for the terminal however fast it executes.
+"""
+import curses
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from algofuzz.metrics import format_ns, phase_timers
+from algofuzz.utils import suggested_params_cache
+
+if TYPE_CHECKING:
+    from algofuzz.fuzzers import ContractFuzzer
+
+# seconds between two redraws of the status screen
+STATUS_INTERVAL = float(os.getenv("ALGOFUZZ_STATUS_INTERVAL", default="0.25"))
+METHODS_LINE = 13
+
+
+@dataclass
+class MethodStats:
+    calls: int = 0
+    rejected: int = 0
+    # calls that added a seed to the population
+    finds: int = 0
+
+
+def format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 3600}h {seconds // 60 % 60:02d}m {seconds % 60:02d}s"
+
+
+class StatusDisplay:
+    """Draws the status of a fuzzer every `interval` seconds from a background thread"""
+
+    def __init__(self, fuzzer: "ContractFuzzer", interval: float = STATUS_INTERVAL) -> None:
+        self.fuzzer = fuzzer
+        self.interval = interval
+        self.stdscr = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._last_time = 0.0
+        self._last_calls = 0
+        self._execs_per_sec = 0.0
+
+    def start(self) -> None:
+        self.stdscr = curses.initscr()
+        self._last_time = time.time()
+        self._thread = threading.Thread(target=self._run, name='algofuzz-status', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stops the redraws and draws the final status"""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.render()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.render()
+
+    def render(self) -> None:
+        fuzzer = self.fuzzer
+        # the fuzzing loop keeps running, read every counter once
+        now = time.time()
+        call_count = fuzzer.call_count
+        rejected_calls = fuzzer.rejected_calls
+        covered_line_count = fuzzer.covered_line_count
+        lines_count = fuzzer.lines_count
+        total_runs = fuzzer.runs if fuzzer.timeout_seconds is None else None
+
+        if now > self._last_time:
+            self._execs_per_sec = (call_count - self._last_calls) / (now - self._last_time)
+        self._last_time, self._last_calls = now, call_count
+        elapsed = now - fuzzer.start_time
+
+        mode = "Property Test" if fuzzer.eval is not None else "Assertion"
+        lines = {
+            0: f"Fuzzing contract {fuzzer.app_client.app_name} (id: {fuzzer.app_client.app_id}) in {mode} mode",
+            2: f"Calls executed: \t{call_count}{f'/{total_runs}' if total_runs is not None else ''}",
+            3: f"Calls rejected: \t{rejected_calls} ({rejected_calls / max(call_count, 1) * 100:.2f}%)",
+            4: f"State transitions: \t{fuzzer.transitions_count}",
+            5: f"Lines covered: \t\t{covered_line_count}/{lines_count} ({covered_line_count / lines_count * 100:.2f}%)",
+            6: f"Unique coverage paths: \t{fuzzer.cov_paths}",
+            10: f"Params requests saved: \t{suggested_params_cache.hits}",
+            11: f"Execs/sec: \t\t{self._execs_per_sec:.0f} (average {call_count / max(elapsed, 1e-9):.0f})",
+            12: f"Last new path: \t\t{format_duration(now - fuzzer.last_find_time)} ago (run time {format_duration(elapsed)})",
+        }
+        if fuzzer.edge_virgin is not None:
+            lines[7] = f"Edges covered: \t\t{fuzzer.covered_edge_count}"
+        if fuzzer.sync is not None:
+            lines[8] = f"Lines covered by all workers: {fuzzer.sync.global_covered_count}/{lines_count}"
+            lines[9] = f"Seeds exported/imported: \t{fuzzer.sync.exported}/{fuzzer.sync.imported}"
+
+        lines[METHODS_LINE + 1] = f"{'Method':<24}{'Calls':>10}{'Rejected':>10}{'Finds':>8}"
+        for i, (name, stats) in enumerate(fuzzer.method_stats.items()):
+            lines[METHODS_LINE + 2 + i] = f"{name[:23]:<24}{stats.calls:>10}{stats.rejected:>10}{stats.finds:>8}"
+
+        phases_line = max(lines) + 2
+        lines[phases_line] = f"{'Phase':<24}{'Count':>10}{'p50':>10}{'p99':>10}"
+        for i, (phase, (count, p50, p99)) in enumerate(phase_timers.summary().items()):
+            lines[phases_line + 1 + i] = f"{phase:<24}{count:>10}{format_ns(p50):>10}{format_ns(p99):>10}"
+
+        height, width = self.stdscr.getmaxyx()
+        self.stdscr.erase()
+        for y, line in lines.items():
+            if y >= height:
+                continue
+            try:
+                self.stdscr.addstr(y, 0, line[:width - 1])
+            except curses.error:
+                pass
+        self.stdscr.refresh()
\ No newline at end of file
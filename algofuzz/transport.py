@@ -0,0 +1,316 @@
+"""Keep-alive HTTP transport for the algod and KMD clients.
+
+The SDK clients open a new connection for every request. The clients returned here send
+their requests over a pool of persistent connections instead, and are shared by every
+module of a process, so a fuzzing run reuses a handful of connections for all its calls.
+
+The requests of a process can be recorded to a log with `record` and answered from
+such a log with `replay`, without a node. Together with a fixed seed a replayed
+campaign makes the same calls as the recorded one.
+"""
+import collections
+import gzip
+import http.client
+import json
+import os
+import threading
+from pathlib import Path
+from urllib import parse
+
+import msgpack
+
+from algokit_utils import get_algod_client as get_algokit_algod_client
+from algosdk import constants, error
+from algosdk.kmd import KMDClient
+from algosdk.v2client import algod
+
+API_VERSION_PREFIX = "/v2"
+KMD_API_VERSION_PREFIX = "/v1"
+# number of idle connections kept per endpoint, more are opened while the pool is exhausted
+POOL_SIZE = int(os.getenv("ALGOD_POOL_SIZE", default="8"))
+
+# errors of a request on a connection the server has closed in the meantime
+_STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, http.client.BadStatusLine, ConnectionResetError, BrokenPipeError)
+
+
+class ConnectionPool:
+    """Persistent connections to one HTTP endpoint, usable from several threads"""
+
+    def __init__(self, url: str, size: int | None = None, timeout: float | None = None, name: str = "") -> None:
+        parsed = parse.urlparse(url)
+        # identifies the endpoint in recorded requests
+        self.name = name
+        self.scheme = parsed.scheme or "http"
+        self.host = parsed.hostname
+        self.port = parsed.port
+        self.base_path = parsed.path.rstrip("/")
+        self.size = size if size is not None else POOL_SIZE
+        self.timeout = timeout
+        self.connections_opened = 0
+        self._idle: list[http.client.HTTPConnection] = []
+        self._lock = threading.Lock()
+
+    def request(self, method: str, path: str, body: bytes | None = None, headers: dict | None = None) -> tuple[int, bytes]:
+        """Sends a request and returns the status and body of the response"""
+        if _tape is not None:
+            return _tape.request(self, method, path, body, headers)
+        return self.send(method, path, body, headers)
+
+    def send(self, method: str, path: str, body: bytes | None = None, headers: dict | None = None) -> tuple[int, bytes]:
+        """Sends a request over the network, bypassing recording and replay"""
+        conn, reused = self._acquire()
+        try:
+            status, data, will_close = self._send(conn, method, path, body, headers)
+        except _STALE_CONNECTION_ERRORS:
+            conn.close()
+            if not reused:
+                raise
+            # the server closed the idle connection in the meantime, retry once on a new one
+            conn = self._new_connection()
+            try:
+                status, data, will_close = self._send(conn, method, path, body, headers)
+            except BaseException:
+                conn.close()
+                raise
+        except BaseException:
+            conn.close()
+            raise
+
+        if will_close:
+            conn.close()
+        else:
+            self._release(conn)
+        return status, data
+
+    def resize(self, size: int) -> None:
+        with self._lock:
+            self.size = size
+            while len(self._idle) > size:
+                self._idle.pop(0).close()
+
+    def close(self) -> None:
+        with self._lock:
+            for conn in self._idle:
+                conn.close()
+            self._idle.clear()
+
+    def _send(self, conn: http.client.HTTPConnection, method: str, path: str, body, headers) -> tuple[int, bytes, bool]:
+        conn.request(method, self.base_path + path, body=body, headers=headers or {})
+        response = conn.getresponse()
+        return response.status, response.read(), response.will_close
+
+    def _acquire(self) -> tuple[http.client.HTTPConnection, bool]:
+        with self._lock:
+            if self._idle:
+                return self._idle.pop(), True
+        return self._new_connection(), False
+
+    def _release(self, conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def _new_connection(self) -> http.client.HTTPConnection:
+        self.connections_opened += 1
+        if self.scheme == "https":
+            return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout)
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+
+class PooledAlgodClient(algod.AlgodClient):
+    """AlgodClient that sends its requests over a `ConnectionPool`"""
+
+    def __init__(self, algod_token: str, algod_address: str, headers: dict | None = None, pool_size: int | None = None) -> None:
+        super().__init__(algod_token, algod_address, headers)
+        self.pool = ConnectionPool(algod_address, pool_size, name="algod")
+
+    def algod_request(self, method, requrl, params=None, data=None, headers=None, response_format="json"):
+        header = {"User-Agent": "py-algorand-sdk"}
+        if self.headers:
+            header.update(self.headers)
+        if headers:
+            header.update(headers)
+        if requrl not in constants.no_auth:
+            header.update({constants.algod_auth_header: self.algod_token})
+
+        if requrl not in constants.unversioned_paths:
+            requrl = API_VERSION_PREFIX + requrl
+        if params:
+            requrl = requrl + "?" + parse.urlencode(params)
+
+        status, body = self.pool.request(method, requrl, data, header)
+        if status >= 400:
+            message = body.decode("utf-8")
+            try:
+                message = json.loads(message)["message"]
+            except Exception:
+                pass
+            raise error.AlgodHTTPError(message, status)
+
+        if response_format != "json":
+            return body
+        if status == 200 and len(body) == 0:
+            return {}
+        try:
+            return json.loads(body)
+        except Exception as e:
+            raise error.AlgodResponseError("Failed to parse JSON response from algod") from e
+
+
+class PooledKMDClient(KMDClient):
+    """KMDClient that sends its requests over a `ConnectionPool`"""
+
+    def __init__(self, kmd_token: str, kmd_address: str, pool_size: int | None = None) -> None:
+        super().__init__(kmd_token, kmd_address)
+        self.pool = ConnectionPool(kmd_address, pool_size, name="kmd")
+
+    def kmd_request(self, method, requrl, params=None, data=None):
+        header = {} if requrl in constants.no_auth else {constants.kmd_auth_header: self.kmd_token}
+
+        if requrl not in constants.unversioned_paths:
+            requrl = KMD_API_VERSION_PREFIX + requrl
+        if params:
+            requrl = requrl + "?" + parse.urlencode(params)
+        if data:
+            data = bytearray(json.dumps(data, indent=2), "utf-8")
+
+        status, body = self.pool.request(method, requrl, data, header)
+        message = body.decode("utf-8")
+        if status >= 400:
+            try:
+                message = json.loads(message)["message"]
+            except Exception:
+                pass
+            raise error.KMDHTTPError(message)
+        return json.loads(message)
+
+
+class ReplayError(Exception):
+    pass
+
+
+def _request_key(pool: ConnectionPool, method: str, path: str, body: bytes | None) -> tuple:
+    return (pool.name, method, path, bytes(body or b""))
+
+
+class Recorder:
+    """Sends requests and appends them with their responses to a gzipped msgpack log"""
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self.requests = 0
+        self._file = gzip.open(self.path, "wb")
+        self._lock = threading.Lock()
+
+    def request(self, pool: ConnectionPool, method: str, path: str, body: bytes | None, headers: dict | None) -> tuple[int, bytes]:
+        status, data = pool.send(method, path, body, headers)
+        record = msgpack.packb([*_request_key(pool, method, path, body), status, data], use_bin_type=True)
+        with self._lock:
+            self._file.write(record)
+            self.requests += 1
+        return status, data
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+class Replayer:
+    """Answers requests with the responses recorded for them, in the recorded order.
+
+    Requests are matched on endpoint, method, path and body, so the order of different
+    requests may change, e.g. with pipelining. A request repeated more often than it
+    was recorded gets its last response again."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self.requests = 0
+        self.repeated = 0
+        self.missing = 0
+        self._responses: dict[tuple, collections.deque] = collections.defaultdict(collections.deque)
+        self._last: dict[tuple, tuple[int, bytes]] = {}
+        self._lock = threading.Lock()
+
+        with gzip.open(self.path, "rb") as f:
+            for name, method, path, body, status, data in msgpack.Unpacker(f, raw=False):
+                self._responses[(name, method, path, body)].append((status, data))
+
+    def request(self, pool: ConnectionPool, method: str, path: str, body: bytes | None, headers: dict | None) -> tuple[int, bytes]:
+        key = _request_key(pool, method, path, body)
+        with self._lock:
+            self.requests += 1
+            responses = self._responses.get(key)
+            if responses:
+                self._last[key] = responses.popleft()
+                return self._last[key]
+            if key in self._last:
+                self.repeated += 1
+                return self._last[key]
+            self.missing += 1
+        raise ReplayError(f"No recorded response for {pool.name} request {method} {path}")
+
+    def close(self) -> None:
+        pass
+
+
+_tape: Recorder | Replayer | None = None
+
+
+def record(path: Path) -> Recorder:
+    """Records all requests of the process to path"""
+    global _tape
+    _tape = Recorder(path)
+    return _tape
+
+
+def replay(path: Path) -> Replayer:
+    """Answers all requests of the process from the log at path, without a network"""
+    global _tape
+    _tape = Replayer(path)
+    return _tape
+
+
+def stop_tape() -> None:
+    """Stops recording or replaying"""
+    global _tape
+    if _tape is not None:
+        _tape.close()
+        _tape = None
+
+
+_lock = threading.Lock()
+_algod_client: PooledAlgodClient | None = None
+_kmd_clients: dict[tuple[str, str], PooledKMDClient] = {}
+
+
+def get_algod_client() -> PooledAlgodClient:
+    """Returns the algod client of the process, configured from the environment
+    (`ALGOD_SERVER`, `ALGOD_PORT` and `ALGOD_TOKEN`)"""
+    global _algod_client
+    with _lock:
+        if _algod_client is None:
+            config = get_algokit_algod_client()
+            _algod_client = PooledAlgodClient(config.algod_token, config.algod_address, config.headers)
+        return _algod_client
+
+
+def get_kmd_client(kmd_address: str, kmd_token: str) -> PooledKMDClient:
+    """Returns the KMD client of the process for an endpoint"""
+    with _lock:
+        client = _kmd_clients.get((kmd_address, kmd_token))
+        if client is None:
+            client = PooledKMDClient(kmd_token, kmd_address)
+            _kmd_clients[(kmd_address, kmd_token)] = client
+        return client
+
+
+def set_pool_size(size: int) -> None:
+    """Sets the number of idle connections kept per endpoint, e.g. for pipelined calls"""
+    global POOL_SIZE
+    with _lock:
+        POOL_SIZE = size
+        clients = ([_algod_client] if _algod_client is not None else []) + list(_kmd_clients.values())
+    for client in clients:
+        client.pool.resize(size)
\ No newline at end of file
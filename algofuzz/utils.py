@@ -1,13 +1,20 @@
+import base64
 import os
+import random
+import threading
+import time
 from dataclasses import dataclass
-from typing import List
-from algokit_utils import Account, ApplicationSpecification, CallConfig, get_algod_client
+from typing import Callable, List
+from algokit_utils import Account, ApplicationSpecification, CallConfig
 
 from algosdk import transaction, logic, abi
 from algosdk.v2client import algod, indexer
 from algosdk.atomic_transaction_composer import AccountTransactionSigner
 from algosdk.kmd import KMDClient
 from algosdk.wallet import Wallet
+from nacl.signing import SigningKey
+
+from algofuzz import transport
 
 
 KMD_ADDRESS = "http://localhost"
@@ -23,10 +30,39 @@ INDEXER_TOKEN = "a" * 64
 INDEXER_PORT = os.getenv("INDEXER_PORT", default="8980")
 INDEXER_URL = f"{INDEXER_ADDRESS}:{INDEXER_PORT}"
 
+SUGGESTED_PARAMS_MAX_AGE = float(os.getenv("SUGGESTED_PARAMS_MAX_AGE", default="30"))
+SUGGESTED_PARAMS_MAX_ROUNDS = int(os.getenv("SUGGESTED_PARAMS_MAX_ROUNDS", default="500"))
+# amount balance top ups fund accounts up to, 0 to only send the requested amount
+DISPENSER_HIGH_WATERMARK = int(os.getenv("DISPENSER_HIGH_WATERMARK", default="0"))
+# number of committed groups after which tracked balances are fetched again
+BALANCE_RECONCILE_INTERVAL = int(os.getenv("BALANCE_RECONCILE_INTERVAL", default="200"))
+
+
+# source of account keys and transaction notes, seeded by set_seed for reproducible runs
+_entropy: random.Random = random.SystemRandom()
+
+
+def set_seed(seed: int) -> None:
+    """Seeds the mutators and the generation of accounts and notes, so that runs against
+    the same node state (or a replayed log) make the same calls"""
+    global _entropy
+    random.seed(seed)
+    _entropy = random.Random(seed)
+
+
+def random_bytes(n: int) -> bytes:
+    return _entropy.randbytes(n)
+
+
+def new_account() -> Account:
+    """Creates an account from a key drawn from the (possibly seeded) entropy source"""
+    signing_key = SigningKey(random_bytes(32))
+    return Account(private_key=base64.b64encode(bytes(signing_key) + bytes(signing_key.verify_key)).decode())
+
 
 def get_kmd_client(addr: str = KMD_URL, token: str = KMD_TOKEN) -> KMDClient:
-    """creates a new kmd client using the default sandbox parameters"""
-    return KMDClient(kmd_token=token, kmd_address=addr)
+    """returns the shared kmd client, using the default sandbox parameters"""
+    return transport.get_kmd_client(addr, token)
 
 
 def get_indexer_client(
@@ -67,7 +103,7 @@ def get_accounts(
     to the `unencrypted-default-wallet` created on private networks automatically
     """
 
-    kmd = KMDClient(kmd_token, kmd_address)
+    kmd = get_kmd_client(kmd_address, kmd_token)
     wallets = kmd.list_wallets()
 
     wallet_id = None
@@ -105,7 +141,7 @@ def get_account_balance(
     address: str
 ) -> tuple[int,int]:
     """returns the balance of an account"""
-    algod_client = get_algod_client()
+    algod_client = transport.get_algod_client()
     account_info = algod_client.account_info(address)
     min_balance = account_info.get("min-balance")
     return account_info.get("amount"), min_balance
@@ -118,18 +154,217 @@ def get_application_address(
     return logic.get_application_address(app_id)
 
 
+class SuggestedParamsCache:
+    """Caches the suggested transaction params of the node.
+
+    Params are fetched again once they are older than `max_age` seconds, or once the
+    node is known to be `max_rounds` past their first valid round, well before their
+    validity window (1000 rounds) runs out. Rounds are learned from confirmed transactions.
+    """
+
+    def __init__(self, max_age: float = SUGGESTED_PARAMS_MAX_AGE, max_rounds: int = SUGGESTED_PARAMS_MAX_ROUNDS) -> None:
+        self.max_age = max_age
+        self.max_rounds = max_rounds
+        self.requests = 0
+        self.hits = 0
+        self._params: transaction.SuggestedParams | None = None
+        self._fetched_at = 0.0
+        self._round = 0
+        self._lock = threading.Lock()
+
+    def get(self, algod_client: algod.AlgodClient) -> transaction.SuggestedParams:
+        with self._lock:
+            if not self._is_fresh():
+                self._params = algod_client.suggested_params()
+                self._fetched_at = time.monotonic()
+                self._round = max(self._round, self._params.first)
+                self.requests += 1
+            else:
+                self.hits += 1
+            return self._params
+
+    def observe_round(self, round: int | None) -> None:
+        """Records a round the node has reached, e.g. the confirmed round of a transaction"""
+        if round is not None and round > self._round:
+            self._round = round
+
+    def observe_error(self, error: Exception) -> None:
+        """Drops the cached params if error says a transaction was outside of its validity window"""
+        if is_txn_dead_error(error):
+            self.invalidate()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._params = None
+
+    def _is_fresh(self) -> bool:
+        if self._params is None:
+            return False
+        if time.monotonic() - self._fetched_at > self.max_age:
+            return False
+        return self._round - self._params.first < self.max_rounds
+
+
+def is_txn_dead_error(error: Exception) -> bool:
+    message = str(error)
+    return 'txn dead' in message or 'outside of' in message
+
+
+suggested_params_cache = SuggestedParamsCache()
+
+
+def get_suggested_params(algod_client: algod.AlgodClient) -> transaction.SuggestedParams:
+    """returns the suggested params of the node, cached across all clients"""
+    return suggested_params_cache.get(algod_client)
+
+
+MAX_GROUP_SIZE = 16
+
+
+class Dispenser:
+    """Funds accounts from the first account of the sandbox kmd.
+
+    The dispenser account is looked up in kmd once and cached. Payments to several
+    accounts are sent as groups of up to 16 transactions. With a high watermark, top ups
+    fund accounts up to it, so that they are needed rarely.
+    """
+
+    def __init__(self, high_watermark: int = DISPENSER_HIGH_WATERMARK) -> None:
+        self.high_watermark = high_watermark
+        self.payments = 0
+        self._account: SandboxAccount | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def account(self) -> SandboxAccount:
+        if self._account is None:
+            with self._lock:
+                if self._account is None:
+                    self._account = get_accounts()[0]
+        return self._account
+
+    def fund(self, algod_client: algod.AlgodClient, amounts: dict[str, int]) -> None:
+        """Sends the amounts to their addresses, waiting only for the last group"""
+        amounts = [(address, amount) for address, amount in amounts.items() if amount > 0]
+        if not amounts:
+            return
+
+        sp = get_suggested_params(algod_client)
+        dispenser = self.account
+        txid = None
+        for start in range(0, len(amounts), MAX_GROUP_SIZE):
+            payments = [
+                transaction.PaymentTxn(sender=dispenser.address, sp=sp, receiver=address, amt=amount, note=random_bytes(8))
+                for address, amount in amounts[start:start + MAX_GROUP_SIZE]
+            ]
+            if len(payments) > 1:
+                transaction.assign_group_id(payments)
+            try:
+                txid = algod_client.send_transactions([payment.sign(dispenser.private_key) for payment in payments])
+            except Exception as e:
+                suggested_params_cache.observe_error(e)
+                raise
+            self.payments += len(payments)
+
+        result = transaction.wait_for_confirmation(algod_client, txid, 0)
+        suggested_params_cache.observe_round(result.get('confirmed-round'))
+
+    def top_up(self, algod_client: algod.AlgodClient, balances: dict[str, int], low_watermark: int, amount: int) -> dict[str, int]:
+        """Funds the accounts with a balance below the low watermark with amount, or up to
+        the high watermark if that is more. Returns the amounts sent."""
+        amounts = {
+            address: max(amount, self.high_watermark - balance)
+            for address, balance in balances.items()
+            if balance < low_watermark
+        }
+        self.fund(algod_client, amounts)
+        return amounts
+
+
+dispenser = Dispenser()
+
+
+class BalanceTracker:
+    """Balances of accounts, tracked locally from the payments and fees of the groups
+    the fuzzer commits. Transfers made by the contract itself are not seen, so balances
+    are fetched again every `reconcile_interval` recorded groups.
+    """
+
+    def __init__(self, reconcile_interval: int = BALANCE_RECONCILE_INTERVAL) -> None:
+        self.reconcile_interval = reconcile_interval
+        self.requests = 0
+        self.hits = 0
+        self._balances: dict[str, int] = {}
+        self._recorded = 0
+        self._account_info: Callable[[str], dict] = lambda address: transport.get_algod_client().account_info(address)
+        self._fund: Callable[[dict[str, int]], None] = lambda amounts: dispenser.fund(transport.get_algod_client(), amounts)
+        self._lock = threading.Lock()
+
+    def use_backend(self, account_info: Callable[[str], dict], fund: Callable[[dict[str, int]], None]) -> None:
+        """Tracks the balances of another backend than the node, e.g. an in-memory ledger"""
+        with self._lock:
+            self._account_info = account_info
+            self._fund = fund
+            self._balances.clear()
+
+    def balance(self, address: str) -> int:
+        with self._lock:
+            if self._recorded >= self.reconcile_interval:
+                self._balances.clear()
+                self._recorded = 0
+
+            balance = self._balances.get(address)
+            if balance is not None:
+                self.hits += 1
+                return balance
+
+        balance = self._account_info(address).get('amount', 0)
+        with self._lock:
+            self.requests += 1
+            self._balances[address] = balance
+        return balance
+
+    def record(self, txns: list) -> None:
+        """Applies the fees and payments of a committed group to the tracked balances"""
+        with self._lock:
+            for txn in txns:
+                txn = getattr(txn, 'transaction', txn)
+                if txn.sender in self._balances:
+                    self._balances[txn.sender] -= txn.fee
+                if isinstance(txn, transaction.PaymentTxn):
+                    if txn.sender in self._balances:
+                        self._balances[txn.sender] -= txn.amt
+                    if txn.receiver in self._balances:
+                        self._balances[txn.receiver] += txn.amt
+            self._recorded += 1
+
+    def top_up(self, address: str, low_watermark: int, amount: int) -> int:
+        """Funds an account with a balance below the low watermark, see `Dispenser.top_up`.
+        Returns the amount sent."""
+        balance = self.balance(address)
+        if balance >= low_watermark:
+            return 0
+
+        sent = max(amount, dispenser.high_watermark - balance)
+        self._fund({address: sent})
+        with self._lock:
+            if address in self._balances:
+                self._balances[address] += sent
+        return sent
+
+
+balance_tracker = BalanceTracker()
+
+
 def dispense(algod_client: algod.AlgodClient, address: str, amount: int) -> None:
-    sp = algod_client.suggested_params()
-    accounts = get_accounts()
-    dispenser = accounts[0]
-    ptxn = transaction.PaymentTxn(
-        sender=dispenser.address, sp=sp, receiver=address, amt=amount
-    ).sign(dispenser.private_key)
-    txid = algod_client.send_transaction(ptxn)
-    transaction.wait_for_confirmation(algod_client, txid, 0)
+    dispenser.fund(algod_client, {address: amount})
+
+def fund_accounts(algod_client: algod.AlgodClient, addresses: list[str], amount: int) -> None:
+    """funds accounts with groups of up to 16 payments from the dispenser"""
+    dispenser.fund(algod_client, {address: amount for address in addresses})
 
 def get_funded_account(algod_client: algod.AlgodClient) -> Account:
-    account = Account.new_account()
+    account = new_account()
     dispense(algod_client, account.address, int(2e8))
     return account
     
@@ -146,4 +381,20 @@ def create_app_spec(approval: str, clear: str, contract: str, schema: tuple[int,
             "no_op": CallConfig.CREATE,
             "opt_in": CallConfig.CALL
         },
-    )
\ No newline at end of file
+    )
+
+
+def str_or_hex(value: bytes) -> str:
+    """decodes state keys and byte values the same way algokit does for application state"""
+    try:
+        return value.decode("utf-8")
+    except UnicodeDecodeError:
+        return value.hex()
+
+
+def decode_state(state: dict[bytes, bytes | int]) -> dict[str, str | int]:
+    """decodes raw application state into the format returned by `ApplicationClient.get_global_state`"""
+    return {
+        str_or_hex(key): str_or_hex(value) if isinstance(value, bytes) else value
+        for key, value in state.items()
+    }
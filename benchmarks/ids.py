@@ -0,0 +1,81 @@
+"""Compares the per-call cost of the path and transition ids used by the scheduler
+with the previous pickle/json + MD5 implementation.
+
+Run from the repository root:
+    poetry run python benchmarks/ids.py
+"""
+import hashlib
+import json
+import pickle
+import random
+import timeit
+
+from algofuzz.scheduler import Ids
+
+
+def md5_path_id(coverage: list[int]) -> str:
+    pickled = pickle.dumps(sorted(coverage))
+    return hashlib.md5(pickled).hexdigest()
+
+
+def md5_transition_id(transition: tuple[dict, dict]) -> str:
+    pickled = json.dumps(transition, sort_keys=True).encode()
+    return hashlib.md5(pickled).hexdigest()
+
+
+def random_trace(line_count: int, length: int) -> list[int]:
+    """A trace over a program of line_count lines, with loops repeating lines"""
+    return [random.randrange(line_count) for _ in range(length)]
+
+
+def bitmap(trace: list[int], line_count: int) -> bytearray:
+    hits = bytearray(line_count)
+    for line in trace:
+        hits[line] = min(hits[line] + 1, 255)
+    return hits
+
+
+def random_state(globals: int, accounts: int, locals: int) -> dict:
+    def value():
+        return random.randint(0, 2 ** 64 - 1) if random.random() < 0.7 else random.randbytes(32).hex()
+
+    return {
+        'global': {f'global_{i}': value() for i in range(globals)},
+        'local': {
+            random.randbytes(32).hex(): {f'local_{i}': value() for i in range(locals)}
+            for _ in range(accounts)
+        }
+    }
+
+
+def bench(name: str, fn, arg, number: int) -> float:
+    per_call = timeit.timeit(lambda: fn(arg), number=number) / number * 1e6
+    print(f'{name:<40}{per_call:>10.2f} us')
+    return per_call
+
+
+def main():
+    random.seed(0)
+    number = 20000
+    shapes = [
+        ('small', 100, 60, 4, 3, 1),
+        ('AlgoTether-like', 840, 400, 10, 3, 2),
+        ('large', 4000, 3000, 64, 16, 16),
+    ]
+    for shape, lines, trace_length, globals, accounts, locals in shapes:
+        trace = random_trace(lines, trace_length)
+        transition = (random_state(globals, accounts, locals), random_state(globals, accounts, locals))
+        print(f'-- {shape}: {lines} lines, trace of {trace_length}, {globals} globals, {accounts}x{locals} locals')
+        ids = Ids()
+        before = bench('path id (pickle + md5)', md5_path_id, trace, number)
+        after = bench('Ids.path_id (trace)', ids.path_id, trace, number)
+        print(f'{"speedup":<40}{before / after:>10.1f}x')
+        after = bench('Ids.path_id (bitmap)', ids.path_id, bitmap(trace, lines), number)
+        print(f'{"speedup":<40}{before / after:>10.1f}x')
+        before = bench('transition id (json + md5)', md5_transition_id, transition, number)
+        after = bench('Ids.transition_id', ids.transition_id, transition, number)
+        print(f'{"speedup":<40}{before / after:>10.1f}x')
+
+
+if __name__ == '__main__':
+    main()
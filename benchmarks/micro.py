@@ -0,0 +1,213 @@
+"""Microbenchmarks of the pure Python work the fuzzer does for every candidate:
+mutating arguments, choosing a seed from the power schedule and interning path and
+transition ids. Nothing here talks to a node, so the numbers are the CPU overhead per
+candidate independently of the backend.
+
+Populations range from 1k to 1M seeds and the arguments have the largest shapes a call
+allows, e.g. a uint64[] of 256 elements (2048 bytes) and 256 character strings.
+
+Run from the repository root:
+    poetry run python benchmarks/micro.py
+    poetry run python benchmarks/micro.py --sizes 1000 10000 --output micro.json --compare benchmarks/baselines/micro.json
+"""
+import argparse
+import json
+import random
+import timeit
+from pathlib import Path
+
+from algosdk import abi
+
+from algofuzz.accounts import account_pool
+from algofuzz.fuzzers import MethodFuzzer
+from algofuzz.mutate import AccountMutator, ArrayMutator, ArrayStaticMutator, MethodMutator, StringMutator, TupleMutator, UintMutator
+from algofuzz.scheduler import Ids, PowerSchedule, Seed
+from ids import random_state
+
+SIZES = (1_000, 10_000, 100_000, 1_000_000)
+# lines of the approval program, as in AlgoTether
+PROGRAM_LINES = 840
+# largest number of distinct paths and transitions to intern, far more than runs find,
+# and every path holds a bitmap of the program
+MAX_IDS = 100_000
+# METHOD in the names of the benchmarks
+METHOD = abi.Method.from_signature('fuzz(uint64,string,uint64[],(uint64,string,bool),byte[32])void')
+
+
+def bench(results: dict, name: str, fn, repeat: int = 5, number: int = None) -> float:
+    """Prints and records the time per call of fn in us, the best of `repeat` rounds of
+    `number` calls, by default as many as take at least 0.2 seconds"""
+    timer = timeit.Timer(fn)
+    if number is None:
+        number, _ = timer.autorange()
+    per_call = min(timer.repeat(repeat, number)) / number * 1e6
+    results[name] = per_call
+    print(f'{name:<56}{per_call:>12.2f} us{1e6 / per_call:>14.0f} /s')
+    return per_call
+
+
+def random_string(length: int) -> str:
+    return ''.join(chr(random.randint(0, 255)) for _ in range(length))
+
+
+def random_uints(length: int) -> list[int]:
+    return [random.randint(0, 2 ** 64 - 1) for _ in range(length)]
+
+
+def bench_mutators(results: dict) -> None:
+    print('-- mutators')
+    uint = UintMutator(64)
+    value = random.randint(0, 2 ** 64 - 1)
+    bench(results, 'UintMutator(64).mutate', lambda: uint.mutate(value))
+
+    string = StringMutator()
+    for length in (16, 256):
+        value = random_string(length)
+        bench(results, f'StringMutator.mutate (len {length})', lambda: string.mutate(value))
+
+    array = ArrayMutator(abi.ABIType.from_string('uint64[]'), '')
+    for length in (16, array.max):
+        value = random_uints(length)
+        bench(results, f'ArrayMutator.mutate (uint64[], len {length})', lambda: array.mutate(value))
+
+    static_array = ArrayStaticMutator(abi.ABIType.from_string('uint64[256]'), '')
+    value = random_uints(256)
+    bench(results, 'ArrayStaticMutator.mutate (uint64[256])', lambda: static_array.mutate(value))
+
+    tuple_mutator = TupleMutator(abi.ABIType.from_string('(uint64,string,bool)'), '')
+    value = [random.randint(0, 2 ** 64 - 1), random_string(256), False]
+    bench(results, 'TupleMutator.mutate ((uint64,string,bool))', lambda: tuple_mutator.mutate(value))
+
+    method = MethodMutator(METHOD, '')
+    args = method_args()
+    bench(results, 'MethodMutator.mutate (METHOD)', lambda: method.mutate(args))
+
+
+def method_args() -> list:
+    """Arguments of METHOD at their largest"""
+    return [
+        random.randint(0, 2 ** 64 - 1),
+        random_string(256),
+        random_uints(256),
+        [random.randint(0, 2 ** 64 - 1), random_string(256), True],
+        [random.randint(0, 255) for _ in range(32)],
+    ]
+
+
+def random_bitmap() -> bytes:
+    """Coverage bitmap of a call covering a random part of the program"""
+    covered = random.randint(PROGRAM_LINES // 10, PROGRAM_LINES // 2)
+    bitmap = bytearray(PROGRAM_LINES)
+    for line in random.sample(range(PROGRAM_LINES), covered):
+        bitmap[line] = random.choice((1, 2, 4, 8))
+    return bytes(bitmap)
+
+
+def bench_ids(results: dict, size: int) -> None:
+    # fresh ids, the ones of earlier sizes would add to these
+    ids = Ids()
+
+    bitmaps = [random_bitmap() for _ in range(min(size, 10_000))]
+    for i in range(size):
+        # distinct paths, cheaper to build than distinct random bitmaps
+        ids.path_id(bitmaps[i % len(bitmaps)] + i.to_bytes(4, 'little'))
+    bitmap = bytearray(bitmaps[0] + bytes(4))
+    bench(results, f'Ids.path_id (seen bitmap, {size} paths)', lambda: ids.path_id(bitmap))
+    # every call interns a path, a fixed number of calls keeps the interner near size
+    fresh = iter(range(size, size + 10 ** 9))
+    bench(results, f'Ids.path_id (new bitmap, {size} paths)', lambda: ids.path_id(bitmap[:-4] + next(fresh).to_bytes(4, 'little')), repeat=1, number=10_000)
+
+    states = [random_state(10, 3, 2) for _ in range(100)]
+    for i in range(size):
+        old, new = states[i % len(states)], states[(i // len(states)) % len(states)]
+        ids.transition_id((old, {'global': {**new['global'], 'n': i}, 'local': new['local']}))
+    transition = (states[0], {'global': {**states[0]['global'], 'n': 0}, 'local': states[0]['local']})
+    bench(results, f'Ids.transition_id (seen, {size} transitions)', lambda: ids.transition_id(transition))
+
+
+def populated_schedule(size: int, data = None) -> PowerSchedule:
+    """Schedule with size seeds of data spread over paths and transitions with skewed frequencies"""
+    schedule = PowerSchedule()
+    ids = max(size // 100, 1)
+    for id in range(ids):
+        schedule.path_frequency[id] = random.randint(1, 1000)
+        schedule.transition_frequency[id] = random.randint(1, 1000)
+    for _ in range(size):
+        seed = Seed(data)
+        seed.path_id = min(int(random.expovariate(10 / ids)), ids - 1)
+        seed.transition_id = random.randrange(ids)
+        schedule.add(seed)
+    return schedule
+
+
+def bench_schedule(results: dict, size: int) -> None:
+    schedule = populated_schedule(size)
+    bench(results, f'PowerSchedule.choose ({size} seeds)', schedule.choose)
+
+    ids = list(schedule.path_frequency)
+    def choose_after_find():
+        # as while fuzzing, every call adds to the frequency of a path
+        path_id = random.choice(ids)
+        schedule.path_frequency[path_id] += 1
+        return schedule.choose()
+    bench(results, f'PowerSchedule.choose (+ frequency update, {size} seeds)', choose_after_find)
+
+    # choosing and stacking mutations, all a partial fuzzer does to make a candidate
+    accounts = AccountMutator.accs
+    schedule = populated_schedule(size, (method_args(), accounts[0]))
+    fuzzer = MethodFuzzer(METHOD, accounts[0].address, schedule, breakout_coef=0.1)
+    bench(results, f'MethodFuzzer.create_candidate (METHOD, {size} seeds)', fuzzer.create_candidate)
+
+
+def compare(baseline: dict, results: dict, threshold: float) -> list[str]:
+    """:return: The benchmarks that got slower than in baseline by more than threshold"""
+    regressions = []
+    for name, per_call in results.items():
+        old = baseline.get(name)
+        if old is not None and per_call > old * (1 + threshold):
+            regressions.append(f'{name}: {old:.2f} -> {per_call:.2f} us ({(per_call / old - 1) * 100:+.1f}%)')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Microbenchmarks of the mutators, the power schedule and the id interning')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, help='Population sizes')
+    parser.add_argument('--output', type=Path, help='File to write the time per call of every benchmark to')
+    parser.add_argument('--compare', type=Path, help='Results to compare with')
+    # results vary more than those of the throughput suite, the mutations are chosen at random
+    parser.add_argument('--threshold', type=float, default=0.25, help='Relative slowdown that counts as a regression')
+    args = parser.parse_args()
+
+    # candidates are sent from accounts of the pool, they need no funds here
+    account_pool.configure(fund=False)
+    results = {}
+    random.seed(0)
+    bench_mutators(results)
+    for size in args.sizes:
+        print(f'-- {size} seeds')
+        # the same data for a size whichever sizes run
+        random.seed(size)
+        if size <= MAX_IDS:
+            bench_ids(results, size)
+        bench_schedule(results, size)
+
+    if args.output is not None:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare is not None:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), results, args.threshold)
+        print()
+        if not regressions:
+            print(f'No regressions beyond {args.threshold * 100:.0f}%')
+            return
+        print(f'{len(regressions)} regressions beyond {args.threshold * 100:.0f}%:')
+        for regression in regressions:
+            print(f'  {regression}')
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
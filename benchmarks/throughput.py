@@ -0,0 +1,448 @@
+"""Throughput benchmark of the fuzzers, run headless against the offline stand-in.
+
+Fuzzes the contracts of tests/values and tests/research with every combination of
+backend, fuzzer and driver and reports for each the calls executed per second, the time
+to the first property violation (or failed assertion for contracts without a property),
+the peak RSS and the startup time of the fuzzing process, i.e. from spawning it until
+the first call, which includes the imports, compiling and creating the contract and
+opting in. Every run is a separate process with a fresh stand-in, so runs do not share
+a ledger, memory or warm caches, and with the same seed they make the same calls.
+
+The raw results of every combination are written with `--output`, a summary with
+`--summary`: the median execs/sec, startup time and peak RSS per backend and driver,
+and the time to the first bug of every combination that found one. The committed
+baseline is such a summary, raw results of the same suite are regenerated with
+`run --output`.
+
+Run from the repository root:
+    poetry run python benchmarks/throughput.py run --output results.json
+    poetry run python benchmarks/throughput.py compare benchmarks/baselines/standin.json results.json
+
+`run --compare <baseline>` does both, and `compare` exits with status 1 if anything
+regressed by more than the threshold, or a bug is no longer found: every combination
+when both files hold raw results, the summaries when either is a summary.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+CONTRACT_DIRS = [ROOT / 'tests' / 'values', ROOT / 'tests' / 'research', ROOT / 'tests' / 'research' / 'algorand_veriSmart']
+FUZZERS = ('partial', 'total')
+DRIVERS = ('coverage', 'state', 'combined', 'edge')
+BACKENDS = ('dryrun', 'simulate', 'inprocess')
+CASE_TIMEOUT = 600
+# contracts of tests/values are fuzzed for their property, `eval` unless named here, the
+# research contracts for failed assertions, as their own main functions do
+PROPERTIES = {'values/time': 'moretimepassed'}
+# metrics compared against a baseline, and whether higher values are better
+COMPARED_METRICS = {
+    'execs_per_sec': True,
+    'startup_seconds': False,
+    'peak_rss_mb': False,
+    'time_to_first_bug': False,
+}
+# metrics of the summary, medians per backend and driver
+SUMMARY_METRICS = ('execs_per_sec', 'startup_seconds', 'peak_rss_mb')
+
+
+def find_contracts(pattern: str = None) -> list[Path]:
+    """Modules of the contract directories that define a `compile` function"""
+    contracts = []
+    for directory in CONTRACT_DIRS:
+        for path in sorted(directory.glob('*.py')):
+            if 'def compile(' not in path.read_text():
+                continue
+            if pattern is not None and pattern not in contract_name(path):
+                continue
+            contracts.append(path)
+    return contracts
+
+
+def contract_name(path: Path) -> str:
+    return path.relative_to(ROOT / 'tests').with_suffix('').as_posix()
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_stand_in() -> tuple[subprocess.Popen, dict[str, str]]:
+    """Starts a stand-in process and returns it with the environment pointing to it"""
+    algod_port, kmd_port = free_port(), free_port()
+    process = subprocess.Popen(
+        [sys.executable, '-u', '-m', 'algofuzz.standin', '--algod_port', str(algod_port), '--kmd_port', str(kmd_port)],
+        cwd=ROOT,
+        env=child_env(),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True
+    )
+    # the stand-in prints a line once it serves
+    if not process.stdout.readline():
+        raise RuntimeError('The stand-in did not start')
+    env = {
+        'ALGOD_SERVER': 'http://localhost',
+        'ALGOD_PORT': str(algod_port),
+        'ALGOD_TOKEN': 'a' * 64,
+        'KMD_PORT': str(kmd_port),
+    }
+    return process, env
+
+
+def child_env(extra: dict[str, str] = None) -> dict[str, str]:
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [str(ROOT), env.get('PYTHONPATH')]))
+    env.update(extra or {})
+    return env
+
+
+def run_case(contract: Path, backend: str, fuzzer: str, driver: str, args) -> dict:
+    """Fuzzes contract in a new process and returns its metrics"""
+    stand_in, env = start_stand_in() if backend != 'inprocess' else (None, {})
+    command = [
+        sys.executable, __file__, 'case', str(contract), fuzzer, driver,
+        '--runs', str(args.runs),
+        '--backend', backend,
+        '--seed', str(args.seed),
+        '--spawned', repr(time.time()),
+    ]
+    try:
+        output = subprocess.run(command, cwd=ROOT, env=child_env(env), capture_output=True, text=True, timeout=CASE_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        return {'error': f'timed out after {CASE_TIMEOUT}s'}
+    finally:
+        if stand_in is not None:
+            stand_in.kill()
+            stand_in.wait()
+
+    lines = output.stdout.strip().splitlines()
+    if output.returncode != 0 or not lines:
+        error = output.stderr.strip().splitlines()
+        return {'error': error[-1] if error else f'exit status {output.returncode}'}
+    return json.loads(lines[-1])
+
+
+def case_main(args) -> None:
+    """Runs a single case in this process and prints its metrics as the last line"""
+    from importlib.machinery import SourceFileLoader
+
+    from algofuzz.main import backend_map, driver_map, fuzzer_map
+    from algofuzz.metrics import phase_timers
+    from algofuzz.utils import set_seed
+
+    path = Path(args.contract).resolve()
+    module = SourceFileLoader(path.stem.replace('-', '_'), str(path)).load_module()
+    name = contract_name(path)
+    evaluate = getattr(module, PROPERTIES.get(name, 'eval')) if name.startswith('values/') else None
+
+    set_seed(args.seed)
+    client = backend_map[args.backend].from_compiled(*module.compile())
+    fuzzer = fuzzer_map[args.fuzzer](client)
+    fuzzer.start(evaluate, args.runs, suppress_output=True, driver=driver_map[args.driver])
+    end = time.time()
+
+    elapsed = end - fuzzer.start_time
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({
+        'calls': fuzzer.call_count,
+        'rejected': fuzzer.rejected_calls,
+        'lines_covered': fuzzer.covered_line_count,
+        'lines': fuzzer.lines_count,
+        'paths': fuzzer.cov_paths,
+        'transitions': fuzzer.transitions_count,
+        'execs_per_sec': fuzzer.call_count / elapsed if elapsed > 0 else None,
+        'startup_seconds': fuzzer.start_time - args.spawned,
+        # kilobytes on linux, bytes on macos
+        'peak_rss_mb': rss / (1 << 20 if sys.platform == 'darwin' else 1 << 10),
+        'bug_found': fuzzer.property_violated,
+        'time_to_first_bug': elapsed if fuzzer.property_violated else None,
+        'calls_to_first_bug': fuzzer.call_count if fuzzer.property_violated else None,
+        # count, p50 and p99 of every phase
+        'phases_ns': phase_timers.summary(),
+    }))
+
+
+def summarize(runs: list[dict]) -> dict:
+    """Combines the repetitions of a case, numbers are medians"""
+    ok = [run for run in runs if 'error' not in run]
+    if not ok:
+        return {'error': runs[-1]['error']}
+
+    summary = {}
+    for metric, value in ok[0].items():
+        if metric == 'phases_ns':
+            # latencies are not combined, the first run stands for the others
+            summary[metric] = value
+        elif metric == 'bug_found':
+            summary['bugs_found'] = sum(run['bug_found'] for run in ok)
+        else:
+            values = [run[metric] for run in ok if run[metric] is not None]
+            summary[metric] = statistics.median(values) if values else None
+    summary['repeat'] = len(ok)
+    return summary
+
+
+def run_suite(args) -> dict:
+    """Runs every combination.
+    :return: The raw results, keyed by backend and then by contract, fuzzer and driver"""
+    contracts = find_contracts(args.filter)
+    cases = [
+        (backend, contract, fuzzer, driver)
+        for backend in args.backends for contract in contracts for fuzzer in args.fuzzers for driver in args.drivers
+    ]
+    results = {backend: {} for backend in args.backends}
+    for i, (backend, contract, fuzzer, driver) in enumerate(cases):
+        key = f'{contract_name(contract)}/{fuzzer}/{driver}'
+        print(f'[{i + 1}/{len(cases)}] {backend} {key}', end=' ', flush=True)
+        results[backend][key] = summarize([run_case(contract, backend, fuzzer, driver, args) for _ in range(args.repeat)])
+        print(format_result(results[backend][key]), flush=True)
+
+    return {
+        'meta': {
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'runs': args.runs,
+            'seed': args.seed,
+            'repeat': args.repeat,
+            'filter': args.filter,
+            'fuzzers': list(args.fuzzers),
+        },
+        'results': results,
+    }
+
+
+def is_summary(results: dict) -> bool:
+    return 'summary' in results
+
+
+def summarize_suite(raw: dict) -> dict:
+    """Reduces raw results to the medians of `SUMMARY_METRICS` of every backend and
+    driver over the contracts and fuzzers, and the time to the first bug of every
+    combination that found one. Returns summaries unchanged."""
+    if is_summary(raw):
+        return raw
+    summary = {}
+    first_bugs = {}
+    for backend, results in raw['results'].items():
+        by_driver: dict[str, dict[str, list[float]]] = {}
+        for key, result in results.items():
+            if 'error' in result:
+                continue
+            metrics = by_driver.setdefault(key.rsplit('/', 1)[1], {})
+            for metric in SUMMARY_METRICS:
+                if result.get(metric) is not None:
+                    metrics.setdefault(metric, []).append(result[metric])
+            if result.get('time_to_first_bug') is not None:
+                first_bugs.setdefault(backend, {})[key] = round(result['time_to_first_bug'], 2)
+        summary[backend] = {
+            driver: {metric: round(statistics.median(values), 2) for metric, values in metrics.items()}
+            for driver, metrics in by_driver.items()
+        }
+    return {'meta': raw['meta'], 'summary': summary, 'first_bugs': first_bugs}
+
+
+def format_result(result: dict) -> str:
+    if 'error' in result:
+        return f"error: {result['error']}"
+    bug = f"{result['time_to_first_bug']:.2f}s" if result['time_to_first_bug'] is not None else '-'
+    return (
+        f"{result['execs_per_sec']:.0f} execs/s, startup {result['startup_seconds']:.2f}s, "
+        f"peak RSS {result['peak_rss_mb']:.0f} MB, first bug {bug}"
+    )
+
+
+def raw_cases(raw: dict) -> dict[str, dict]:
+    """Results of every combination, keyed by backend, contract, fuzzer and driver"""
+    return {f'{backend}/{key}': result for backend, results in raw['results'].items() for key, result in results.items()}
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list[str]:
+    """Compares the results of two runs, combination by combination if both are raw,
+    otherwise their summaries.
+    :return: The regressions of current against baseline"""
+    if is_summary(baseline) or is_summary(current):
+        return compare_summaries(summarize_suite(baseline), summarize_suite(current), threshold)
+
+    regressions = []
+    current_cases = raw_cases(current)
+    for key, base in raw_cases(baseline).items():
+        result = current_cases.get(key)
+        if result is None:
+            continue
+        if 'error' in result:
+            if 'error' not in base:
+                regressions.append(f"{key}: fails with {result['error']}")
+            continue
+        if 'error' in base:
+            continue
+        if base.get('bugs_found', 0) > 0 and result.get('bugs_found', 0) == 0:
+            regressions.append(f'{key}: bug no longer found')
+
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old, new = base.get(metric), result.get(metric)
+            change = changed(old, new, higher_is_better, threshold)
+            if change is not None:
+                regressions.append(f'{key}: {metric} {old:.2f} -> {new:.2f} ({change * 100:+.1f}%)')
+    return regressions
+
+
+def changed(old: float, new: float, higher_is_better: bool, threshold: float) -> float | None:
+    """:return: The relative change from old to new if it is a regression beyond the threshold"""
+    if old is None or new is None or old == 0:
+        return None
+    change = (new - old) / old
+    return change if ((change < -threshold) if higher_is_better else (change > threshold)) else None
+
+
+def was_run(summary: dict, backend: str, key: str) -> bool:
+    """Whether the run summarized covered the combination key of backend"""
+    meta = summary['meta']
+    contract, fuzzer, driver = key.rsplit('/', 2)
+    return (
+        driver in summary['summary'].get(backend, {})
+        and fuzzer in meta.get('fuzzers', FUZZERS)
+        and (meta.get('filter') is None or meta['filter'] in contract)
+    )
+
+
+def compare_summaries(baseline: dict, current: dict, threshold: float) -> list[str]:
+    regressions = []
+    for backend, drivers in baseline['summary'].items():
+        for driver, metrics in drivers.items():
+            for metric in SUMMARY_METRICS:
+                old = metrics.get(metric)
+                new = current['summary'].get(backend, {}).get(driver, {}).get(metric)
+                change = changed(old, new, COMPARED_METRICS[metric], threshold)
+                if change is not None:
+                    regressions.append(f'{backend}/{driver}: {metric} {old:.2f} -> {new:.2f} ({change * 100:+.1f}%)')
+
+    for backend, first_bugs in baseline['first_bugs'].items():
+        for key, old in first_bugs.items():
+            if not was_run(current, backend, key):
+                continue
+            new = current['first_bugs'].get(backend, {}).get(key)
+            if new is None:
+                regressions.append(f'{backend}/{key}: bug no longer found')
+                continue
+            change = changed(old, new, COMPARED_METRICS['time_to_first_bug'], threshold)
+            if change is not None:
+                regressions.append(f'{backend}/{key}: time_to_first_bug {old:.2f} -> {new:.2f} ({change * 100:+.1f}%)')
+    return regressions
+
+
+def print_comparison(baseline: dict, current: dict, threshold: float) -> bool:
+    """Prints the change of the metrics of every case, or of every backend and driver
+    if either side is a summary.
+    :return: Whether there were no regressions"""
+    if is_summary(baseline) or is_summary(current):
+        baseline, current = summarize_suite(baseline), summarize_suite(current)
+        for option in ('runs', 'seed', 'filter', 'fuzzers'):
+            if baseline['meta'].get(option) != current['meta'].get(option):
+                print(f"Note: the baseline was run with {option} {baseline['meta'].get(option)}, not {current['meta'].get(option)}")
+        print(f"{'Backend':<16}{'Driver':<16}{'execs/s':>16}{'startup':>16}{'peak RSS':>16}")
+        for backend, drivers in current['summary'].items():
+            for driver, metrics in drivers.items():
+                base = baseline['summary'].get(backend, {}).get(driver, {})
+                columns = []
+                for metric in SUMMARY_METRICS:
+                    old, new = base.get(metric), metrics.get(metric)
+                    change = f' ({(new - old) / old * 100:+.0f}%)' if old and new is not None else ''
+                    columns.append(f'{new:.1f}{change}' if new is not None else '-')
+                print(f'{backend:<16}{driver:<16}' + ''.join(f'{column:>16}' for column in columns))
+    else:
+        print(f"{'Case':<66}{'execs/s':>16}{'startup':>16}{'peak RSS':>16}")
+        baseline_cases = raw_cases(baseline)
+        for key, result in raw_cases(current).items():
+            base = baseline_cases.get(key)
+            if base is None or 'error' in base or 'error' in result:
+                continue
+            columns = []
+            for metric in ('execs_per_sec', 'startup_seconds', 'peak_rss_mb'):
+                change = (result[metric] - base[metric]) / base[metric] if base[metric] else 0.0
+                columns.append(f'{result[metric]:.1f} ({change * 100:+.0f}%)')
+            print(f'{key[:65]:<66}' + ''.join(f'{column:>16}' for column in columns))
+
+    regressions = compare(baseline, current, threshold)
+    print()
+    if not regressions:
+        print(f'No regressions beyond {threshold * 100:.0f}%')
+        return True
+    print(f'{len(regressions)} regressions beyond {threshold * 100:.0f}%:')
+    for regression in regressions:
+        print(f'  {regression}')
+    return False
+
+
+def read(path: Path) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Throughput benchmark of the fuzzers against the offline stand-in')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help='Run the benchmark suite')
+    run.add_argument('--output', type=Path, help='File to write the raw results of every combination to')
+    run.add_argument('--summary', type=Path, help='File to write the execs/sec per backend and driver to, as in the baseline')
+    run.add_argument('--compare', type=Path, help='Baseline to compare the results with')
+    run.add_argument('--filter', help='Only fuzz contracts whose name contains this, e.g. values/ or AlgoTether')
+    run.add_argument('--fuzzers', nargs='+', default=FUZZERS, choices=FUZZERS)
+    run.add_argument('--drivers', nargs='+', default=DRIVERS, choices=DRIVERS)
+    run.add_argument('--backends', nargs='+', default=BACKENDS, choices=BACKENDS)
+    run.add_argument('--runs', type=int, default=500, help='Calls per run')
+    run.add_argument('--repeat', type=int, default=1, help='Runs per combination, metrics are their medians')
+    run.add_argument('--seed', type=int, default=1)
+    run.add_argument('--threshold', type=float, default=0.15, help='Relative change of a metric that counts as a regression')
+
+    comparison = commands.add_parser('compare', help='Compare results with a baseline')
+    comparison.add_argument('baseline', type=Path)
+    comparison.add_argument('results', type=Path)
+    comparison.add_argument('--threshold', type=float, default=0.15, help='Relative change of a metric that counts as a regression')
+
+    # runs one combination, used by `run`
+    case = commands.add_parser('case')
+    case.add_argument('contract')
+    case.add_argument('fuzzer', choices=FUZZERS)
+    case.add_argument('driver', choices=DRIVERS)
+    case.add_argument('--runs', type=int, default=500)
+    case.add_argument('--backend', default='dryrun', choices=BACKENDS)
+    case.add_argument('--seed', type=int, default=1)
+    case.add_argument('--spawned', type=float, default=time.time())
+
+    args = parser.parse_args()
+    if args.command == 'case':
+        case_main(args)
+        return
+
+    if args.command == 'compare':
+        ok = print_comparison(read(args.baseline), read(args.results), args.threshold)
+        raise SystemExit(0 if ok else 1)
+
+    results = run_suite(args)
+    for path, data in ((args.output, results), (args.summary, summarize_suite(results))):
+        if path is not None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, 'w') as f:
+                json.dump(data, f, indent=2)
+    if args.compare is not None:
+        print()
+        if not print_comparison(read(args.compare), results, args.threshold):
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
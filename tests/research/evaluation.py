@@ -32,22 +32,19 @@ def get_verismart_modules():
 def evaluate_contract(contract, timeout_seconds, reps):
     compiled = contract.compile()
     for chosen_fuzzer in fuzzers:
-        for j in range(3):
-            driver = Driver(j)
+        for driver in Driver:
             info = f"{contract.__name__}_{chosen_fuzzer.__name__}_{driver}"
             print(f"{info}: ", end=' ', flush=True)
             for i in range(reps):
                 client = FuzzAppClient.from_compiled(*compiled)
                 fuzzer = chosen_fuzzer(client)
-                dumper = DataDumper(f"benchmarks/{info}_{i}.csv", 1, False)
+                # the fuzzer closes the dumper when the run ends
                 fuzzer.start(
                     timeout_seconds=timeout_seconds, 
                     driver=driver, 
-                    dumper=dumper,
+                    dumper=DataDumper(f"benchmarks/{info}_{i}.csv", 1, False),
                     suppress_output=True
                 )
-
-                dumper.file.close()
                 print("#", end='', flush=True)
             print()
             
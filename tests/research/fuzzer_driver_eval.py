@@ -34,8 +34,8 @@ def evaluate_contract(contract, timeout_seconds, reps):
                     "call_count": fuzzer.call_count,
                     "rejected_calls": fuzzer.rejected_calls,
                     "percentage_rejected": fuzzer.rejected_calls/fuzzer.call_count,
-                    "lines_covered": len(fuzzer.covered_lines),
-                    "percent_covered": len(fuzzer.covered_lines)/fuzzer.lines_count,
+                    "lines_covered": fuzzer.covered_line_count,
+                    "percent_covered": fuzzer.covered_line_count/fuzzer.lines_count,
                     "unique_paths": fuzzer.cov_paths,
                     "unique_transitions": fuzzer.transitions_count
                 })
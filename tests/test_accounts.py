@@ -0,0 +1,47 @@
+"""Tests of persisting the account pool to an encrypted file"""
+import stat
+
+import pytest
+
+from algofuzz.accounts import PASSWORD_ENV, AccountPool
+
+
+def addresses(pool: AccountPool) -> list[str]:
+    return [account.address for account in pool.accounts]
+
+
+def test_accounts_are_reused(tmp_path):
+    path = tmp_path / 'accounts.json'
+    saved = addresses(AccountPool(size=2, fund=False, path=path, password='pw'))
+    assert stat.S_IMODE(path.stat().st_mode) == 0o600
+    assert 'pw' not in path.read_text()
+
+    assert addresses(AccountPool(size=2, fund=False, path=path, password='pw')) == saved
+    # a smaller pool takes the first accounts, a larger one adds and saves new ones
+    assert addresses(AccountPool(size=1, fund=False, path=path, password='pw')) == saved[:1]
+    grown = addresses(AccountPool(size=3, fund=False, path=path, password='pw'))
+    assert grown[:2] == saved
+    assert addresses(AccountPool(size=3, fund=False, path=path, password='pw')) == grown
+
+
+def test_wrong_password(tmp_path):
+    path = tmp_path / 'accounts.json'
+    addresses(AccountPool(size=1, fund=False, path=path, password='pw'))
+    saved = path.read_text()
+
+    with pytest.raises(ValueError, match='password is wrong'):
+        AccountPool(size=1, fund=False, path=path, password='other').accounts
+    # the file is left as it was
+    assert path.read_text() == saved
+
+
+def test_password_from_the_environment(tmp_path, monkeypatch):
+    path = tmp_path / 'accounts.json'
+    monkeypatch.delenv(PASSWORD_ENV, raising=False)
+    with pytest.raises(ValueError, match=PASSWORD_ENV):
+        AccountPool(size=1, fund=False, path=path).accounts
+    assert not path.exists()
+
+    monkeypatch.setenv(PASSWORD_ENV, 'pw')
+    saved = addresses(AccountPool(size=1, fund=False, path=path))
+    assert addresses(AccountPool(size=1, fund=False, path=path, password='pw')) == saved
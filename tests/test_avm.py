@@ -0,0 +1,359 @@
+"""Unit tests of the in-process TEAL evaluator and the in-memory ledger"""
+import base64
+
+import pytest
+from algosdk import account, transaction
+
+from algofuzz import avm
+from algofuzz.ledger import Ledger
+
+FUNDS = 10 ** 9
+CLEAR = '#pragma version 8\nint 1\n'
+
+
+def new_address() -> str:
+    return account.generate_account()[1]
+
+
+def params(ledger: Ledger) -> transaction.SuggestedParams:
+    return transaction.SuggestedParams(1000, ledger.round, ledger.round + 1000, 'A' * 43 + '=', 'test', flat_fee=True)
+
+
+def create(ledger: Ledger, sender: str, approval: str, global_schema=(4, 4), local_schema=(2, 2)) -> int:
+    txn = transaction.ApplicationCreateTxn(
+        sender, params(ledger), transaction.OnComplete.NoOpOC,
+        approval.encode(), CLEAR.encode(),
+        transaction.StateSchema(*global_schema), transaction.StateSchema(*local_schema),
+    )
+    result = ledger.apply_group([txn])
+    assert result.passed, result.message
+    return result.txns[0].created_app
+
+
+def call(ledger: Ledger, sender: str, app_id: int, *args: bytes, on_complete=transaction.OnComplete.NoOpOC):
+    return transaction.ApplicationCallTxn(sender, params(ledger), app_id, on_complete, app_args=list(args))
+
+
+def setup(approval: str, **schemas) -> tuple[Ledger, str, int]:
+    ledger = Ledger(1, 1_700_000_000)
+    sender = new_address()
+    ledger.fund(sender, FUNDS)
+    # programs only run when the app is called, creating it always passes
+    app_id = create(ledger, sender, '#pragma version 8\ntxn ApplicationID\nbnz main\nint 1\nreturn\nmain:\n' + approval, **schemas)
+    return ledger, sender, app_id
+
+
+def run(approval: str, *args: bytes):
+    ledger, sender, app_id = setup(approval)
+    return ledger.apply_group([call(ledger, sender, app_id, *args)])
+
+
+# opcode semantics
+
+@pytest.mark.parametrize('source, top', [
+    ('int 2\nint 3\n+\nint 5\n==', 1),
+    ('int 7\nint 2\n/\nint 3\n==', 1),
+    ('int 7\nint 2\n%\nint 1\n==', 1),
+    ('int 1\nint 2\n-\n', None),
+    ('int 18446744073709551615\nint 1\n+', None),
+    ('int 1\nint 0\n/', None),
+    ('byte 0x0102\nbyte 0x03\nconcat\nbyte 0x010203\n==', 1),
+    ('byte "abcdef"\nextract 1 3\nbyte "bcd"\n==', 1),
+    ('byte "abc"\nint 1\nint 5\nsubstring3', None),
+    ('int 258\nitob\nbtoi\nint 258\n==', 1),
+    ('byte 0x010203040506070809\nbtoi', None),
+    ('byte 0xff\nbyte 0x01\nb+\nbyte 0x0100\nb==', 1),
+    ('int 3\nint 4\nmulw\n+\nint 12\n==', 1),
+    ('int 5\ncallsub double\nint 10\n==\nreturn\ndouble:\nint 2\n*\nretsub', 1),
+    ('int 1\nswitch zero one\nerr\nzero:\nerr\none:\nint 1', 1),
+    ('byte "a"\nbyte "b"\nbyte "b"\nmatch first second\nerr\nfirst:\nerr\nsecond:\nint 1', 1),
+    ('int 0\nassert\nint 1', None),
+    ('int 1\nint 2', None),
+    ('byte "x"', None),
+])
+def test_opcodes(source, top):
+    result = run(source)
+    assert result.passed == (top is not None), result.message
+
+
+def test_assert_failure_message():
+    result = run('int 0\nassert\nint 1')
+    assert not result.passed
+    assert result.assertion_failed
+    assert 'REJECT' in result.txns[0].messages
+
+
+def test_application_args():
+    result = run('txna ApplicationArgs 0\nbyte "hi"\n==\ntxn NumAppArgs\nint 1\n==\n&&', b'hi')
+    assert result.passed, result.message
+
+
+def test_trace_lines_index_the_listing():
+    ledger, sender, app_id = setup('int 1\npop\nint 1\nreturn')
+    result = ledger.apply_group([call(ledger, sender, app_id)])
+    listing = ledger.apps[app_id].approval.listing
+    assert [listing[line] for line in result.txns[0].trace] == [
+        'txn ApplicationID', 'bnz main', 'int 1', 'pop', 'int 1', 'return'
+    ]
+
+
+def test_unsupported_opcode_is_not_a_rejection():
+    ledger, sender, app_id = setup('int 1\nint 2\nint 3\nint 4\nint 5\nint 6\nbn256_add\nint 1')
+    balance = ledger.balance(avm.address_bytes(sender))
+    with pytest.raises(avm.Unsupported):
+        ledger.apply_group([call(ledger, sender, app_id)])
+    assert not issubclass(avm.Unsupported, avm.TealError)
+    # the fee charged before the program ran is rolled back
+    assert ledger.balance(avm.address_bytes(sender)) == balance
+
+
+# costs
+
+def test_cost_counts_opcodes():
+    result = run('int 1\npop\nint 1')
+    # txn, bnz and the three instructions above
+    assert result.txns[0].cost == 5
+
+
+def test_cost_of_hashes():
+    result = run('byte "a"\nsha256\npop\nbyte "a"\nkeccak256\npop\nint 1')
+    assert result.txns[0].cost == 2 + 1 + 35 + 1 + 1 + 130 + 1 + 1
+
+
+def test_budget_exceeded():
+    # 6 keccak256 cost more than the 700 of a single app call
+    result = run('byte "a"\n' + 'keccak256\n' * 6 + 'pop\nint 1')
+    assert not result.passed
+    assert 'budget exceeded' in result.message
+
+
+def test_budget_is_pooled_over_the_group():
+    ledger, sender, app_id = setup('byte "a"\n' + 'keccak256\n' * 6 + 'pop\nint 1')
+    cheap = create(ledger, sender, '#pragma version 8\nint 1')
+    group = transaction.assign_group_id([call(ledger, sender, app_id), call(ledger, sender, cheap)])
+    result = ledger.apply_group(group)
+    assert result.passed, result.message
+    assert result.txns[0].cost > avm.APP_CALL_BUDGET
+
+
+# state deltas
+
+def decode(delta: list[dict]) -> dict:
+    return {base64.b64decode(entry['key']): entry['value'] for entry in delta}
+
+
+def test_global_deltas():
+    ledger, sender, app_id = setup('byte "a"\nint 1\napp_global_put\nbyte "b"\nbyte "x"\napp_global_put\nint 1')
+    result = ledger.apply_group([call(ledger, sender, app_id)])
+    assert result.passed, result.message
+    assert decode(result.txns[0].global_delta) == {
+        b'a': {'action': 2, 'uint': 1},
+        b'b': {'action': 1, 'bytes': base64.b64encode(b'x').decode()},
+    }
+    assert ledger.global_state(app_id) == {b'a': 1, b'b': b'x'}
+
+
+def test_unchanged_and_deleted_keys():
+    ledger, sender, app_id = setup(
+        'txn NumAppArgs\nbnz delete\n'
+        'byte "a"\nint 1\napp_global_put\n'
+        # a key that is put and deleted again did not change
+        'byte "tmp"\nint 2\napp_global_put\nbyte "tmp"\napp_global_del\n'
+        'int 1\nreturn\n'
+        'delete:\nbyte "a"\napp_global_del\nint 1'
+    )
+    first = ledger.apply_group([call(ledger, sender, app_id)])
+    assert decode(first.txns[0].global_delta) == {b'a': {'action': 2, 'uint': 1}}
+    # putting the value a key already holds is not a change either
+    second = ledger.apply_group([call(ledger, sender, app_id)])
+    assert second.passed, second.message
+    assert second.txns[0].global_delta == []
+
+    deleted = ledger.apply_group([call(ledger, sender, app_id, b'delete')])
+    assert decode(deleted.txns[0].global_delta) == {b'a': {'action': 3}}
+    assert ledger.global_state(app_id) == {}
+
+
+def test_local_deltas():
+    ledger, sender, app_id = setup('txn Sender\nbyte "l"\nint 7\napp_local_put\nint 1')
+    # the approval program also runs for the opt in
+    opt_in = ledger.apply_group([call(ledger, sender, app_id, on_complete=transaction.OnComplete.OptInOC)])
+    assert opt_in.passed, opt_in.message
+    assert opt_in.txns[0].local_deltas == [{'address': sender, 'delta': [{'key': base64.b64encode(b'l').decode(), 'value': {'action': 2, 'uint': 7}}]}]
+    assert ledger.local_state(sender, app_id) == {b'l': 7}
+
+    result = ledger.apply_group([call(ledger, sender, app_id)])
+    assert result.passed, result.message
+    assert result.txns[0].local_deltas == []
+
+
+def test_local_state_needs_opt_in():
+    result = run('txn Sender\nbyte "l"\nint 7\napp_local_put\nint 1')
+    assert not result.passed
+    assert 'opted in' in result.message
+
+
+def test_schema_is_enforced():
+    ledger, sender, app_id = setup('byte "a"\nint 1\napp_global_put\nbyte "b"\nint 1\napp_global_put\nint 1', global_schema=(1, 0))
+    result = ledger.apply_group([call(ledger, sender, app_id)])
+    assert not result.passed
+    assert 'exceeds schema' in result.message
+    assert ledger.global_state(app_id) == {}
+
+
+# group atomicity
+
+def test_failing_group_is_rolled_back():
+    ledger, sender, app_id = setup('byte "a"\nint 1\napp_global_put\ngtxn 0 Amount\nint 100\n==')
+    receiver = new_address()
+    balance = ledger.balance(avm.address_bytes(sender))
+    payment = transaction.PaymentTxn(sender, params(ledger), receiver, 200_000)
+    group = transaction.assign_group_id([payment, call(ledger, sender, app_id)])
+    result = ledger.apply_group(group)
+
+    assert not result.passed
+    assert result.failed_index == 1
+    assert ledger.balance(avm.address_bytes(sender)) == balance
+    assert ledger.balance(avm.address_bytes(receiver)) == 0
+    assert ledger.global_state(app_id) == {}
+
+
+def test_passing_group_is_applied():
+    ledger, sender, app_id = setup('byte "a"\nint 1\napp_global_put\ngtxn 0 Amount\nint 200000\n==')
+    receiver = new_address()
+    round = ledger.round
+    payment = transaction.PaymentTxn(sender, params(ledger), receiver, 200_000)
+    group = transaction.assign_group_id([payment, call(ledger, sender, app_id)])
+    result = ledger.apply_group(group)
+
+    assert result.passed, result.message
+    assert ledger.round == round + 1
+    assert ledger.balance(avm.address_bytes(receiver)) == 200_000
+    assert ledger.global_state(app_id) == {b'a': 1}
+
+
+def test_group_below_min_balance_fails():
+    ledger, sender, app_id = setup('int 1')
+    receiver = new_address()
+    payment = transaction.PaymentTxn(sender, params(ledger), receiver, 1_000)
+    result = ledger.apply_group([payment])
+    assert not result.passed
+    assert 'below min' in result.message
+    assert ledger.balance(avm.address_bytes(receiver)) == 0
+
+
+def test_evaluating_without_commit_changes_nothing():
+    ledger, sender, app_id = setup('byte "a"\nint 1\napp_global_put\nint 1')
+    round = ledger.round
+    result = ledger.apply_group([call(ledger, sender, app_id)], commit=False)
+    assert result.passed, result.message
+    assert decode(result.txns[0].global_delta) == {b'a': {'action': 2, 'uint': 1}}
+    assert ledger.global_state(app_id) == {}
+    assert ledger.round == round
+
+
+# dryrun
+
+def test_dryrun_evaluates_every_app_call():
+    ledger, sender, app_id = setup('txna ApplicationArgs 0\nbtoi\nassert\nbyte "a"\napp_global_get\n!\nassert\nbyte "a"\nint 1\napp_global_put\nint 1')
+    group = transaction.assign_group_id([
+        call(ledger, sender, app_id, (1).to_bytes(8, 'big')),
+        call(ledger, sender, app_id, (0).to_bytes(8, 'big')),
+        call(ledger, sender, app_id, (1).to_bytes(8, 'big')),
+    ])
+    round = ledger.round
+    first, rejected, last = ledger.dryrun(group)
+
+    assert first.messages == ['ApprovalProgram', 'PASS']
+    assert decode(first.global_delta) == {b'a': {'action': 2, 'uint': 1}}
+    # a rejected call does not stop the evaluation of the next ones
+    assert rejected.messages[:2] == ['ApprovalProgram', 'REJECT']
+    assert rejected.trace
+    # which do not see the state changes of the calls before them
+    assert last.messages == ['ApprovalProgram', 'PASS']
+    assert decode(last.global_delta) == {b'a': {'action': 2, 'uint': 1}}
+    assert ledger.global_state(app_id) == {}
+    assert ledger.round == round
+
+
+def test_dryrun_does_not_apply_payments():
+    ledger, sender, app_id = setup('int 1')
+    receiver = new_address()
+    balance = ledger.balance(avm.address_bytes(sender))
+    # the payment overspends, the app call is evaluated anyway
+    payment = transaction.PaymentTxn(sender, params(ledger), receiver, 2 * FUNDS)
+    payment_result, app_result = ledger.dryrun(transaction.assign_group_id([payment, call(ledger, sender, app_id)]))
+
+    assert payment_result.messages == []
+    assert app_result.messages == ['ApprovalProgram', 'PASS']
+    assert ledger.balance(avm.address_bytes(sender)) == balance
+
+
+def test_dryrun_reports_rejections_after_the_program():
+    ledger, sender, app_id = setup('byte "a"\nint 1\napp_global_put\nbyte "b"\nint 1\napp_global_put\nint 1', global_schema=(1, 0))
+    result, = ledger.dryrun([call(ledger, sender, app_id)])
+    assert result.messages[:3] == ['ApprovalProgram', 'PASS', 'REJECT']
+    assert 'exceeds schema' in result.messages[3]
+
+    missing, = ledger.dryrun([call(ledger, sender, app_id + 1)])
+    assert missing.messages[:2] == ['ApprovalProgram', 'REJECT']
+
+
+# indices and references
+
+@pytest.mark.parametrize('source, message', [
+    ('txna ApplicationArgs 3', 'invalid ApplicationArgs index 3'),
+    ('int 2\ntxnas ApplicationArgs', 'invalid ApplicationArgs index 2'),
+    ('int 5\ntxnas Accounts', 'invalid Accounts index 5'),
+    ('txna Applications 1', 'invalid Applications index 1'),
+    ('txna Assets 0', 'invalid Assets index 0'),
+    ('int 0\ngtxnas 3 ApplicationArgs', 'gtxnas lookup TxnGroup[3] but it only has 1'),
+    ('int 3\nint 0\ngtxnsas ApplicationArgs', 'gtxnsas lookup TxnGroup[3] but it only has 1'),
+    ('int 2\ngtxns Sender', 'gtxns lookup TxnGroup[2] but it only has 1'),
+])
+def test_index_out_of_range_is_a_rejection(source, message):
+    result = run(source + '\npop\nint 1', b'a', b'b')
+    assert not result.passed
+    assert result.message == f'logic eval error: {message}'
+
+
+def test_evaluator_errors_are_rejections(monkeypatch):
+    ledger, sender, app_id = setup('txn Sender\npop\nint 1')
+    def broken(*args):
+        raise KeyError('field')
+    monkeypatch.setattr(avm, 'txn_field', broken)
+    result = ledger.apply_group([call(ledger, sender, app_id)])
+    assert not result.passed
+    assert 'KeyError' in result.message
+
+
+def test_unavailable_account_is_a_rejection():
+    ledger, sender, app_id = setup('txna ApplicationArgs 0\nbalance\npop\nint 1')
+    other = new_address()
+    ledger.fund(other, FUNDS)
+    # an account that is not referenced by the group cannot be read
+    result = ledger.apply_group([call(ledger, sender, app_id, avm.address_bytes(other))])
+    assert not result.passed
+    assert result.message == f'logic eval error: unavailable Account {other}'
+
+    referenced = call(ledger, sender, app_id, avm.address_bytes(other))
+    referenced.accounts = [other]
+    assert ledger.apply_group([referenced]).passed
+    assert ledger.apply_group([call(ledger, sender, app_id, avm.address_bytes(sender))]).passed
+    assert ledger.apply_group([call(ledger, sender, app_id, avm.app_address(app_id))]).passed
+
+
+def test_group_accounts_are_available():
+    ledger, sender, app_id = setup('txna ApplicationArgs 0\nbalance\nint 200000\n==')
+    receiver = new_address()
+    payment = transaction.PaymentTxn(sender, params(ledger), receiver, 200_000)
+    group = transaction.assign_group_id([payment, call(ledger, sender, app_id, avm.address_bytes(receiver))])
+    result = ledger.apply_group(group)
+    assert result.passed, result.message
+
+
+def test_unavailable_local_state_is_a_rejection():
+    ledger, sender, app_id = setup('txna ApplicationArgs 0\nbyte "l"\napp_local_get\npop\nint 1')
+    result = ledger.apply_group([call(ledger, sender, app_id, avm.address_bytes(new_address()))])
+    assert not result.passed
+    assert 'unavailable Account' in result.message
@@ -0,0 +1,54 @@
+"""Tests of the hit count buckets, edge coverage and the virgin map"""
+import pytest
+
+from algofuzz.coverage import EDGE_MAP_SIZE, VirginMap, classify, collect, from_trace, new_bitmap, record_edges
+
+
+@pytest.mark.parametrize('count, bucket', [
+    (0, 0), (1, 1), (2, 2), (3, 4), (4, 8), (7, 8), (8, 16), (15, 16),
+    (16, 32), (31, 32), (32, 64), (127, 64), (128, 128), (255, 128),
+])
+def test_buckets(count, bucket):
+    assert classify(bytearray([count])) == bytearray([bucket])
+
+
+def test_hit_counts_saturate():
+    assert from_trace([0] * 300, 2) == bytearray([128, 0])
+
+
+def test_from_trace_counts_hits_per_line():
+    assert from_trace([0, 1, 1, 3, 3, 3], 4) == bytearray([1, 2, 0, 4])
+
+
+def test_edges_tell_orders_apart():
+    forward, backward = new_bitmap(EDGE_MAP_SIZE), new_bitmap(EDGE_MAP_SIZE)
+    record_edges(forward, [1, 2])
+    record_edges(backward, [2, 1])
+    assert sum(forward) == sum(backward) == 2
+    assert forward != backward
+
+
+def test_collect_merges_traces():
+    coverage = collect([[0, 1], [1, 2]], 4, edges=True)
+    assert coverage == bytearray([1, 2, 1, 0])
+    assert len(coverage.edges) == EDGE_MAP_SIZE
+    assert collect([[0]], 4).edges is None
+
+
+def test_new_bits():
+    virgin = VirginMap(4)
+    # new lines
+    assert virgin.has_new_bits(from_trace([0, 1], 4)) == 2
+    assert virgin.covered_count == 2
+    # nothing new
+    assert virgin.has_new_bits(from_trace([0, 1], 4)) == 0
+    assert virgin.has_new_bits(from_trace([0], 4)) == 0
+    # only a new bucket of a covered line
+    assert virgin.has_new_bits(from_trace([0, 0, 1], 4)) == 1
+    assert virgin.covered_count == 2
+    # a new bucket and a new line
+    assert virgin.has_new_bits(from_trace([0, 0, 0, 3], 4)) == 2
+
+    assert virgin.covered_count == 3
+    assert virgin.covered_lines == {0, 1, 3}
+    assert virgin.covered_bits() == bytes([1 | 2 | 4, 1, 0, 1])
@@ -0,0 +1,117 @@
+"""Tests of the local disassembler and of the disassembly cache"""
+import base64
+from importlib.machinery import SourceFileLoader
+from pathlib import Path
+
+import pytest
+from algosdk import encoding
+from dotenv import load_dotenv
+
+from algofuzz import disassembler, standin
+from algofuzz.transport import get_algod_client
+
+TESTS = Path(__file__).resolve().parent
+ADDRESS = bytes(range(32))
+
+# hand assembled, version 8
+PROGRAM = b''.join([
+    bytes([0x08]),
+    bytes([0x20, 2, 0, 1]),
+    bytes([0x26, 2, 5]) + b'count' + bytes([32]) + ADDRESS,
+    bytes([0x31, 24, 0x22, 0x12, 0x40, 0, 12]),
+    bytes([0x28, 0x64, 0x23, 0x08, 0x48]),
+    bytes([0x80, 2, 0x00, 0xff, 0x48, 0x29, 0x48]),
+    bytes([0x81, 1, 0x43]),
+])
+
+LISTING = f'''#pragma version 8
+intcblock 0 1
+bytecblock 0x636f756e74 0x{ADDRESS.hex()}
+txn ApplicationID
+intc_0 // 0
+==
+bnz label1
+bytec_0 // "count"
+app_global_get
+intc_1 // 1
++
+pop
+pushbytes 0x00ff // 0x00ff
+pop
+bytec_1 // addr {encoding.encode_address(ADDRESS)}
+pop
+label1:
+pushint 1
+return
+'''
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(disassembler, 'CACHE_DIR', tmp_path)
+    monkeypatch.setattr(disassembler, '_memory', {})
+    return tmp_path
+
+
+class Node:
+    """Answers disassemble requests like algod and counts them"""
+    def __init__(self, text: str = None):
+        self.text = text
+        self.requests = 0
+
+    def disassemble(self, program: bytes) -> dict:
+        self.requests += 1
+        if self.text is None:
+            raise ConnectionError('unreachable')
+        return {'result': self.text}
+
+
+def test_local_listing_has_the_layout_of_algod():
+    assert disassembler.disassemble_local(PROGRAM) == LISTING
+
+
+def test_invalid_program():
+    with pytest.raises(disassembler.DisassemblyError):
+        disassembler.disassemble_local(bytes([0x08, 0xff]))
+    with pytest.raises(disassembler.DisassemblyError):
+        disassembler.disassemble_local(bytes([0x08, 0x31]))
+
+
+def test_algod_is_asked_once(cache_dir):
+    node = Node('#pragma version 8\nfrom the node\n')
+    assert disassembler.disassemble(PROGRAM, node) == ['#pragma version 8', 'from the node', '']
+    assert disassembler.disassemble(PROGRAM, node)[1] == 'from the node'
+    assert node.requests == 1
+
+    # a new process reads the disk cache and needs no node
+    disassembler._memory.clear()
+    assert disassembler.disassemble(PROGRAM)[1] == 'from the node'
+    assert (cache_dir / f'{disassembler.program_hash(PROGRAM)}.teal').exists()
+
+
+def test_unreachable_algod_falls_back_to_the_local_listing(cache_dir):
+    node = Node()
+    assert disassembler.disassemble(PROGRAM, node) == LISTING.split('\n')
+    assert node.requests == 1
+
+
+@pytest.fixture(scope='module')
+def node():
+    load_dotenv()
+    try:
+        client = get_algod_client()
+        params = client.suggested_params()
+    except Exception:
+        pytest.skip('no algod node is reachable')
+    if params.gen == standin.GENESIS_ID:
+        pytest.skip('the node is the stand-in')
+    return client
+
+
+@pytest.mark.parametrize('name', ['research/AlgoTether', 'values/constants', 'values/bytes-mutations'])
+def test_same_listing_as_the_node(node, name):
+    path = TESTS / f'{name}.py'
+    approval = SourceFileLoader(path.stem, str(path)).load_module().compile()[0]
+    program = base64.b64decode(node.compile(approval)['result'])
+    assert disassembler.disassemble_local(program) == node.disassemble(program)['result']
+    assert disassembler.disassemble_local(PROGRAM) == node.disassemble(PROGRAM)['result']
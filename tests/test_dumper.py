@@ -0,0 +1,96 @@
+"""Tests of the metrics dumps, read back after they are written"""
+import pytest
+
+from algofuzz.dumper import COLUMNS, DataDumper, read_binary
+from algofuzz.metrics import PhaseTimers
+
+
+def dump_calls(dumper: DataDumper, calls: int) -> None:
+    for call_count in range(1, calls + 1):
+        dumper.dump(call_count // 2, call_count / 10, call_count // 3, call_count // 4, call_count // 5, call_count)
+
+
+def test_binary_dump_reads_back(tmp_path):
+    path = tmp_path / 'dump.bin'
+    with DataDumper(path, 10, False, binary=True) as dumper:
+        dumper.create_dump('AlgoTether', 'partial')
+        dump_calls(dumper, 35)
+
+    header, rows = read_binary(path)
+    assert header['info'] == ['AlgoTether', 'partial']
+    assert tuple(header['columns']) == COLUMNS
+    # every 10 calls from the first one, and the final state
+    assert [row[0] for row in rows] == [1, 11, 21, 31, 35]
+    assert rows[-1] == (35, 7, 20.0, 17, 3.5, 11, 8)
+    assert 'phases' not in header
+
+
+def test_appended_binary_dumps_read_back(tmp_path):
+    path = tmp_path / 'dump.bin'
+    for run in ('first', 'second'):
+        with DataDumper(path, 1, False, binary=True, flush_interval=0.01) as dumper:
+            dumper.create_dump(run)
+            dump_calls(dumper, 3)
+
+    header, rows = read_binary(path)
+    # the header is the one of the last dump, the rows those of both
+    assert header['info'] == ['second']
+    assert [row[0] for row in rows] == [1, 2, 3, 1, 2, 3]
+
+
+def test_phases_are_written_on_close(tmp_path):
+    timers = PhaseTimers(enabled=True)
+    # below 64 ns every value has a bucket of its own
+    for value in (10, 20, 30):
+        timers.histograms['send'].record(value)
+
+    path = tmp_path / 'dump.bin'
+    with DataDumper(path, 1, False, binary=True) as dumper:
+        dumper.create_dump('run')
+        dump_calls(dumper, 2)
+        dumper.dump_phases(timers)
+
+    header, rows = read_binary(path)
+    assert len(rows) == 2
+    assert header['phases'] == [['send', 3, 20, 30, 20, 30]]
+
+
+def test_csv_dump(tmp_path):
+    path = tmp_path / 'dump.csv'
+    dumper = DataDumper(path, 10, False, buffer_size=2)
+    dumper.create_dump('AlgoTether')
+    dump_calls(dumper, 25)
+    dumper.close()
+    # closing twice does not write again
+    dumper.close()
+
+    lines = path.read_text().splitlines()
+    assert lines[0] == '#AlgoTether'
+    assert lines[1].startswith('call_count, calls_rejected')
+    rows = [line for line in lines[2:] if not line.startswith('#')]
+    assert rows[-1] == '25, 5, 20.00, 12, 2.50, 8, 6'
+    # the rows are those that were not dropped by the full buffer, in order
+    counts = [int(row.split(', ')[0]) for row in rows]
+    assert counts == sorted(counts)
+    assert len(counts) + dumper.dropped == 4
+
+
+def test_close_without_dump(tmp_path):
+    dumper = DataDumper(tmp_path / 'dump.bin', 1, False, binary=True)
+    dumper.dump(1, 1.0, 1, 1, 0, 1)
+    dumper.close()
+    assert not (tmp_path / 'dump.bin').exists()
+
+
+@pytest.mark.parametrize('binary', [False, True])
+def test_time_interval_keeps_the_final_state(tmp_path, binary):
+    path = tmp_path / 'dump'
+    with DataDumper(path, 3600, True, binary=binary) as dumper:
+        dumper.create_dump('run')
+        dump_calls(dumper, 5)
+
+    if binary:
+        counts = [row[0] for row in read_binary(path)[1]]
+    else:
+        counts = [int(line.split(', ')[0]) for line in path.read_text().splitlines()[2:]]
+    assert counts == [1, 5]
@@ -0,0 +1,108 @@
+"""Tests of the dryrun backend against an in-process stand-in"""
+import random
+import socket
+from importlib.machinery import SourceFileLoader
+from pathlib import Path
+
+import pytest
+from algosdk import account, transaction
+
+from algofuzz import standin
+from algofuzz.accounts import account_pool
+from algofuzz.FuzzAppClient import DryrunError, FuzzAppClient
+from algofuzz.mutate import AccountMutator, MethodMutator
+from algofuzz.transport import PooledAlgodClient
+from algofuzz.utils import balance_tracker, create_app_spec
+
+TESTS = Path(__file__).resolve().parent
+CANDIDATES = 64
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture(scope='module')
+def stand_in():
+    stand_in, servers = standin.serve(free_port(), free_port())
+    # payments top up their sender on the ledger of the stand-in, not through its KMD
+    def fund(amounts: dict[str, int]) -> None:
+        for address, amount in amounts.items():
+            stand_in.ledger.fund(address, amount)
+    balance_tracker.use_backend(stand_in.ledger.account_info, fund)
+    yield stand_in, f'http://127.0.0.1:{servers[0].server_port}'
+    for server in servers:
+        server.shutdown()
+
+
+def deployed_client(stand_in, name: str) -> FuzzAppClient:
+    stand_in, address = stand_in
+    if not account_pool.created:
+        # funded on the ledger of the stand-in below, without its KMD
+        account_pool.configure(fund=False)
+    for pool_account in AccountMutator.accs:
+        stand_in.ledger.fund(pool_account.address, 10 ** 12)
+
+    path = TESTS / f'{name}.py'
+    module = SourceFileLoader(path.stem, str(path)).load_module()
+    creator = AccountMutator().seed()
+    client = FuzzAppClient(
+        PooledAlgodClient('a' * 64, address),
+        create_app_spec(*module.compile()),
+        sender=creator.address,
+        signer=creator.signer
+    )
+    client.create()
+    client.opt_in_all()
+    return client
+
+
+def candidates(client: FuzzAppClient, count: int) -> list:
+    random.seed(0)
+    mutators = {method.name: MethodMutator(method, client.app_address) for method in client.methods}
+    calls = []
+    for _ in range(count):
+        method = random.choice(client.methods)
+        args = mutators[method.name].mutate(mutators[method.name].seed())
+        calls.append((method, args, random.choice(AccountMutator.accs)))
+    return calls
+
+
+@pytest.mark.parametrize('name', ['research/AlgoTether', 'values/payable'])
+@pytest.mark.parametrize('batch', [2, 8, CANDIDATES])
+def test_batch_checks_like_single_calls(stand_in, name, batch):
+    client = deployed_client(stand_in, name)
+    calls = candidates(client, CANDIDATES)
+    single = [client.check(*call) for call in calls]
+    batched = [check for start in range(0, len(calls), batch) for check in client.check_batch(calls[start:start + batch])]
+
+    assert len(batched) == len(single)
+    assert any(check.passed for check in single) and not all(check.passed for check in single)
+    for index, (expected, actual) in enumerate(zip(single, batched)):
+        assert actual.passed == expected.passed, index
+        assert actual.assertion_failed == expected.assertion_failed, index
+        assert actual.coverage == expected.coverage, index
+        assert actual.cost == expected.cost, index
+        if actual.passed:
+            assert any(actual.coverage), index
+
+
+def app_call() -> transaction.SignedTransaction:
+    params = transaction.SuggestedParams(1000, 1, 1000, 'A' * 43 + '=', flat_fee=True)
+    sender = account.generate_account()[1]
+    return transaction.SignedTransaction(transaction.ApplicationNoOpTxn(sender, params, 1001), None)
+
+
+@pytest.mark.parametrize('dryrun_txns', [
+    [],
+    [{'disassembly': [], 'logs': []}],
+    [{'disassembly': [], 'logs': [], 'app-call-messages': ['ApprovalProgram', 'PASS']}],
+])
+def test_unevaluated_app_call_is_not_a_pass(dryrun_txns):
+    client = FuzzAppClient.__new__(FuzzAppClient)
+    client._coverage_size = 8
+    client.track_edges = False
+    with pytest.raises(DryrunError):
+        client._check_dryrun([app_call()], dryrun_txns)
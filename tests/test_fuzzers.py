@@ -0,0 +1,44 @@
+"""Tests of the seed selection of the method fuzzers"""
+import pytest
+from algosdk import abi
+
+from algofuzz.accounts import account_pool
+from algofuzz.coverage import from_trace
+from algofuzz.fuzzers import MethodFuzzer
+from algofuzz.scheduler import Ids, PowerSchedule, SeenIds
+
+STATE = {'global': {}, 'local': {}}
+
+
+@pytest.fixture(scope='module', autouse=True)
+def unfunded_accounts():
+    if not account_pool.created:
+        account_pool.configure(fund=False)
+
+
+def method_fuzzer(signature: str, ids: Ids, seen: SeenIds) -> MethodFuzzer:
+    method = abi.Method.from_signature(signature)
+    fuzzer = MethodFuzzer(method, 'A' * 58, PowerSchedule(ids=ids), 0.1, seen)
+    fuzzer.inp = fuzzer.fuzz()
+    return fuzzer
+
+
+def coverage_driver(is_new_transition: bool, is_new_coverage: bool) -> bool:
+    return is_new_coverage
+
+
+def test_novelty_is_judged_per_method():
+    ids, seen = Ids(), SeenIds()
+    first = method_fuzzer('first(uint64)void', ids, seen)
+    second = method_fuzzer('second(uint64)void', ids, seen)
+    shared = from_trace([0, 1, 2, 3], 8)
+
+    assert first.update(shared, (STATE, STATE), coverage_driver)
+    # lines another method already covered are still new to this one
+    assert second.update(shared, (STATE, STATE), coverage_driver)
+    assert not second.update(shared, (STATE, STATE), coverage_driver)
+    assert len(first.population) == len(second.population) == 1
+
+    # a new hit count bucket is new coverage of the method
+    assert second.update(from_trace([0, 1, 1, 2, 3], 8), (STATE, STATE), coverage_driver)
+    assert len(seen.paths) == 2
@@ -0,0 +1,82 @@
+"""Cross-check of the in-process backend against a node.
+
+Executes the same calls on the contracts of this directory with `InProcessAppClient` and
+with `FuzzAppClient`, which checks them with the dryrun of the node of the `.env` file,
+and compares whether they are rejected, by a failed assertion or not, and their state
+deltas. Coverage is not compared, its lines index different listings (see `avm`).
+Skipped without a node; the stand-in does not count, it runs the in-process evaluator.
+"""
+import base64
+import random
+from importlib.machinery import SourceFileLoader
+from pathlib import Path
+
+import pytest
+from dotenv import load_dotenv
+
+from algofuzz import standin
+from algofuzz.backend import ExecutionResult
+from algofuzz.FuzzAppClient import FuzzAppClient
+from algofuzz.InProcessAppClient import InProcessAppClient
+from algofuzz.mutate import AccountMutator, MethodMutator
+from algofuzz.transport import get_algod_client
+
+TESTS = Path(__file__).resolve().parent
+# contracts without payments and without reading the round or time, which differ
+CONTRACTS = [
+    'research/AlgoTether', 'values/bran_bar', 'values/bytes-mutations', 'values/constants', 'values/constants2',
+    'values/darray', 'values/extreme', 'values/large', 'values/nearbyMining', 'values/sarray', 'values/smallValues',
+]
+CALLS = 300
+
+
+@pytest.fixture(scope='module')
+def node():
+    load_dotenv()
+    try:
+        params = get_algod_client().suggested_params()
+    except Exception:
+        pytest.skip('no algod node is reachable')
+    if params.gen == standin.GENESIS_ID:
+        pytest.skip('the node is the stand-in')
+
+
+def load(name: str):
+    path = TESTS / f'{name}.py'
+    return SourceFileLoader(path.stem.replace('-', '_'), str(path)).load_module()
+
+
+def deltas(execution: ExecutionResult) -> tuple[dict, dict]:
+    global_delta, local_deltas = execution.state_delta
+    def decode(delta: list[dict]) -> dict:
+        return {base64.b64decode(entry['key']): entry['value'] for entry in delta}
+    return decode(global_delta), {entry['address']: decode(entry['delta']) for entry in local_deltas}
+
+
+@pytest.mark.parametrize('name', CONTRACTS)
+def test_same_outcomes_as_dryrun(node, name):
+    compiled = load(name).compile()
+    remote = FuzzAppClient.from_compiled(*compiled)
+    local = InProcessAppClient.from_compiled(*compiled)
+    for client in (remote, local):
+        client.create()
+        try:
+            client.opt_in_all()
+        except Exception:
+            pass
+
+    random.seed(0)
+    methods = [method for method in remote.methods if all(arg.type != 'pay' for arg in method.args)]
+    mutators = {method.name: MethodMutator(method, remote.app_address) for method in methods}
+    args = {method.name: mutators[method.name].seed() for method in methods}
+    for call in range(CALLS):
+        method = random.choice(methods)
+        args[method.name] = mutators[method.name].mutate(args[method.name])
+        account = random.choice(AccountMutator.accs)
+
+        expected = remote.execute(method, args[method.name], account)
+        actual = local.execute(local.get_method(method.name), args[method.name], account)
+        context = f'call {call}: {method.name}{args[method.name]}'
+        assert actual.rejected == expected.rejected, context
+        assert actual.assertion_failed == expected.assertion_failed, context
+        assert deltas(actual) == deltas(expected), context
@@ -0,0 +1,46 @@
+"""Tests of parallel campaigns with failing workers"""
+from importlib.machinery import SourceFileLoader
+from pathlib import Path
+
+from algofuzz.fuzzers import PartialFuzzer
+from algofuzz.InProcessAppClient import InProcessAppClient
+from algofuzz.parallel import fuzz_parallel
+
+TESTS = Path(__file__).resolve().parent
+FAILING_CALL = 50
+
+
+def contract_args() -> tuple:
+    path = TESTS / 'research' / 'AlgoTether.py'
+    return SourceFileLoader(path.stem, str(path)).load_module().compile()
+
+
+class FailingFuzzer(PartialFuzzer):
+    def fuzz(self):
+        if self.call_count >= FAILING_CALL:
+            raise IndexError('candidate out of range')
+        return super().fuzz()
+
+
+def failing_client(*args):
+    raise RuntimeError('no backend')
+
+
+def test_worker_failing_during_the_run_reports_its_stats(tmp_path):
+    stats = fuzz_parallel(2, contract_args(), FailingFuzzer, InProcessAppClient.from_compiled, sync_dir=tmp_path, seed=1, runs=200, suppress_output=True)
+    assert sorted(worker['worker'] for worker in stats) == [0, 1]
+    for worker in stats:
+        assert worker['error'] == 'IndexError: candidate out of range'
+        assert worker['calls'] == FAILING_CALL
+        assert worker['covered_lines'] > 0
+
+
+def test_worker_failing_before_the_run_reports_its_error(tmp_path):
+    stats = fuzz_parallel(2, contract_args(), PartialFuzzer, failing_client, sync_dir=tmp_path, seed=1, runs=200, suppress_output=True)
+    assert [worker['error'] for worker in sorted(stats, key=lambda worker: worker['worker'])] == ['RuntimeError: no backend'] * 2
+
+
+def test_workers_without_errors(tmp_path):
+    stats = fuzz_parallel(2, contract_args(), PartialFuzzer, InProcessAppClient.from_compiled, sync_dir=tmp_path, seed=1, runs=100, suppress_output=True)
+    assert [worker['error'] for worker in stats] == [None, None]
+    assert all(worker['calls'] == 100 for worker in stats)
@@ -0,0 +1,90 @@
+"""Tests of the Fenwick tree and the seed sampling of the power schedule"""
+import random
+from collections import Counter
+
+import pytest
+
+from algofuzz.scheduler import FenwickTree, Ids, PowerSchedule, Seed
+
+STATE = {'global': {}, 'local': {}}
+
+
+def prefix_sums(weights: list[float]) -> list[float]:
+    sums, total = [], 0.0
+    for weight in weights:
+        total += weight
+        sums.append(total)
+    return sums
+
+
+def test_fenwick_sums_after_updates():
+    random.seed(0)
+    tree = FenwickTree()
+    weights = []
+    # enough appends to grow the tree several times
+    for _ in range(100):
+        weight = random.random()
+        weights.append(weight)
+        assert tree.append(weight) == len(weights) - 1
+    for _ in range(200):
+        index = random.randrange(len(weights))
+        weights[index] = random.random()
+        tree.update(index, weights[index])
+
+    assert len(tree) == len(weights)
+    assert tree.total() == pytest.approx(sum(weights))
+    for index, cumulative in enumerate(prefix_sums(weights)):
+        # a value just below the cumulative weight of an index falls into it
+        assert tree.find(cumulative - weights[index] / 2) == index
+
+
+def test_fenwick_skips_zero_weights():
+    tree = FenwickTree()
+    for weight in (0.0, 2.0, 0.0, 3.0):
+        tree.append(weight)
+    assert tree.total() == 5.0
+    assert tree.find(0.0) == 1
+    assert tree.find(1.99) == 1
+    assert tree.find(2.0) == 3
+    assert tree.find(4.99) == 3
+
+
+def schedule_with_paths(path_counts: list[int]) -> tuple[PowerSchedule, list[Seed]]:
+    """A schedule with one seed per path, the path of seed i seen path_counts[i] times"""
+    schedule = PowerSchedule(exponent=1, trans_coef=0.0, ids=Ids())
+    seeds = []
+    for path, count in enumerate(path_counts):
+        coverage = bytes([1 << path])
+        for _ in range(count):
+            _, path_id = schedule.addPath(coverage)
+        _, transition_id = schedule.addTransition((STATE, STATE))
+        seed = Seed(path)
+        seed.path_id, seed.transition_id = path_id, transition_id
+        schedule.add(seed)
+        seeds.append(seed)
+    return schedule, seeds
+
+
+def sampled_shares(schedule: PowerSchedule, samples: int) -> dict:
+    random.seed(1)
+    counts = Counter(schedule.choose().data for _ in range(samples))
+    return {data: count / samples for data, count in counts.items()}
+
+
+def test_choose_samples_by_energy():
+    # energies 1/1, 1/2 and 1/4
+    schedule, seeds = schedule_with_paths([1, 2, 4])
+    energies = [schedule.energy(seed) for seed in seeds]
+    shares = sampled_shares(schedule, 20_000)
+    for seed, energy in zip(seeds, energies):
+        assert shares[seed.data] == pytest.approx(energy / sum(energies), abs=0.015)
+
+
+def test_choose_follows_changed_frequencies():
+    schedule, seeds = schedule_with_paths([1, 1])
+    # the first path is seen 3 more times, its seed keeps a stale weight until sampled
+    for _ in range(3):
+        schedule.addPath(bytes([1]))
+    shares = sampled_shares(schedule, 20_000)
+    assert shares[0] == pytest.approx(0.25 / 1.25, abs=0.015)
+    assert shares[1] == pytest.approx(1 / 1.25, abs=0.015)
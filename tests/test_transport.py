@@ -0,0 +1,56 @@
+"""Tests of recording algod traffic and replaying it without a node"""
+import socket
+
+import pytest
+
+from algofuzz import standin, transport
+from algofuzz.transport import PooledAlgodClient, ReplayError
+
+SOURCE = '#pragma version 8\nint 1\nreturn\n'
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def session(client: PooledAlgodClient, address: str) -> list:
+    """Requests of a short session, one of them repeated"""
+    return [
+        client.status(),
+        vars(client.suggested_params()),
+        client.compile(SOURCE),
+        client.account_info(address),
+        client.status(),
+    ]
+
+
+def test_replayed_session_needs_no_node(tmp_path):
+    stand_in, servers = standin.serve(free_port(), free_port())
+    url = f'http://127.0.0.1:{servers[0].server_port}'
+    address = stand_in.dispenser_address
+    log = tmp_path / 'session.log.gz'
+    try:
+        recorder = transport.record(log)
+        recorded = session(PooledAlgodClient('a' * 64, url), address)
+    finally:
+        transport.stop_tape()
+        for server in servers:
+            server.shutdown()
+            server.server_close()
+    assert recorder.requests == 5
+
+    try:
+        replayer = transport.replay(log)
+        # the node is gone, every response comes from the log
+        assert session(PooledAlgodClient('a' * 64, url), address) == recorded
+        assert replayer.requests == 5
+        assert replayer.missing == 0
+        assert replayer.repeated == 0
+
+        with pytest.raises(ReplayError):
+            PooledAlgodClient('a' * 64, url).application_info(1)
+        assert replayer.missing == 1
+    finally:
+        transport.stop_tape()